@@ -2,12 +2,18 @@
 import sys
 import os
 import ctypes
+import multiprocessing
 from PyQt5.QtWidgets import (QApplication, QWidget, QLabel, QVBoxLayout, QHBoxLayout, QComboBox,
                              QPushButton, QFileDialog, QCheckBox, QRadioButton, QButtonGroup, QProgressBar, QSizePolicy, QMessageBox)
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont, QIcon
 
 from transcription.TranscriptionWorker import TranscriptionWorker
+from transcription.ModelRegistry import ModelRegistry
+from transcription.ProgressReporter import format_progress
+from transcription.OutputWriters import OUTPUT_FORMATS
+from transcription.quantized_model import QUANTIZED_SUFFIX
+from transcription.decoding_profiles import DECODING_PROFILES, DEFAULT_PROFILE, COMMON_LANGUAGES, ProfileStats
 from transcription.normalize_path import normalize_path
 from ffmpeg_tools.DownloadFFmpeg import DownloadFFmpegThread
 
@@ -23,17 +29,21 @@ import os
 
 
 
-# Write logs for the application
-os.makedirs(normalize_path("logs"), exist_ok=True)
-#os.makedirs(normalize_path("mediator"), exist_ok=True)
-sys.stdout = open('logs/ww-out.log', 'w', encoding='utf-8-sig')
-sys.stderr = open('logs/ww-warn_err.log', 'w')
+def redirect_logs():
+    """Write logs for the application (only from the main process, so pool workers don't truncate them)."""
+    os.makedirs(normalize_path("logs"), exist_ok=True)
+    #os.makedirs(normalize_path("mediator"), exist_ok=True)
+    sys.stdout = open('logs/ww-out.log', 'w', encoding='utf-8-sig')
+    sys.stderr = open('logs/ww-warn_err.log', 'w')
 
 
 class TranscriptionApp(QWidget):
 
     def __init__(self):
         super().__init__()
+        # Loaded models live here between jobs so each run doesn't pay the load again
+        self.model_registry = ModelRegistry(normalize_path("whisper_models"))
+        self.ffmpeg_ready = False
         self.initUI()
 
     def initUI(self):
@@ -46,9 +56,69 @@ class TranscriptionApp(QWidget):
         self.model_label = QLabel("Choose Whisper Model:")
         self.model_combo = QComboBox()
         self.model_combo.addItems(["turbo", "tiny", "base", "small", "medium", "large"])
+        self.model_combo.currentTextChanged.connect(lambda _: self.on_model_changed(self.selected_model_name()))
         layout.addWidget(self.model_label)
         layout.addWidget(self.model_combo)
 
+        self.quantize_checkbox = QCheckBox("Use the int8-quantized model (faster and smaller on CPU-only machines)")
+        self.quantize_checkbox.setToolTip("Converted once on first use and kept in whisper_models.")
+        self.quantize_checkbox.toggled.connect(lambda _: self.on_model_changed(self.selected_model_name()))
+        layout.addWidget(self.quantize_checkbox)
+
+        profile_layout = QHBoxLayout()
+        self.profile_label = QLabel("Speed profile:")
+        self.profile_combo = QComboBox()
+        # Item data is the profile key; the text carries the speed measured on this machine
+        for profile in DECODING_PROFILES:
+            self.profile_combo.addItem(profile.capitalize(), profile)
+        self.profile_combo.setCurrentIndex(self.profile_combo.findData(DEFAULT_PROFILE))
+        self.profile_combo.setToolTip("Fastest decodes once, greedily. Accurate uses beam search and full precision. "
+                                      "The x real time figure is how long a profile has taken per second of audio.")
+        self.language_label = QLabel("Language:")
+        self.language_combo = QComboBox()
+        self.language_combo.setEditable(True)
+        self.language_combo.addItem("Detect automatically", None)
+        for language in COMMON_LANGUAGES:
+            self.language_combo.addItem(language, language)
+        self.language_combo.setToolTip("Setting the language skips detection. A whisper-language.txt file in a "
+                                       "folder sets it for that folder only.")
+        profile_layout.addWidget(self.profile_label)
+        profile_layout.addWidget(self.profile_combo)
+        profile_layout.addWidget(self.language_label)
+        profile_layout.addWidget(self.language_combo)
+        layout.addLayout(profile_layout)
+        self.refresh_profile_labels()
+
+        workers_layout = QHBoxLayout()
+        self.workers_label = QLabel("Transcription processes:")
+        self.workers_combo = QComboBox()
+        self.workers_combo.addItems(["1", "2", "4", "8", "Auto-tune"])
+        self.workers_combo.setToolTip("Run several model copies in parallel, each with its own share of the CPU cores.")
+        workers_layout.addWidget(self.workers_label)
+        workers_layout.addWidget(self.workers_combo)
+        layout.addLayout(workers_layout)
+
+        batch_layout = QHBoxLayout()
+        self.batch_label = QLabel("Batch short clips (30 s or less):")
+        self.batch_combo = QComboBox()
+        self.batch_combo.addItems(["Off", "4", "8", "16", "32"])
+        self.batch_combo.setToolTip("Transcribe this many short clips together in a single model pass.")
+        batch_layout.addWidget(self.batch_label)
+        batch_layout.addWidget(self.batch_combo)
+        layout.addLayout(batch_layout)
+
+        order_layout = QHBoxLayout()
+        self.order_label = QLabel("Processing order:")
+        self.order_combo = QComboBox()
+        # Display text -> TranscriptionWorker schedule
+        self.order_choices = {"As found": "found", "Longest first": "longest", "Shortest first": "shortest"}
+        self.order_combo.addItems(list(self.order_choices))
+        self.order_combo.setToolTip("\"As found\" starts straight away. Longest first keeps parallel processes "
+                                    "evenly busy; shortest first gets the first transcripts out sooner.")
+        order_layout.addWidget(self.order_label)
+        order_layout.addWidget(self.order_combo)
+        layout.addLayout(order_layout)
+
         input_folder_layout = QHBoxLayout()
         self.input_folder_button = QPushButton("Select Input Folder")
         self.input_folder_button.clicked.connect(self.select_input_folder)
@@ -70,14 +140,46 @@ class TranscriptionApp(QWidget):
         self.timestamp_checkbox = QCheckBox("Include timestamps in transcription")
         layout.addWidget(self.timestamp_checkbox)
 
-        self.output_txt_radio = QRadioButton("Text Files (.txt)")
-        self.output_csv_radio = QRadioButton("Single CSV File (.csv)")
-        self.output_txt_radio.setChecked(True)
+        self.cache_checkbox = QCheckBox("Reuse saved transcripts for files that haven't changed")
+        self.cache_checkbox.setChecked(True)
+        layout.addWidget(self.cache_checkbox)
+
+        self.audio_cache_checkbox = QCheckBox("Keep decoded audio so re-runs (e.g. with another model) skip decoding")
+        self.audio_cache_checkbox.setChecked(False)
+        self.audio_cache_checkbox.setToolTip("Stored in the audio_cache folder; the least recently used recordings "
+                                             "are removed once it passes 8 GB.")
+        layout.addWidget(self.audio_cache_checkbox)
+
+        self.resume_checkbox = QCheckBox("Resume an unfinished job in the output folder")
+        self.resume_checkbox.setChecked(True)
+        layout.addWidget(self.resume_checkbox)
+
+        self.vad_checkbox = QCheckBox("Skip silence before transcribing (faster, fewer made-up lines)")
+        self.vad_checkbox.setToolTip("Detects speech from loudness and zero crossings and only sends the speech "
+                                     "to the model. Timestamps still match the original recording.")
+        layout.addWidget(self.vad_checkbox)
+
+        self.channels_checkbox = QCheckBox("Transcribe each audio channel on its own (stereo calls, multi-mic setups)")
+        self.channels_checkbox.setToolTip("Each speaker's channel is transcribed on its own and every line is labelled "
+                                          "with its channel. Channels with no speech are skipped.")
+        layout.addWidget(self.channels_checkbox)
+
+        self.distributed_checkbox = QCheckBox("Share the work with other computers using the same (shared) folders")
+        self.distributed_checkbox.setToolTip("Start a job with the same folders on each computer: they split the files "
+                                             "between them, and the last one to finish writes the combined output.")
+        layout.addWidget(self.distributed_checkbox)
+
+        self.watch_checkbox = QCheckBox("Keep watching the input folder and transcribe new files as they arrive")
+        layout.addWidget(self.watch_checkbox)
+
         self.output_type_group = QButtonGroup()
-        self.output_type_group.addButton(self.output_txt_radio)
-        self.output_type_group.addButton(self.output_csv_radio)
-        layout.addWidget(self.output_txt_radio)
-        layout.addWidget(self.output_csv_radio)
+        self.output_radios = {}
+        for output_format, label in OUTPUT_FORMATS.items():
+            radio = QRadioButton(label)
+            self.output_radios[output_format] = radio
+            self.output_type_group.addButton(radio)
+            layout.addWidget(radio)
+        self.output_radios["txt"].setChecked(True)
 
         self.progress_bar = QProgressBar(self)
         self.progress_bar.setValue(0)
@@ -91,6 +193,11 @@ class TranscriptionApp(QWidget):
         self.transcribe_button.clicked.connect(self.start_transcription)
         layout.addWidget(self.transcribe_button)
 
+        self.stop_watching_button = QPushButton("Stop Watching")
+        self.stop_watching_button.clicked.connect(self.stop_watching)
+        self.stop_watching_button.setVisible(False)
+        layout.addWidget(self.stop_watching_button)
+
         self.setLayout(layout)
 
         # Disable main buttons until FFmpeg setup is complete
@@ -112,10 +219,35 @@ class TranscriptionApp(QWidget):
         self.input_folder_button.setEnabled(True)
         self.output_folder_button.setEnabled(True)
 
-    def update_status(self, message):
-        """Update the status message in the status label."""
-        self.current_status_label.setText(f"Current Status: {message}")
-        self.current_status_label.repaint()  # Force UI to refresh
+        # Start loading the selected model now, while the user is still picking folders
+        self.ffmpeg_ready = True
+        self.model_registry.prewarm(self.selected_model_name())
+
+    def selected_model_name(self):
+        """The model to load: the combo's choice, or its "-int8" variant when quantization is ticked."""
+        model_name = self.model_combo.currentText()
+        return model_name + QUANTIZED_SUFFIX if self.quantize_checkbox.isChecked() else model_name
+
+    def refresh_profile_labels(self):
+        """Show each profile's measured speed for the selected model."""
+        stats = ProfileStats()
+        model_name = self.selected_model_name()
+        for index in range(self.profile_combo.count()):
+            self.profile_combo.setItemText(index, stats.label(model_name, self.profile_combo.itemData(index)))
+
+    def selected_language(self):
+        """The language code to force, or None to detect it per file."""
+        text = self.language_combo.currentText().strip()
+        if self.language_combo.findText(text) == 0 or not text:
+            return None
+        return text.lower()
+
+    def on_model_changed(self, model_name):
+        """Prewarm a newly selected model, but only if it's already downloaded (browsing shouldn't fetch GBs)."""
+        if hasattr(self, "profile_combo"):
+            self.refresh_profile_labels()
+        if self.ffmpeg_ready:
+            self.model_registry.prewarm(model_name, allow_download=False)
 
     def style_label(self, label):
         label.setStyleSheet("border: 1px solid black; padding: 3px;")
@@ -158,9 +290,13 @@ class TranscriptionApp(QWidget):
 
         self.progress_bar.setValue(0)
 
-        model_name = self.model_combo.currentText()
+        model_name = self.selected_model_name()
         include_timestamps = self.timestamp_checkbox.isChecked()
-        output_format = "csv" if self.output_csv_radio.isChecked() else "txt"
+        output_format = next(output_format for output_format, radio in self.output_radios.items()
+                             if radio.isChecked())
+        autotune = self.workers_combo.currentText() == "Auto-tune"
+        processes = 1 if autotune else int(self.workers_combo.currentText())
+        batch_size = 1 if self.batch_combo.currentText() == "Off" else int(self.batch_combo.currentText())
 
         input_folder = normalize_path(self.input_folder_label.toolTip())
         output_folder = normalize_path(self.output_folder_label.toolTip())
@@ -170,9 +306,21 @@ class TranscriptionApp(QWidget):
             self.toggle_ui(True)
             return
 
-        self.worker = TranscriptionWorker(input_folder, output_folder, model_name, include_timestamps, output_format)
-        self.worker.update_status_signal.connect(self.update_status)
-        self.worker.update_progress_signal.connect(self.progress_bar.setValue)
+        self.worker = TranscriptionWorker(input_folder, output_folder, model_name, include_timestamps, output_format,
+                                          processes=processes, autotune=autotune,
+                                          use_cache=self.cache_checkbox.isChecked(),
+                                          cache_audio=self.audio_cache_checkbox.isChecked(),
+                                          resume=self.resume_checkbox.isChecked(),
+                                          model_registry=self.model_registry,
+                                          batch_size=batch_size,
+                                          schedule=self.order_choices[self.order_combo.currentText()],
+                                          watch=self.watch_checkbox.isChecked(),
+                                          distributed=self.distributed_checkbox.isChecked(),
+                                          vad_options={} if self.vad_checkbox.isChecked() else None,
+                                          split_channels=self.channels_checkbox.isChecked(),
+                                          decoding_profile=self.profile_combo.currentData(),
+                                          language=self.selected_language())
+        self.worker.progress_signal.connect(self.on_progress)
         self.worker.error_signal.connect(self.show_error_message)
         self.worker.transcription_complete_signal.connect(self.on_transcription_complete)
 
@@ -180,37 +328,76 @@ class TranscriptionApp(QWidget):
 
     def toggle_ui(self, enable):
         self.model_combo.setEnabled(enable)
+        self.quantize_checkbox.setEnabled(enable)
+        self.profile_combo.setEnabled(enable)
+        self.language_combo.setEnabled(enable)
+        self.workers_combo.setEnabled(enable)
+        self.batch_combo.setEnabled(enable)
+        self.order_combo.setEnabled(enable)
         self.input_folder_button.setEnabled(enable)
         self.output_folder_button.setEnabled(enable)
         self.timestamp_checkbox.setEnabled(enable)
-        self.output_txt_radio.setEnabled(enable)
-        self.output_csv_radio.setEnabled(enable)
+        self.cache_checkbox.setEnabled(enable)
+        self.audio_cache_checkbox.setEnabled(enable)
+        self.resume_checkbox.setEnabled(enable)
+        self.vad_checkbox.setEnabled(enable)
+        self.channels_checkbox.setEnabled(enable)
+        self.watch_checkbox.setEnabled(enable)
+        self.distributed_checkbox.setEnabled(enable)
+        # Only shown while a watching job is running
+        self.stop_watching_button.setVisible(not enable and self.watch_checkbox.isChecked())
+        self.stop_watching_button.setEnabled(True)
+        for radio in self.output_radios.values():
+            radio.setEnabled(enable)
         self.transcribe_button.setEnabled(enable)
 
+    def stop_watching(self):
+        self.stop_watching_button.setEnabled(False)
+        self.update_status("Stopping after the current file...")
+        self.worker.stop_watching()
+
     def update_status(self, message):
+        """Update the status message in the status label."""
         self.current_status_label.setText(f"Current Status: {message}")
-        self.current_status_label.repaint()
+
+    def on_progress(self, snapshot):
+        """Apply a (rate-limited) progress snapshot from the worker to the status label and progress bar."""
+        self.progress_bar.setValue(snapshot["percent"])
+        self.update_status(format_progress(snapshot))
 
     def show_error_message(self, error_message):
         """Show an error message in a dialog box."""
         QMessageBox.critical(self, "Error", error_message)
         self.toggle_ui(True)
 
+    def skipped_silence_note(self):
+        """' Skipped N min of silence (P%).' after a job with silence skipping on, else ''."""
+        totals = self.worker.vad_totals
+        if not totals or not totals["audio_seconds"]:
+            return ""
+        share = totals["skipped_seconds"] / totals["audio_seconds"] * 100
+        return f" Skipped {totals['skipped_seconds'] / 60:.1f} min of silence ({share:.0f}% of the audio)."
+
     def on_transcription_complete(self):
-        self.update_status("Transcription complete!")
+        self.update_status("Transcription complete!" + self.skipped_silence_note())
         self.toggle_ui(True)
+        self.refresh_profile_labels()
 
         # Show a message box when transcription is complete
         msg_box = QMessageBox()
         msg_box.setIcon(QMessageBox.Information)
         msg_box.setWindowTitle("Transcription Complete")
-        msg_box.setText("Transcription complete!")
+        msg_box.setText("Transcription complete!" + self.skipped_silence_note())
         msg_box.setStandardButtons(QMessageBox.Ok)
         msg_box.exec_()  # Display the message box
 
 
 
 if __name__ == '__main__':
+    # Needed so the transcription process pool works from a PyInstaller build
+    multiprocessing.freeze_support()
+    redirect_logs()
+
     app = QApplication(sys.argv)
 
     # Set the global application icon (for the taskbar)
@@ -0,0 +1,363 @@
+"""Offline, reproducible benchmark for the Whispering Wizard transcription pipeline.
+
+Everything runs headlessly (no Qt) against a synthetic corpus generated by the local ffmpeg:
+
+    python benchmarks/pipeline_benchmark.py corpus  --out bench_corpus
+    python benchmarks/pipeline_benchmark.py run     --corpus bench_corpus --models stub tiny base --json results.json
+    python benchmarks/pipeline_benchmark.py compare --baseline baseline.json --current results.json
+
+Each run is a real TranscriptionEngine job (discovery, prefetching, streaming, writers and
+manifest), with stage timings read back from its metrics file. The model "stub" stands in
+for whisper, so changes to the pipeline around the model can be measured on their own.
+`run` benchmarks each model in its own subprocess so peak RSS is measured per model size.
+`compare` exits non-zero if any metric regressed by more than --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import subprocess
+import tempfile
+
+# Let the script run from a source checkout without installing anything
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from transcription.decode_audio import SAMPLE_RATE  # noqa: E402
+from transcription.TranscriptionEngine import TranscriptionEngine  # noqa: E402
+
+# 2: timings come from a TranscriptionEngine job rather than a separate decode/transcribe loop
+RESULTS_VERSION = 2
+
+# Benchmarks the pipeline with StubModel in place of whisper
+STUB_MODEL = "stub"
+# StubModel returns one segment per this many seconds of audio
+STUB_SEGMENT_SECONDS = 5
+
+# Container -> ffmpeg codec arguments. Video containers get a tiny black video track.
+CONTAINER_CODECS = {
+    "wav": ["-c:a", "pcm_s16le"],
+    "flac": ["-c:a", "flac"],
+    "mp3": ["-c:a", "libmp3lame", "-b:a", "64k"],
+    "m4a": ["-c:a", "aac", "-b:a", "64k"],
+    "ogg": ["-c:a", "libvorbis", "-q:a", "3"],
+    "mp4": ["-c:v", "mpeg4", "-c:a", "aac", "-b:a", "64k"],
+    "mkv": ["-c:v", "mpeg4", "-c:a", "flac"],
+    "webm": ["-c:v", "libvpx", "-c:a", "libopus", "-b:a", "48k"],
+    "mov": ["-c:v", "mpeg4", "-c:a", "aac", "-b:a", "64k"],
+    "avi": ["-c:v", "mpeg4", "-c:a", "libmp3lame", "-b:a", "64k"],
+}
+VIDEO_CONTAINERS = {"mp4", "mkv", "webm", "mov", "avi"}
+
+# name -> (number of files, (min seconds, max seconds))
+CORPUS_SHAPES = {
+    "many-short": (40, (5, 30)),
+    "few-long": (3, (300, 900)),
+}
+
+# Watched metrics: (key, True if bigger is better)
+WATCHED_METRICS = [
+    ("wall_seconds", False),
+    ("real_time_factor", False),
+    ("files_per_second", True),
+    ("peak_rss_mb", False),
+    ("stages.load_model", False),
+    ("stages.decode", False),
+    ("stages.transcribe", False),
+    ("stages.write", False),
+]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where it can't be measured."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except (ImportError, AttributeError):
+            return None
+
+
+def ffmpeg_version():
+    try:
+        output = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout
+        return output.splitlines()[0] if output else None
+    except OSError:
+        return None
+
+
+def synth_sources(rng, duration):
+    """A deterministic mix of tone, pink noise and silence segments adding up to `duration` seconds."""
+    sources = []
+    remaining = duration
+    while remaining > 0:
+        length = min(remaining, rng.uniform(1.0, 8.0))
+        kind = rng.choice(["tone", "noise", "silence"])
+        if kind == "tone":
+            spec = f"sine=frequency={rng.choice([220, 330, 440, 660, 880])}:sample_rate=16000:duration={length:.3f}"
+        elif kind == "noise":
+            spec = (f"anoisesrc=color=pink:seed={rng.randrange(1 << 30)}:amplitude={rng.uniform(0.02, 0.2):.3f}"
+                    f":sample_rate=16000:duration={length:.3f}")
+        else:
+            spec = f"anullsrc=channel_layout=mono:sample_rate=16000,atrim=duration={length:.3f}"
+        sources.append(spec)
+        remaining -= length
+    return sources
+
+
+def generate_file(path, container, duration, rng):
+    sources = synth_sources(rng, duration)
+    command = ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y"]
+    for spec in sources:
+        command += ["-f", "lavfi", "-i", spec]
+    audio_inputs = "".join(f"[{i}:a]" for i in range(len(sources)))
+    filter_graph = f"{audio_inputs}concat=n={len(sources)}:v=0:a=1[a]"
+    maps = ["-map", "[a]"]
+
+    if container in VIDEO_CONTAINERS:
+        command += ["-f", "lavfi", "-i", f"color=c=black:s=128x72:r=5:d={duration:.3f}"]
+        maps += ["-map", f"{len(sources)}:v"]
+
+    command += ["-filter_complex", filter_graph] + maps + CONTAINER_CODECS[container]
+    # Bit-exact output so the same seed always gives byte-identical files
+    command += ["-fflags", "+bitexact", "-flags:a", "+bitexact", "-flags:v", "+bitexact", "-t", f"{duration:.3f}",
+                path]
+    subprocess.run(command, check=True)
+
+
+def generate_corpus(out_dir, shapes, containers, seed):
+    rng = random.Random(seed)
+    manifest = []
+    for shape in shapes:
+        count, (min_seconds, max_seconds) = CORPUS_SHAPES[shape]
+        shape_dir = os.path.join(out_dir, shape)
+        os.makedirs(shape_dir, exist_ok=True)
+        for i in range(count):
+            container = containers[i % len(containers)]
+            duration = round(rng.uniform(min_seconds, max_seconds), 2)
+            path = os.path.join(shape_dir, f"{shape}-{i:03d}.{container}")
+            generate_file(path, container, duration, rng)
+            manifest.append({"path": os.path.relpath(path, out_dir), "shape": shape, "container": container,
+                             "duration": duration})
+            print(f"generated {path} ({duration:.1f}s)")
+
+    with open(os.path.join(out_dir, "corpus.json"), "w", encoding="utf-8") as corpus_file:
+        json.dump({"seed": seed, "files": manifest}, corpus_file, indent=1)
+
+
+class StubModel:
+    """Stands in for a whisper model: answers instantly (or at `real_time_factor`) with one
+    segment per STUB_SEGMENT_SECONDS of audio, so only the pipeline around the model is timed."""
+
+    def __init__(self, real_time_factor=0.0):
+        self.real_time_factor = real_time_factor
+
+    def transcribe(self, audio, **options):
+        seconds = len(audio) / SAMPLE_RATE
+        if self.real_time_factor:
+            time.sleep(seconds * self.real_time_factor)
+        segments = []
+        start = 0.0
+        while start < seconds:
+            end = min(start + STUB_SEGMENT_SECONDS, seconds)
+            segments.append({"id": len(segments), "start": start, "end": end, "text": f" Segment {len(segments)}."})
+            start = end
+        return {"text": "".join(segment["text"] for segment in segments), "segments": segments,
+                "language": options.get("language") or "en"}
+
+
+class StubRegistry:
+    """The part of ModelRegistry the engine uses, always handing out the same (already loaded) model."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def is_loaded(self, model_name):
+        return True
+
+    def get(self, model_name):
+        return self.model
+
+
+def benchmark_model(corpus_dir, model_name, shape, prefetch_depth, stub_real_time_factor=0.0):
+    """Run one TranscriptionEngine job over the corpus (or one shape of it) and return its metrics."""
+    corpus_dir = os.path.abspath(corpus_dir)
+    with open(os.path.join(corpus_dir, "corpus.json"), encoding="utf-8") as corpus_file:
+        corpus = json.load(corpus_file)
+    entries = [entry for entry in corpus["files"] if shape in (None, entry["shape"])]
+    audio_seconds = sum(entry["duration"] for entry in entries)
+
+    registry = StubRegistry(StubModel(stub_real_time_factor)) if model_name == STUB_MODEL else None
+    with tempfile.TemporaryDirectory() as out_dir:
+        # Real models are downloaded to (and loaded from) the checkout's whisper_models folder, as the
+        # app does; stub runs keep the engine's logs out of the checkout, so the app's speed figures aren't skewed
+        os.chdir(REPO_ROOT if registry is None else out_dir)
+        metrics_path = os.path.join(out_dir, "metrics.jsonl")
+        output_folder = os.path.join(out_dir, "output")
+        os.makedirs(output_folder)
+        errors = []
+        # The app's CSV output; no caches or resume, so every run does the same work.
+        # Fixed language and greedy decoding keep runs comparable on non-speech audio.
+        engine = TranscriptionEngine(os.path.join(corpus_dir, shape) if shape else corpus_dir,
+                                     output_folder, model_name, include_timestamps=True,
+                                     output_format="csv", prefetch_depth=prefetch_depth, use_cache=False,
+                                     resume=False, model_registry=registry, metrics_path=metrics_path,
+                                     decoding_profile="fastest", language="en", on_error=errors.append)
+        start = time.perf_counter()
+        if not engine.run():
+            raise RuntimeError(errors[-1] if errors else "the benchmark job failed")
+        job_seconds = time.perf_counter() - start
+
+        with open(metrics_path, encoding="utf-8") as metrics_file:
+            records = [json.loads(line) for line in metrics_file]
+        # Windows can't delete the temp folder while it's the working directory
+        os.chdir(REPO_ROOT)
+
+    stages = {"load_model": 0.0, "decode": 0.0, "transcribe": 0.0, "write": 0.0}
+    files = segments = 0
+    for record in records:
+        if record["event"] == "job_stage" and record["stage"] == "load_model":
+            stages["load_model"] += record["seconds"]
+        elif record["event"] == "file":
+            files += 1
+            segments += record.get("segments") or 0
+            for stage, seconds in record["stages"].items():
+                stages[stage] = stages.get(stage, 0.0) + seconds
+    # Wall time is the pipeline's; model loading is reported as a stage of its own
+    pipeline_seconds = job_seconds - stages["load_model"]
+
+    peak_rss = peak_rss_mb()
+    return {
+        "model": model_name,
+        "shape": shape or "all",
+        "files": files,
+        "audio_seconds": round(audio_seconds, 2),
+        "segments": segments,
+        "wall_seconds": round(pipeline_seconds, 3),
+        # Stages overlap under prefetching, so their sum can exceed the wall time
+        "stages": {name: round(seconds, 3) for name, seconds in stages.items()},
+        "real_time_factor": round(pipeline_seconds / audio_seconds, 4) if audio_seconds else None,
+        "files_per_second": round(files / pipeline_seconds, 3) if pipeline_seconds else None,
+        "peak_rss_mb": round(peak_rss, 1) if peak_rss is not None else None,
+    }
+
+
+def run_benchmarks(args):
+    results = {
+        "version": RESULTS_VERSION,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "ffmpeg": ffmpeg_version(),
+        },
+        "runs": [],
+    }
+    shapes = args.shapes or [None]
+    for model_name in args.models:
+        for shape in shapes:
+            # A fresh interpreter per model keeps peak RSS and warm caches from leaking between runs
+            command = [sys.executable, os.path.abspath(__file__), "run-one", "--corpus", args.corpus,
+                       "--model", model_name, "--prefetch-depth", str(args.prefetch_depth),
+                       "--stub-rtf", str(args.stub_rtf)]
+            if shape:
+                command += ["--shape", shape]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            run = json.loads(output.strip().splitlines()[-1])
+            results["runs"].append(run)
+            print(f"{model_name:>8} {run['shape']:>10}: {run['wall_seconds']:.1f}s wall, "
+                  f"RTF {run['real_time_factor']}, {run['files_per_second']} files/s, "
+                  f"peak RSS {run['peak_rss_mb']} MB")
+
+    with open(args.json, "w", encoding="utf-8") as results_file:
+        json.dump(results, results_file, indent=1)
+
+
+def metric(run, key):
+    value = run
+    for part in key.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare_results(baseline, current, tolerance):
+    """Return a list of human-readable regressions of `current` against `baseline`."""
+    baseline_runs = {(run["model"], run["shape"]): run for run in baseline["runs"]}
+    regressions = []
+    for run in current["runs"]:
+        base = baseline_runs.get((run["model"], run["shape"]))
+        if base is None:
+            continue
+        for key, higher_is_better in WATCHED_METRICS:
+            old, new = metric(base, key), metric(run, key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{run['model']}/{run['shape']} {key}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Whispering Wizard pipeline benchmark")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    corpus = commands.add_parser("corpus", help="generate the synthetic corpus")
+    corpus.add_argument("--out", default="bench_corpus")
+    corpus.add_argument("--shapes", nargs="+", default=list(CORPUS_SHAPES), choices=list(CORPUS_SHAPES))
+    corpus.add_argument("--containers", nargs="+", default=["wav", "flac", "mp3", "m4a", "ogg", "mp4", "mkv", "webm"],
+                        choices=list(CONTAINER_CODECS))
+    corpus.add_argument("--seed", type=int, default=1234)
+
+    run = commands.add_parser("run", help="benchmark one or more models on a corpus")
+    run.add_argument("--corpus", default="bench_corpus")
+    run.add_argument("--models", nargs="+", default=[STUB_MODEL, "tiny", "base"],
+                     help=f'whisper model names, or "{STUB_MODEL}" to time the pipeline alone')
+    run.add_argument("--shapes", nargs="+", choices=list(CORPUS_SHAPES))
+    run.add_argument("--prefetch-depth", type=int, default=2)
+    run.add_argument("--stub-rtf", type=float, default=0.0,
+                     help="seconds the stub model spends per second of audio (default 0: instant)")
+    run.add_argument("--json", default="bench_results.json")
+
+    run_one = commands.add_parser("run-one", help=argparse.SUPPRESS)
+    run_one.add_argument("--corpus", required=True)
+    run_one.add_argument("--model", required=True)
+    run_one.add_argument("--shape")
+    run_one.add_argument("--prefetch-depth", type=int, default=2)
+    run_one.add_argument("--stub-rtf", type=float, default=0.0)
+
+    compare = commands.add_parser("compare", help="flag regressions against a stored baseline")
+    compare.add_argument("--baseline", required=True)
+    compare.add_argument("--current", required=True)
+    compare.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown (0.10 = 10%%)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "corpus":
+        generate_corpus(args.out, args.shapes, args.containers, args.seed)
+    elif args.command == "run":
+        run_benchmarks(args)
+    elif args.command == "run-one":
+        print(json.dumps(benchmark_model(args.corpus, args.model, args.shape, args.prefetch_depth, args.stub_rtf)))
+    elif args.command == "compare":
+        with open(args.baseline, encoding="utf-8") as baseline_file, \
+                open(args.current, encoding="utf-8") as current_file:
+            regressions = compare_results(json.load(baseline_file), json.load(current_file), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if not regressions:
+            print("No regressions.")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
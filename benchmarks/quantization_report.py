@@ -0,0 +1,186 @@
+"""Accuracy/speed report for the int8-quantized CPU models against fp32.
+
+Point it at a folder of local reference recordings. A transcript next to a recording
+(`talk.mp3` + `talk.txt`) is used as ground truth when present:
+
+    python benchmarks/quantization_report.py --references my_reference_set --model small --json quant.json
+
+fp32 and int8 each run in their own subprocess on the CPU, so peak RSS is measured per
+variant. The report gives the transcription speedup, the RSS reduction, the word error
+rate of int8 measured against fp32 (the drift quantization introduces), and each variant's
+WER against the reference transcripts where those exist.
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from transcription.decode_audio import decode_audio  # noqa: E402
+from transcription.file_discovery import SUPPORTED_EXTENSIONS, iter_media_files  # noqa: E402
+from transcription.quantized_model import QUANTIZED_SUFFIX, load_model  # noqa: E402
+from pipeline_benchmark import peak_rss_mb  # noqa: E402
+
+
+def reference_files(reference_dir):
+    return sorted(iter_media_files(reference_dir, SUPPORTED_EXTENSIONS))
+
+
+def words(text):
+    """Lowercased words without punctuation, so WER only counts real word differences."""
+    return re.findall(r"[\w']+", text.lower())
+
+
+def edit_distance(reference, hypothesis):
+    """Word-level Levenshtein distance."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, reference_word in enumerate(reference, 1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hypothesis_word in enumerate(hypothesis, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + (reference_word != hypothesis_word))
+        previous = current
+    return previous[-1]
+
+
+def word_error_rate(references, hypotheses):
+    """Corpus WER: total edits over total reference words, for parallel lists of texts."""
+    errors = total = 0
+    for reference, hypothesis in zip(references, hypotheses):
+        reference_words = words(reference)
+        errors += edit_distance(reference_words, words(hypothesis))
+        total += len(reference_words)
+    return round(errors / total, 4) if total else None
+
+
+def transcribe_variant(reference_dir, model_name, language):
+    """Load one model variant on the CPU and transcribe the whole reference set with it."""
+    model_dir = os.path.join(REPO_ROOT, "whisper_models")
+    start = time.perf_counter()
+    model = load_model(model_name, model_dir, device="cpu")
+    load_seconds = time.perf_counter() - start
+
+    transcripts = {}
+    audio_seconds = transcribe_seconds = 0.0
+    for path in reference_files(reference_dir):
+        audio = decode_audio(path)
+        audio_seconds += len(audio) / 16000
+        start = time.perf_counter()
+        # Greedy, fixed decoding so both variants are compared on equal terms
+        result = model.transcribe(audio, verbose=None, language=language, temperature=0.0, fp16=False)
+        transcribe_seconds += time.perf_counter() - start
+        transcripts[os.path.relpath(path, reference_dir)] = result["text"].strip()
+
+    peak_rss = peak_rss_mb()
+    return {
+        "model": model_name,
+        "load_seconds": round(load_seconds, 3),
+        "transcribe_seconds": round(transcribe_seconds, 3),
+        "audio_seconds": round(audio_seconds, 2),
+        "real_time_factor": round(transcribe_seconds / audio_seconds, 4) if audio_seconds else None,
+        "peak_rss_mb": round(peak_rss, 1) if peak_rss is not None else None,
+        "transcripts": transcripts,
+    }
+
+
+def run_variant(reference_dir, model_name, language):
+    command = [sys.executable, os.path.abspath(__file__), "run-one", "--references", reference_dir,
+               "--model", model_name]
+    if language:
+        command += ["--language", language]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def ground_truth(reference_dir, names):
+    """{relative path: reference text} for the recordings that have a .txt transcript next to them."""
+    truth = {}
+    for name in names:
+        transcript_path = os.path.splitext(os.path.join(reference_dir, name))[0] + ".txt"
+        if os.path.exists(transcript_path):
+            with open(transcript_path, encoding="utf-8-sig") as transcript_file:
+                truth[name] = transcript_file.read()
+    return truth
+
+
+def build_report(fp32, int8, truth):
+    names = sorted(fp32["transcripts"])
+    report = {
+        "model": fp32["model"],
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count()},
+        "files": len(names),
+        "audio_seconds": fp32["audio_seconds"],
+        "speedup": (round(fp32["transcribe_seconds"] / int8["transcribe_seconds"], 3)
+                    if int8["transcribe_seconds"] else None),
+        "rss_reduction": (round(1 - int8["peak_rss_mb"] / fp32["peak_rss_mb"], 4)
+                          if fp32["peak_rss_mb"] and int8["peak_rss_mb"] else None),
+        # int8 scored against fp32's own output: how far quantization moved the transcripts
+        "wer_drift": word_error_rate([fp32["transcripts"][name] for name in names],
+                                     [int8["transcripts"].get(name, "") for name in names]),
+        "reference_files": len(truth),
+        "variants": {},
+    }
+    for variant in (fp32, int8):
+        summary = {key: value for key, value in variant.items() if key != "transcripts"}
+        summary["wer_vs_reference"] = word_error_rate([truth[name] for name in sorted(truth)],
+                                                      [variant["transcripts"].get(name, "")
+                                                       for name in sorted(truth)])
+        report["variants"][variant["model"]] = summary
+    return report
+
+
+def print_report(report):
+    print(f"{report['model']}: {report['files']} files, {report['audio_seconds']:.0f}s of audio")
+    for name, variant in report["variants"].items():
+        wer = variant["wer_vs_reference"]
+        print(f"  {name:>14}: load {variant['load_seconds']:.1f}s, transcribe {variant['transcribe_seconds']:.1f}s "
+              f"(RTF {variant['real_time_factor']}), peak RSS {variant['peak_rss_mb']} MB"
+              + (f", WER {wer:.2%}" if wer is not None else ""))
+    if report["speedup"] is not None:
+        print(f"  speedup x{report['speedup']}")
+    if report["rss_reduction"] is not None:
+        print(f"  RSS reduction {report['rss_reduction']:.1%}")
+    if report["wer_drift"] is not None:
+        print(f"  WER drift (int8 vs fp32) {report['wer_drift']:.2%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare int8-quantized and fp32 Whisper models on the CPU")
+    commands = parser.add_subparsers(dest="command")
+
+    run_one = commands.add_parser("run-one", help=argparse.SUPPRESS)
+    run_one.add_argument("--references", required=True)
+    run_one.add_argument("--model", required=True)
+    run_one.add_argument("--language")
+
+    parser.add_argument("--references", help="folder of reference recordings (with optional .txt transcripts)")
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--language", help="fix the language instead of detecting it per file")
+    parser.add_argument("--json", default="quantization_report.json")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run-one":
+        print(json.dumps(transcribe_variant(args.references, args.model, args.language)))
+        return 0
+
+    if not args.references:
+        parser.error("--references is required")
+    fp32 = run_variant(args.references, args.model, args.language)
+    int8 = run_variant(args.references, args.model + QUANTIZED_SUFFIX, args.language)
+    report = build_report(fp32, int8, ground_truth(args.references, fp32["transcripts"]))
+    print_report(report)
+    with open(args.json, "w", encoding="utf-8") as report_file:
+        json.dump(report, report_file, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+import os
+import re
+import sys
+import time
+import shutil
+import hashlib
+import tarfile
+import zipfile
+import platform
+import subprocess
+from pathlib import Path
+
+# Oldest system FFmpeg we'll use; the decoding commands need nothing newer
+MIN_FFMPEG_VERSION = (4, 0)
+
+# 1 MB reads: a few dozen progress updates for a whole archive instead of one per KB
+DOWNLOAD_CHUNK_BYTES = 1 << 20
+PROGRESS_INTERVAL_SECONDS = 0.1
+DOWNLOAD_ATTEMPTS = 4
+
+# Lets a fleet of installs (or a test run) share one archive folder or mirror without passing options
+ARCHIVE_DIR_VARIABLE = "WW_FFMPEG_ARCHIVE_DIR"
+MIRROR_VARIABLE = "WW_FFMPEG_MIRROR"
+
+# Archives of static builds, per (system, architecture), with each site's published checksum where it has one
+FFMPEG_BUILDS = {
+    ("Windows", "amd64"): {
+        "url": "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip",
+        "checksum_url": "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip.sha256",
+        "algorithm": "sha256",
+    },
+    # evermeet.cx only builds for Intel Macs; Apple silicon runs it through Rosetta
+    ("Darwin", "amd64"): {"url": "https://evermeet.cx/ffmpeg/getrelease/zip", "filename": "ffmpeg-macos.zip"},
+    ("Darwin", "arm64"): {"url": "https://evermeet.cx/ffmpeg/getrelease/zip", "filename": "ffmpeg-macos.zip"},
+}
+for _arch in ("amd64", "i686", "arm64", "armhf", "armel"):
+    FFMPEG_BUILDS[("Linux", _arch)] = {
+        "url": f"https://johnvansickle.com/ffmpeg/releases/ffmpeg-release-{_arch}-static.tar.xz",
+        "checksum_url": f"https://johnvansickle.com/ffmpeg/releases/ffmpeg-release-{_arch}-static.tar.xz.md5",
+        "algorithm": "md5",
+    }
+
+ARCHITECTURES = {
+    "x86_64": "amd64", "amd64": "amd64",
+    "aarch64": "arm64", "arm64": "arm64", "armv8l": "arm64",
+    "i386": "i686", "i686": "i686", "x86": "i686",
+    "armv7l": "armhf", "armv6l": "armel",
+}
+
+
+def default_install_dir():
+    """The ffmpeg folder next to the app (or next to this package when run from source)."""
+    if getattr(sys, 'frozen', False):
+        return Path(sys.executable).parent / "ffmpeg"
+    return Path(os.path.dirname(os.path.abspath(__file__))) / "ffmpeg"
+
+
+def executable_name(tool):
+    return tool + ".exe" if platform.system() == "Windows" else tool
+
+
+def ffmpeg_version(executable):
+    """(major, minor) of an ffmpeg binary; (0, 0) for a git snapshot build, None if it doesn't run."""
+    try:
+        output = subprocess.run([str(executable), "-hide_banner", "-version"], capture_output=True, text=True,
+                                timeout=15).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    first_line = output.splitlines()[0] if output else ""
+    if not first_line.startswith("ffmpeg version"):
+        return None
+    match = re.match(r"ffmpeg version n?(\d+)\.(\d+)", first_line)
+    # Snapshot builds ("N-112171-g...") have no release number but are newer than any release
+    return (int(match.group(1)), int(match.group(2))) if match else (0, 0)
+
+
+def is_recent_enough(version):
+    return version is not None and (version == (0, 0) or version >= MIN_FFMPEG_VERSION)
+
+
+def file_digest(path, algorithm):
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as archive:
+        for chunk in iter(lambda: archive.read(DOWNLOAD_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FFmpegProvisioner:
+    """Makes sure ffmpeg can be run, downloading a static build only when there's no usable one.
+
+    In order, it uses:
+      1. a copy it installed earlier in `install_dir`;
+      2. an ffmpeg on PATH, if it runs and is at least MIN_FFMPEG_VERSION;
+      3. the build for this system and CPU from `archive_dir`, a local or shared folder of
+         archives (so a fleet of machines, or offline tests, never touch the network);
+      4. a download, from `mirror_url` if given (same file names as upstream) or the upstream site.
+
+    `archive_dir` and `mirror_url` default to the WW_FFMPEG_ARCHIVE_DIR and WW_FFMPEG_MIRROR
+    environment variables. An archive folder used offline needs each archive's checksum file
+    next to it (e.g. `ffmpeg-release-amd64-static.tar.xz.md5`); `python -m ffmpeg_tools
+    --download-only --archive-dir DIR` fills one.
+
+    Downloads go to a .part file that an interrupted download resumes with an HTTP Range
+    request, and are checked against the site's published checksum (zip archives also have
+    every member's CRC tested). With `archive_dir` set, downloaded archives are kept there
+    for the next install. Only the ffmpeg and ffprobe binaries are extracted.
+
+    Progress goes to plain callbacks, so this runs the same under Qt or a console.
+    """
+
+    def __init__(self, install_dir=None, archive_dir=None, mirror_url=None,
+                 on_progress=None, on_status=None, use_system_ffmpeg=True):
+        self.install_dir = Path(install_dir) if install_dir else default_install_dir()
+        archive_dir = archive_dir or os.environ.get(ARCHIVE_DIR_VARIABLE)
+        mirror_url = mirror_url or os.environ.get(MIRROR_VARIABLE)
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+        self.mirror_url = mirror_url.rstrip("/") if mirror_url else None
+        self.on_progress = on_progress
+        self.on_status = on_status
+        self.use_system_ffmpeg = use_system_ffmpeg
+
+    def status(self, message):
+        if self.on_status is not None:
+            self.on_status(message)
+
+    def progress(self, percent):
+        if self.on_progress is not None:
+            self.on_progress(percent)
+
+    @property
+    def ffmpeg_executable(self):
+        return self.install_dir / executable_name("ffmpeg")
+
+    def build(self):
+        """The FFMPEG_BUILDS entry for this machine, plus the archive's file name."""
+        system = platform.system()
+        architecture = ARCHITECTURES.get(platform.machine().lower())
+        build = FFMPEG_BUILDS.get((system, architecture))
+        if build is None:
+            raise RuntimeError(f"No FFmpeg build to download for {system} on {platform.machine()}; "
+                               f"install FFmpeg {MIN_FFMPEG_VERSION[0]}.{MIN_FFMPEG_VERSION[1]} or newer yourself.")
+        return dict(build, filename=build.get("filename", build["url"].rsplit("/", 1)[-1]))
+
+    def ensure(self):
+        """Make ffmpeg runnable as "ffmpeg"; returns the path of the binary that will be used."""
+        if is_recent_enough(ffmpeg_version(self.ffmpeg_executable)):
+            self.add_to_path(self.install_dir)
+            self.status("FFmpeg is already installed.")
+            return self.ffmpeg_executable
+
+        if self.use_system_ffmpeg:
+            system_ffmpeg = shutil.which("ffmpeg")
+            version = ffmpeg_version(system_ffmpeg) if system_ffmpeg else None
+            if is_recent_enough(version):
+                self.status(f"Using the FFmpeg already on this computer ({system_ffmpeg}).")
+                return Path(system_ffmpeg)
+            if system_ffmpeg:
+                self.status(f"The FFmpeg on this computer ({system_ffmpeg}) is too old or doesn't run; "
+                            "downloading a newer one.")
+
+        build = self.build()
+        archive = self.fetch_archive(build)
+        self.status("Extracting FFmpeg...")
+        self.extract(archive)
+        if self.archive_dir is None or archive.parent != self.archive_dir:
+            archive.unlink()
+        if not is_recent_enough(ffmpeg_version(self.ffmpeg_executable)):
+            raise RuntimeError(f"The downloaded FFmpeg ({self.ffmpeg_executable}) doesn't run on this computer.")
+
+        self.add_to_path(self.install_dir)
+        self.status("FFmpeg setup completed.")
+        return self.ffmpeg_executable
+
+    @staticmethod
+    def add_to_path(directory):
+        if str(directory) not in os.environ["PATH"].split(os.pathsep):
+            os.environ["PATH"] = str(directory) + os.pathsep + os.environ["PATH"]
+
+    def fetch_archive(self, build):
+        """A verified copy of the build's archive: from archive_dir if it has one, else downloaded."""
+        if self.archive_dir is not None:
+            cached = self.archive_dir / build["filename"]
+            if cached.exists():
+                self.status("Using the FFmpeg archive from the archive folder...")
+                try:
+                    self.verify(cached, build)
+                    return cached
+                except RuntimeError as e:
+                    self.status(f"Ignoring the archive folder's copy ({e}); downloading it again.")
+                    cached.unlink()
+                    if build.get("algorithm"):
+                        cached.with_name(f"{cached.name}.{build['algorithm']}").unlink(missing_ok=True)
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            destination = cached
+        else:
+            self.install_dir.mkdir(parents=True, exist_ok=True)
+            destination = self.install_dir / build["filename"]
+
+        self.download(self.source_url(build["url"], build["filename"]), destination)
+        try:
+            self.verify(destination, build)
+        except RuntimeError:
+            destination.unlink()
+            raise
+        return destination
+
+    def source_url(self, url, filename):
+        """`url`, or the file of the same name on the mirror."""
+        return url if self.mirror_url is None else f"{self.mirror_url}/{filename}"
+
+    def download(self, url, destination):
+        """Download `url` to `destination`, resuming from a .part file left by an earlier attempt."""
+        import requests
+
+        partial = destination.with_name(destination.name + ".part")
+        self.status("Downloading dependency: ffmpeg")
+        for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+            try:
+                self._download_once(requests, url, partial)
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                if attempt == DOWNLOAD_ATTEMPTS:
+                    raise RuntimeError(f"Downloading FFmpeg failed: {e}")
+                self.status(f"Download interrupted; resuming (attempt {attempt + 1} of {DOWNLOAD_ATTEMPTS})...")
+                time.sleep(attempt)
+        os.replace(partial, destination)
+
+    def _download_once(self, requests, url, partial):
+        have = partial.stat().st_size if partial.exists() else 0
+        headers = {"Range": f"bytes={have}-"} if have else {}
+        with requests.get(url, stream=True, headers=headers, timeout=(15, 60)) as response:
+            if response.status_code == 416:
+                # Range starts at the end: the earlier attempt already got every byte
+                return
+            response.raise_for_status()
+            if have and response.status_code != 206:
+                # The server ignored the Range header and is sending the whole file
+                have = 0
+            total = int(response.headers.get("content-length", 0)) + have
+            downloaded = have
+            last_percent, last_report = -1, 0.0
+            with open(partial, "ab" if have else "wb") as archive:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                    archive.write(chunk)
+                    downloaded += len(chunk)
+                    percent = int(downloaded * 100 / total) if total else 0
+                    now = time.monotonic()
+                    if percent != last_percent and (now - last_report >= PROGRESS_INTERVAL_SECONDS or percent == 100):
+                        self.progress(percent)
+                        self.status(f"Downloading ffmpeg... {downloaded / 1e6:.0f} of {total / 1e6:.0f} MB"
+                                    if total else f"Downloading ffmpeg... {downloaded / 1e6:.0f} MB")
+                        last_percent, last_report = percent, now
+            if total and downloaded < total:
+                raise requests.exceptions.ChunkedEncodingError(f"connection closed at {downloaded} of {total} bytes")
+
+    def verify(self, archive, build):
+        """Check the archive against the published checksum (local `<archive>.<algorithm>` files win)."""
+        algorithm = build.get("algorithm")
+        if algorithm is not None:
+            expected = self.expected_checksum(archive, build)
+            actual = file_digest(archive, algorithm)
+            if actual.lower() != expected.lower():
+                raise RuntimeError(f"The FFmpeg download is corrupt ({algorithm} {actual}, expected {expected}).")
+        if archive.suffix == ".zip":
+            with zipfile.ZipFile(archive) as zip_file:
+                bad_member = zip_file.testzip()
+            if bad_member is not None:
+                raise RuntimeError(f"The FFmpeg download is corrupt ({bad_member} fails its CRC check).")
+
+    def expected_checksum(self, archive, build):
+        sidecar = archive.with_name(f"{archive.name}.{build['algorithm']}")
+        if sidecar.exists():
+            text = sidecar.read_text(encoding="utf-8")
+        else:
+            import requests
+            response = requests.get(self.source_url(build["checksum_url"], sidecar.name), timeout=(15, 60))
+            response.raise_for_status()
+            text = response.text
+            if self.archive_dir is not None and archive.parent == self.archive_dir:
+                sidecar.write_text(text, encoding="utf-8")
+        match = re.search(r"\b[0-9a-fA-F]{32,128}\b", text)
+        if match is None:
+            raise RuntimeError(f"Couldn't read the FFmpeg {build['algorithm']} checksum.")
+        return match.group(0)
+
+    def extract(self, archive):
+        """Copy just the ffmpeg and ffprobe binaries out of the archive into install_dir."""
+        self.install_dir.mkdir(parents=True, exist_ok=True)
+        wanted = {executable_name("ffmpeg"), executable_name("ffprobe")}
+        found = set()
+        if archive.suffix == ".zip":
+            with zipfile.ZipFile(archive) as zip_file:
+                for member in zip_file.infolist():
+                    name = os.path.basename(member.filename)
+                    if name in wanted and name not in found and not member.is_dir():
+                        with zip_file.open(member) as source:
+                            self._install_binary(source, name)
+                        found.add(name)
+        else:
+            with tarfile.open(archive, "r:*") as tar_file:
+                for member in tar_file:
+                    name = os.path.basename(member.name)
+                    if name in wanted and name not in found and member.isfile():
+                        self._install_binary(tar_file.extractfile(member), name)
+                        found.add(name)
+                        if found == wanted:
+                            break
+        if executable_name("ffmpeg") not in found:
+            raise RuntimeError(f"No ffmpeg binary in {archive.name}.")
+
+    def _install_binary(self, source, name):
+        # Written under a temporary name first, so a half-extracted binary never looks installed
+        target = self.install_dir / name
+        temp_target = target.with_name(name + ".tmp")
+        with open(temp_target, "wb") as binary:
+            shutil.copyfileobj(source, binary, DOWNLOAD_CHUNK_BYTES)
+        temp_target.chmod(0o755)
+        os.replace(temp_target, target)
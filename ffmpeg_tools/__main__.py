@@ -0,0 +1,40 @@
+"""Set up FFmpeg without the app, e.g. while installing it on many machines.
+
+    python -m ffmpeg_tools
+    python -m ffmpeg_tools --download-only --archive-dir /mnt/share/ffmpeg-archives
+"""
+import sys
+import argparse
+
+from .FFmpegProvisioner import FFmpegProvisioner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ffmpeg_tools",
+                                     description="Find or install the FFmpeg that Whispering Wizard uses.")
+    parser.add_argument("--install-dir", help="where to put a downloaded FFmpeg (default: next to the app)")
+    parser.add_argument("--archive-dir", help="folder of FFmpeg archives to install from and keep downloads in")
+    parser.add_argument("--mirror", help="base URL of a mirror with the same archive file names")
+    parser.add_argument("--no-system", action="store_true", help="ignore an ffmpeg already on PATH")
+    parser.add_argument("--download-only", action="store_true",
+                        help="just fetch and verify this machine's archive into --archive-dir")
+    args = parser.parse_args(argv)
+
+    provisioner = FFmpegProvisioner(args.install_dir, args.archive_dir, args.mirror,
+                                    on_status=lambda message: print(message, file=sys.stderr, flush=True),
+                                    use_system_ffmpeg=not args.no_system)
+    try:
+        if args.download_only:
+            if provisioner.archive_dir is None:
+                parser.error("--download-only needs --archive-dir")
+            print(provisioner.fetch_archive(provisioner.build()))
+        else:
+            print(provisioner.ensure())
+    except (RuntimeError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
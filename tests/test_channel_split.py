@@ -0,0 +1,61 @@
+import numpy as np
+
+from transcription.channel_split import active_channels, merge_channel_results
+from transcription.decode_audio import SAMPLE_RATE
+
+
+def tone(seconds, amplitude=0.3, frequency=220.0):
+    t = np.arange(int(seconds * SAMPLE_RATE), dtype=np.float32) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def speech_like(seconds):
+    # Bursts of sound with pauses between them, so there is a quiet stretch to measure speech against
+    audio = tone(seconds)
+    for start in range(0, len(audio), SAMPLE_RATE * 2):
+        audio[start + SAMPLE_RATE:start + 2 * SAMPLE_RATE] = 0.0
+    return audio
+
+
+def result(*starts, language="en"):
+    return {"language": language, "segments": [{"start": s, "end": s + 1.0, "text": f" at {s}"} for s in starts]}
+
+
+def test_silent_channel_is_skipped():
+    kept, skipped = active_channels([speech_like(10), np.zeros(10 * SAMPLE_RATE, dtype=np.float32)])
+
+    assert [number for number, _ in kept] == [1]
+    assert skipped == [2]
+
+
+def test_duplicate_channel_is_skipped():
+    audio = speech_like(10)
+    kept, skipped = active_channels([audio, audio.copy()])
+
+    assert [number for number, _ in kept] == [1]
+    assert skipped == [2]
+
+
+def test_loudest_channel_is_kept_when_every_channel_looks_silent():
+    # Sound with no pauses has no quiet stretch to stand out from, so the detector alone would skip it
+    silent = np.zeros(10 * SAMPLE_RATE, dtype=np.float32)
+    kept, skipped = active_channels([silent, tone(10)])
+
+    assert [number for number, _ in kept] == [2]
+    assert skipped == [1]
+
+
+def test_merge_tags_and_orders_segments_by_channel():
+    merged = merge_channel_results([(1, result(0.0, 4.0)), (2, result(2.0))], skipped=[3])
+
+    assert [(s["start"], s["channel"]) for s in merged["segments"]] == [(0.0, 1), (2.0, 2), (4.0, 1)]
+    assert [s["id"] for s in merged["segments"]] == [0, 1, 2]
+    assert merged["skipped_channels"] == [3]
+
+
+def test_mono_file_is_passed_through_untagged():
+    mono = result(0.0, 1.0)
+    merged = merge_channel_results([(None, mono)])
+
+    assert merged is mono
+    assert all("channel" not in segment for segment in merged["segments"])
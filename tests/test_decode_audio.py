@@ -0,0 +1,21 @@
+import pytest
+
+from transcription.decode_audio import channel_count
+
+
+@pytest.mark.parametrize("layout, channels", [
+    ("mono", 1),
+    ("stereo", 2),
+    ("5.1", 6),
+    ("5.1(side)", 6),
+    ("7.1(wide)", 8),
+    ("3 channels", 3),
+    ("quad(side)", 4),
+])
+def test_channel_count_reads_ffmpeg_layout_names(layout, channels):
+    assert channel_count(layout) == channels
+
+
+@pytest.mark.parametrize("layout", ["fltp", "s16", "unknown layout"])
+def test_channel_count_is_none_for_anything_else(layout):
+    assert channel_count(layout) is None
@@ -0,0 +1,48 @@
+import time
+
+from transcription.FolderWatcher import FolderWatcher
+
+
+def make_watcher(folder):
+    watcher = FolderWatcher(str(folder), {".wav"}, settle_seconds=0, use_events=False).start()
+    assert watcher._baseline_done.wait(5)
+    return watcher
+
+
+def poll_until_settled(watcher):
+    # The first poll sees a new signature, the next one reports it if it held still
+    watcher.poll()
+    time.sleep(0.01)
+    return watcher.poll()
+
+
+def test_files_already_in_the_folder_are_not_reported(tmp_path):
+    (tmp_path / "old.wav").write_bytes(b"audio")
+    watcher = make_watcher(tmp_path)
+    try:
+        assert poll_until_settled(watcher) == []
+    finally:
+        watcher.stop()
+
+
+def test_new_and_changed_files_are_reported_once(tmp_path):
+    old = tmp_path / "old.wav"
+    old.write_bytes(b"audio")
+    watcher = make_watcher(tmp_path)
+    try:
+        (tmp_path / "new.wav").write_bytes(b"audio")
+        (tmp_path / "notes.txt").write_bytes(b"text")
+        assert poll_until_settled(watcher) == [str(tmp_path / "new.wav")]
+
+        old.write_bytes(b"longer audio")
+        assert poll_until_settled(watcher) == [str(old)]
+        assert poll_until_settled(watcher) == []
+    finally:
+        watcher.stop()
+
+
+def test_nothing_is_reported_before_the_baseline_is_recorded(tmp_path):
+    (tmp_path / "old.wav").write_bytes(b"audio")
+    watcher = FolderWatcher(str(tmp_path), {".wav"}, settle_seconds=0, use_events=False)
+    # Not started, so the folder's existing files haven't been recorded yet
+    assert watcher.poll() == []
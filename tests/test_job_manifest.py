@@ -0,0 +1,74 @@
+import json
+import os
+
+from transcription.JobManifest import JobManifest
+
+
+SETTINGS = {"model": "base", "output_format": "csv"}
+
+
+def new_manifest(folder, files=("a.wav", "b.wav", "c.wav")):
+    manifest = JobManifest.create(str(folder), SETTINGS, "out.csv")
+    manifest.add_files(list(files))
+    return manifest
+
+
+def saved_files(manifest):
+    with open(manifest.path, encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)["files"]
+
+
+def test_finished_files_go_to_the_log_not_the_manifest(tmp_path):
+    manifest = new_manifest(tmp_path)
+    manifest.mark_done(["a.wav"], {"part": 1, "offset": 10, "rows": 1})
+
+    assert os.path.exists(manifest.log_path)
+    assert saved_files(manifest)["a.wav"] == {"status": "pending"}
+    assert manifest.pending_files(["a.wav", "b.wav", "c.wav"]) == ["b.wav", "c.wav"]
+
+
+def test_resume_replays_the_log_and_folds_it_into_the_manifest(tmp_path):
+    manifest = new_manifest(tmp_path)
+    manifest.mark_done(["a.wav"], {"part": 1, "offset": 10, "rows": 1})
+    manifest.mark_done(["b.wav"], {"part": 1, "offset": 20, "rows": 2})
+
+    resumed = JobManifest.load_resumable(str(tmp_path), SETTINGS)
+
+    assert resumed.done_count() == 2
+    assert resumed.pending_files(["a.wav", "b.wav", "c.wav"]) == ["c.wav"]
+    assert resumed.output_checkpoint == {"part": 1, "offset": 20, "rows": 2}
+    assert not os.path.exists(resumed.log_path)
+    assert saved_files(resumed)["b.wav"]["status"] == "done"
+
+
+def test_a_torn_last_log_line_is_ignored(tmp_path):
+    manifest = new_manifest(tmp_path)
+    manifest.mark_done(["a.wav"], {"part": 1, "offset": 10, "rows": 1})
+    with open(manifest.log_path, "a", encoding="utf-8") as log_file:
+        log_file.write('{"files": ["b.wav"], "finished_at": "2026-')
+
+    resumed = JobManifest.load_resumable(str(tmp_path), SETTINGS)
+
+    assert resumed.pending_files(["a.wav", "b.wav", "c.wav"]) == ["b.wav", "c.wav"]
+    assert resumed.output_checkpoint == {"part": 1, "offset": 10, "rows": 1}
+
+
+def test_files_found_again_keep_their_status(tmp_path):
+    manifest = new_manifest(tmp_path)
+    manifest.mark_done(["a.wav"])
+    manifest.add_files(["a.wav", "d.wav"], save=False)
+
+    assert manifest.pending_files(["a.wav", "d.wav"]) == ["d.wav"]
+    assert "d.wav" not in saved_files(manifest)
+
+
+def test_only_an_unfinished_job_with_the_same_settings_resumes(tmp_path):
+    manifest = new_manifest(tmp_path)
+
+    assert JobManifest.load_resumable(str(tmp_path), dict(SETTINGS, model="small")) is None
+    manifest.mark_complete()
+    assert JobManifest.load_resumable(str(tmp_path), SETTINGS) is None
+
+
+def test_no_manifest_means_nothing_to_resume(tmp_path):
+    assert JobManifest.load_resumable(str(tmp_path), SETTINGS) is None
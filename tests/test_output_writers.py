@@ -0,0 +1,156 @@
+import csv
+import json
+
+from transcription.OutputWriters import CsvWriter, JsonlWriter, TxtWriter, render_transcript
+
+
+def segments(count, text="words"):
+    return [{"start": float(i), "end": i + 1.0, "text": f" {text} {i}"} for i in range(count)]
+
+
+def csv_rows(path):
+    with open(path, newline="", encoding="utf-8-sig") as csv_file:
+        return list(csv.reader(csv_file))[1:]
+
+
+def write_file(writer, name, count):
+    writer.write_segments(name, segments(count))
+    writer.end_file(name)
+
+
+def make_csv_writer(folder, checkpoints=None, **kwargs):
+    on_checkpoint = (lambda files, checkpoint: checkpoints.append((files, checkpoint))) if checkpoints is not None else None
+    # Nothing flushes on its own, so each test decides when rows reach the disk
+    kwargs.setdefault("buffer_rows", 10 ** 6)
+    kwargs.setdefault("flush_seconds", 10 ** 6)
+    return CsvWriter(str(folder), True, filename="out.csv", on_checkpoint=on_checkpoint, **kwargs)
+
+
+def test_file_that_would_overflow_a_part_starts_the_next_one(tmp_path):
+    writer = make_csv_writer(tmp_path, max_rows_per_part=100)
+    writer.open()
+    write_file(writer, "a.wav", 90)
+    writer.flush()
+    write_file(writer, "b.wav", 20)
+    writer.close()
+
+    assert len(csv_rows(writer.part_path(1))) == 90
+    assert {row[0] for row in csv_rows(writer.part_path(2))} == {"b.wav"}
+
+
+def test_small_files_buffered_together_are_split_between_parts(tmp_path):
+    writer = make_csv_writer(tmp_path, max_rows_per_part=50)
+    writer.open()
+    for i in range(30):
+        write_file(writer, f"clip{i:02d}.wav", 7)
+    writer.close()
+
+    parts = [csv_rows(writer.part_path(part)) for part in range(1, writer.part + 1)]
+    assert all(len(rows) <= 50 for rows in parts)
+    assert sum(len(rows) for rows in parts) == 210
+    # Parts are cut between files, never inside one
+    for rows in parts:
+        for name in {row[0] for row in rows}:
+            assert sum(row[0] == name for row in rows) == 7
+
+
+def test_a_file_larger_than_a_part_gets_a_part_of_its_own(tmp_path):
+    writer = make_csv_writer(tmp_path, max_rows_per_part=100)
+    writer.open()
+    write_file(writer, "a.wav", 10)
+    write_file(writer, "long.wav", 150)
+    write_file(writer, "b.wav", 10)
+    writer.close()
+
+    assert [len(csv_rows(writer.part_path(part))) for part in (1, 2, 3)] == [10, 150, 10]
+
+
+def test_streamed_parts_of_a_file_are_appended(tmp_path):
+    writer = make_csv_writer(tmp_path)
+    writer.open()
+    writer.write_segments("a.wav", segments(2))
+    writer.write_segments("a.wav", segments(3), append=True)
+    writer.end_file("a.wav")
+    writer.close()
+
+    assert len(csv_rows(writer.part_path(1))) == 5
+
+
+def test_unfinished_file_never_reaches_the_output(tmp_path):
+    writer = make_csv_writer(tmp_path)
+    writer.open()
+    write_file(writer, "a.wav", 2)
+    writer.write_segments("b.wav", segments(4))
+    writer.close()
+
+    assert {row[0] for row in csv_rows(writer.part_path(1))} == {"a.wav"}
+
+
+def test_flush_reports_completed_files_with_a_checkpoint(tmp_path):
+    checkpoints = []
+    writer = make_csv_writer(tmp_path, checkpoints)
+    writer.open()
+    write_file(writer, "a.wav", 3)
+    write_file(writer, "b.wav", 3)
+    writer.flush()
+    writer.close()
+
+    files = [name for reported, _ in checkpoints for name in reported]
+    assert files == ["a.wav", "b.wav"]
+    assert checkpoints[-1][1]["rows"] == 6
+
+
+def test_resume_drops_rows_and_parts_written_after_the_checkpoint(tmp_path):
+    checkpoints = []
+    writer = make_csv_writer(tmp_path, checkpoints, max_rows_per_part=10)
+    writer.open()
+    write_file(writer, "a.wav", 4)
+    writer.flush()
+    resume_from = checkpoints[-1][1]
+    # Written and flushed, but (as if the job died) the manifest never saw these checkpoints
+    write_file(writer, "b.wav", 4)
+    writer.flush()
+    write_file(writer, "c.wav", 4)
+    writer.flush()
+    writer._file.close()
+    assert writer.part == 2
+
+    resumed = make_csv_writer(tmp_path, max_rows_per_part=10)
+    resumed.open(resume_from)
+    write_file(resumed, "b.wav", 4)
+    write_file(resumed, "d.wav", 4)
+    resumed.close()
+
+    part1 = csv_rows(resumed.part_path(1))
+    part2 = csv_rows(resumed.part_path(2))
+    assert [row[0] for row in part1] == ["a.wav"] * 4 + ["b.wav"] * 4
+    assert [row[0] for row in part2] == ["d.wav"] * 4
+    assert not (tmp_path / "out (part 3).csv").exists()
+
+
+def test_jsonl_rows_carry_float_times_and_channel(tmp_path):
+    writer = JsonlWriter(str(tmp_path), True, filename="out.jsonl", channel_column=True)
+    writer.open()
+    writer.write_segments("call.wav", [{"start": 0, "end": 1.5, "text": " hi", "channel": 2}])
+    writer.end_file("call.wav")
+    writer.close()
+
+    with open(writer.part_path(1), encoding="utf-8") as jsonl_file:
+        assert [json.loads(line) for line in jsonl_file] == [
+            {"filename": "call.wav", "start": 0.0, "end": 1.5, "text": "hi", "channel": 2}]
+
+
+def test_txt_labels_channels_and_appends_streamed_parts(tmp_path):
+    writer = TxtWriter(str(tmp_path), False, channel_column=True)
+    writer.write_segments("call.wav", [{"start": 0, "end": 1, "text": " hello", "channel": 1}])
+    writer.write_segments("call.wav", [{"start": 1, "end": 2, "text": " there", "channel": 2}], append=True)
+    writer.end_file("call.wav")
+
+    with open(tmp_path / "call.wav.txt", encoding="utf-8-sig") as txt_file:
+        assert txt_file.read() == "[Channel 1] hello\n[Channel 2] there\n"
+
+
+def test_render_transcript_matches_the_csv_writer():
+    rendered = render_transcript("csv", "a.wav", segments(2))
+    assert rendered.splitlines() == ["filename,start_time,stop_time,text", "a.wav,0.0,1.0,words 0",
+                                     "a.wav,1.0,2.0,words 1"]
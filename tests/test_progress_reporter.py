@@ -0,0 +1,59 @@
+import time
+
+from transcription.ProgressReporter import ProgressReporter, format_progress
+
+
+def make_reporter(total_files=10, min_interval=60):
+    snapshots = []
+    return ProgressReporter(snapshots.append, total_files, min_interval=min_interval), snapshots
+
+
+def test_updates_inside_the_interval_are_held_back():
+    reporter, snapshots = make_reporter()
+    reporter.status("first", force=True)
+    for number in range(5):
+        reporter.status(f"update {number}")
+
+    assert [snapshot["message"] for snapshot in snapshots] == ["first"]
+    reporter.flush()
+    assert [snapshot["message"] for snapshot in snapshots] == ["first", "update 4"]
+
+
+def test_the_held_back_update_goes_out_when_the_interval_is_up():
+    reporter, snapshots = make_reporter(min_interval=0.05)
+    reporter.status("first", force=True)
+    reporter.status("latest")
+
+    time.sleep(0.3)
+    assert [snapshot["message"] for snapshot in snapshots] == ["first", "latest"]
+
+
+def test_the_last_file_is_reported_straight_away():
+    reporter, snapshots = make_reporter(total_files=2)
+    reporter.status("starting", force=True)
+    reporter.file_done(audio_seconds=10)
+    reporter.file_done(audio_seconds=10, message="done")
+
+    assert len(snapshots) == 2
+    assert snapshots[-1]["message"] == "done"
+    assert snapshots[-1]["percent"] == 100
+    assert snapshots[-1]["done_files"] == 2
+
+
+def test_snapshot_counts_the_current_file_towards_the_percentage():
+    reporter, _ = make_reporter(total_files=4)
+    reporter.file_done(audio_seconds=10)
+    reporter.file_started("b.wav", audio_seconds=10)
+    reporter.file_progress(0.5)
+
+    snapshot = reporter.snapshot()
+    assert snapshot["percent"] == 37
+    assert snapshot["file_percent"] == 50
+    assert snapshot["eta_seconds"] is not None
+
+
+def test_format_progress_leaves_out_what_is_unknown():
+    assert format_progress({"message": "Working", "done_files": 0, "total_files": 3}) == "Working"
+    line = format_progress({"message": "Working", "audio_seconds_per_second": 12.0, "eta_seconds": 3725,
+                            "done_files": 1, "total_files": 3})
+    assert line == "Working — 12.0x real time — about 1h 02m left"
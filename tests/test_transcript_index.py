@@ -0,0 +1,58 @@
+import pytest
+
+from transcription.TranscriptIndex import TranscriptIndex, fts_query, DEFAULT_INDEX_FILENAME
+
+
+def segment(start, text, channel=None):
+    return {"start": start, "end": start + 1.5, "text": text, "channel": channel}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = TranscriptIndex(str(tmp_path / DEFAULT_INDEX_FILENAME))
+    yield index
+    index.close()
+
+
+def test_fts_query_quotes_every_word_and_keeps_prefixes():
+    assert fts_query("budget meeting") == '"budget" "meeting"'
+    assert fts_query("budg* NEAR") == '"budg"* "NEAR"'
+    assert fts_query('say "hi" *') == '"say" "hi" "*"'
+    assert fts_query("   ") == ""
+
+
+def test_search_finds_segments_with_every_word(index, tmp_path):
+    index.add_files([(str(tmp_path / "call.wav"), [segment(0.0, " The quarterly budget is late."),
+                                                   segment(2.0, " Budget talks resume Monday.", channel=2)])],
+                    "base")
+
+    matches = index.search("budget late")
+    assert [(m["filename"], m["start_ms"], m["stop_ms"], m["text"]) for m in matches] == [
+        ("call.wav", 0, 1500, "The quarterly budget is late.")]
+    assert [m["channel"] for m in index.search("resum*")] == [2]
+    assert index.search("NEAR") == []
+    assert index.search("") == []
+
+
+def test_transcribing_again_replaces_only_the_same_models_transcript(index, tmp_path):
+    path = str(tmp_path / "call.wav")
+    index.add_files([(path, [segment(0.0, " old words")])], "base")
+    index.add_files([(path, [segment(0.0, " new words")])], "base")
+    index.add_files([(path, [segment(0.0, " other words")])], "small")
+
+    assert index.search("old") == []
+    assert {m["model"] for m in index.search("words")} == {"base", "small"}
+    assert [m["text"] for m in index.search("words", model="base")] == ["new words"]
+    assert index.counts() == (2, 2)
+
+
+def test_open_accepts_the_output_folder(index, tmp_path):
+    index.add_files([(str(tmp_path / "a.wav"), [segment(0.0, " hello")])], "base")
+
+    reopened = TranscriptIndex.open(str(tmp_path))
+    try:
+        assert [m["text"] for m in reopened.search("hello", filename="a.w")] == ["hello"]
+    finally:
+        reopened.close()
+    with pytest.raises(FileNotFoundError):
+        TranscriptIndex.open(str(tmp_path / "missing"))
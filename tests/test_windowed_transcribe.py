@@ -0,0 +1,65 @@
+import numpy as np
+
+from transcription.decode_audio import SAMPLE_RATE
+from transcription.windowed_transcribe import transcribe_in_windows
+
+
+class ScriptedModel:
+    """Stands in for a whisper model: returns one prepared result per window, in order."""
+
+    def __init__(self, *window_segments, language="en"):
+        self.results = [{"language": language, "segments": [{"start": start, "end": end, "text": text}
+                                                             for start, end, text in segments]}
+                        for segments in window_segments]
+        self.calls = []
+
+    def transcribe(self, audio, **options):
+        self.calls.append(options)
+        return self.results[len(self.calls) - 1]
+
+
+def windows(*offsets, window_seconds=10, last_seconds=8):
+    for number, offset in enumerate(offsets):
+        is_last = number == len(offsets) - 1
+        yield offset, np.zeros(int((last_seconds if is_last else window_seconds) * SAMPLE_RATE), np.float32), is_last
+
+
+def transcribe(model, offsets, **kwargs):
+    kwargs.setdefault("window_seconds", 10)
+    kwargs.setdefault("overlap_seconds", 4)
+    return transcribe_in_windows(model, "long.wav", {"verbose": None}, windows=windows(*offsets), **kwargs)
+
+
+def test_overlapping_windows_keep_each_segment_once():
+    model = ScriptedModel(
+        # Owns up to 8 s, the middle of its 6-10 s overlap with the next window
+        [(0, 3, " a"), (3, 6, " b"), (6, 9, " c"), (9, 10, " d")],
+        # Starts at 6 s: " c" again, then the same sentence heard again, then new speech
+        [(0, 3, " c"), (2.5, 4, " c"), (4, 6, " e"), (6, 8, " f")])
+
+    result = transcribe(model, [0, 6])
+
+    assert [(s["start"], s["end"], s["text"]) for s in result["segments"]] == [
+        (0, 3, " a"), (3, 6, " b"), (6, 9, " c"), (10, 12, " e"), (12, 14, " f")]
+    assert [s["id"] for s in result["segments"]] == [0, 1, 2, 3, 4]
+    assert result["text"] == " a b c e f"
+
+
+def test_later_windows_get_the_language_and_a_prompt_from_earlier_ones():
+    model = ScriptedModel([(0, 5, " hello there")], [(4, 6, " again")])
+    streamed = []
+
+    transcribe(model, [0, 6], on_segments=streamed.append)
+
+    assert "language" not in model.calls[0] and "initial_prompt" not in model.calls[0]
+    assert model.calls[1]["language"] == "en"
+    assert model.calls[1]["initial_prompt"] == " hello there"
+    assert [[s["text"] for s in batch] for batch in streamed] == [[" hello there"], [" again"]]
+
+
+def test_a_window_with_nothing_kept_still_moves_the_boundary_on():
+    model = ScriptedModel([], [(1, 2, " late")], [(3, 4, " end")])
+
+    result = transcribe(model, [0, 6, 12])
+
+    assert [(s["start"], s["text"]) for s in result["segments"]] == [(15, " end")]
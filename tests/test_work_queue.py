@@ -0,0 +1,101 @@
+import csv
+import os
+import time
+
+from transcription.OutputWriters import CsvWriter
+from transcription.WorkQueue import LeaseQueue, QueueResultWriter
+
+
+def make_inputs(folder, names=("a.wav", "b.wav")):
+    folder.mkdir(exist_ok=True)
+    paths = []
+    for name in names:
+        path = folder / name
+        path.write_bytes(b"audio " + name.encode())
+        paths.append(str(path))
+    return paths
+
+
+def make_queue(tmp_path, node_id, **kwargs):
+    return LeaseQueue(str(tmp_path / "input"), str(tmp_path / "queue"), node_id=node_id, **kwargs)
+
+
+def age(path, seconds):
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def result(text):
+    return {"text": text, "segments": [{"start": 0.0, "end": 1.0, "text": text}]}
+
+
+def test_only_one_node_can_hold_a_lease(tmp_path):
+    first, second = make_queue(tmp_path, "one"), make_queue(tmp_path, "two")
+
+    assert first.claim("a.wav")
+    assert not second.claim("a.wav")
+    first.release("a.wav")
+    assert second.claim("a.wav")
+
+
+def test_an_expired_lease_is_reclaimed(tmp_path):
+    first, second = make_queue(tmp_path, "one", lease_seconds=60), make_queue(tmp_path, "two", lease_seconds=60)
+    assert first.claim("a.wav")
+
+    age(first.lease_path("a.wav"), 30)
+    assert not second.claim("a.wav")
+    age(first.lease_path("a.wav"), 120)
+    assert second.claim("a.wav")
+    assert not [name for name in os.listdir(second.leases_dir) if name.endswith(".stale")]
+
+
+def test_renewing_keeps_a_lease_alive(tmp_path):
+    first, second = make_queue(tmp_path, "one", lease_seconds=60), make_queue(tmp_path, "two", lease_seconds=60)
+    assert first.claim("a.wav")
+    age(first.lease_path("a.wav"), 120)
+
+    first.renew()
+    assert not second.claim("a.wav")
+
+
+def test_claim_files_skips_finished_and_claimed_files(tmp_path):
+    a, b, c = make_inputs(tmp_path / "input", ("a.wav", "b.wav", "c.wav"))
+    first, second = make_queue(tmp_path, "one"), make_queue(tmp_path, "two")
+    first.complete(a, result(" a"))
+    assert first.claim(first.relative_path(b))
+
+    assert list(second.claim_files([a, b, c])) == [c]
+    assert first.is_done(a) and not os.path.exists(first.lease_path(first.relative_path(a)))
+    assert second.unfinished([a, b, c]) == [b, c]
+
+
+def test_results_are_merged_once(tmp_path):
+    files = make_inputs(tmp_path / "input")
+    first, second = make_queue(tmp_path, "one"), make_queue(tmp_path, "two")
+    writer = QueueResultWriter(first)
+    for input_file in files:
+        writer.write_segments(input_file, [{"start": 0.0, "end": 1.0, "text": " hello", "tokens": [1, 2]}])
+        writer.end_file(input_file)
+
+    output = tmp_path / "output"
+    output.mkdir()
+    assert first.merge(files, CsvWriter(str(output), False, filename="out.csv"))
+    assert not second.merge(files, CsvWriter(str(output), False, filename="other.csv"))
+
+    with open(output / "out.csv", newline="", encoding="utf-8-sig") as csv_file:
+        rows = list(csv.reader(csv_file))[1:]
+    assert [row[0] for row in rows] == ["a.wav", "b.wav"]
+    assert "tokens" not in first.load_result(files[0])["segments"][0]
+
+
+def test_each_job_gets_its_own_queue(tmp_path):
+    files = make_inputs(tmp_path / "input")
+    input_folder, base_dir = str(tmp_path / "input"), str(tmp_path / "queues")
+
+    def queue_dir(settings, job_files):
+        return LeaseQueue.for_job(input_folder, base_dir, settings, job_files, node_id="one").queue_dir
+
+    same = queue_dir({"model": "base"}, files)
+    assert queue_dir({"model": "base"}, list(reversed(files))) == same
+    assert queue_dir({"model": "small"}, files) != same
+    assert queue_dir({"model": "base"}, files[:1]) != same
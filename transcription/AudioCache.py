@@ -0,0 +1,186 @@
+import os
+import time
+import shutil
+import sqlite3
+import threading
+
+import numpy as np
+
+from .normalize_path import normalize_path
+from .decode_audio import decode_audio, stream_audio_windows, SAMPLE_RATE
+from .TranscriptCache import FileHashes
+
+# Bump when the stored array layout changes; part of every entry's name
+CACHE_FORMAT = 1
+
+
+def array_windows(audio, window_seconds, overlap_seconds, sample_rate=SAMPLE_RATE):
+    """The (offset_seconds, audio, is_last) windows stream_audio_windows would give, as views into `audio`."""
+    window_samples = int(window_seconds * sample_rate)
+    step_samples = window_samples - int(overlap_seconds * sample_rate)
+    if step_samples <= 0:
+        raise ValueError("overlap_seconds must be shorter than window_seconds")
+    offset_samples = 0
+    while True:
+        window = audio[offset_samples:offset_samples + window_samples]
+        is_last = offset_samples + window_samples >= len(audio)
+        yield offset_samples / sample_rate, window, is_last
+        if is_last:
+            return
+        offset_samples += step_samples
+
+
+class AudioCache:
+    """On-disk cache of decoded 16 kHz mono float32 audio, so re-running a corpus skips ffmpeg.
+
+    Entries are .npy files named after the source file's content hash and loaded as
+    copy-on-write memory maps: nothing is read until the model touches it, and the page
+    cache is shared between runs and pool processes. Log-mel windows for short clips can be
+    kept alongside (`store_mel`). An SQLite index tracks sizes and last use, and the least
+    recently used entries are deleted once the cache passes `max_bytes`. Content hashes
+    come from `hashes`, the FileHashes shared with the transcript cache.
+    """
+
+    DEFAULT_MAX_BYTES = 8 * 1024 ** 3
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, store_mel=False, hashes=None):
+        self.cache_dir = normalize_path(cache_dir or "audio_cache")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.store_mel = store_mel
+        self._owns_hashes = hashes is None
+        self.hashes = FileHashes() if hashes is None else hashes
+        self._lock = threading.Lock()
+        # Decode threads share this connection; pool processes open their own (WAL lets them coexist)
+        self._db = sqlite3.connect(os.path.join(self.cache_dir, "index.sqlite"), timeout=30,
+                                   check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS entries (
+                                    name TEXT PRIMARY KEY,
+                                    size_bytes INTEGER NOT NULL,
+                                    last_used REAL NOT NULL)""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+
+    def content_hash(self, input_file):
+        return self.hashes.content_hash(input_file)
+
+    def entry_name(self, input_file, kind="pcm"):
+        return f"{self.content_hash(input_file)}.{kind}{SAMPLE_RATE // 1000}k.v{CACHE_FORMAT}.npy"
+
+    def load(self, input_file, kind="pcm"):
+        """The cached array as a copy-on-write memory map, or None."""
+        name = self.entry_name(input_file, kind)
+        try:
+            # mmap_mode="c" gives a writable array (torch.from_numpy wants one) that never writes back
+            array = np.load(os.path.join(self.cache_dir, name), mmap_mode="c")
+        except (OSError, ValueError):
+            return None
+        with self._lock, self._db:
+            self._db.execute("UPDATE entries SET last_used = ? WHERE name = ?", (time.time(), name))
+        return array
+
+    def store(self, input_file, array, kind="pcm"):
+        name = self.entry_name(input_file, kind)
+        path = os.path.join(self.cache_dir, name)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as out:
+            np.save(out, np.ascontiguousarray(array, dtype=np.float32))
+        self._commit(temp_path, path, name)
+
+    def _commit(self, temp_path, path, name):
+        """Move a finished temp file into place, index it and evict down to max_bytes."""
+        os.replace(temp_path, path)
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                             (name, os.path.getsize(path), time.time()))
+            self._evict()
+
+    def decode(self, input_file):
+        """decode_audio, served from the cache when this content has been decoded before."""
+        audio = self.load(input_file)
+        if audio is not None:
+            return audio
+        audio = decode_audio(input_file)
+        self.store(input_file, audio)
+        return audio
+
+    def windows(self, input_file, window_seconds, overlap_seconds):
+        """Windows for the streaming path: sliced from the cached array, or streamed from ffmpeg and cached.
+
+        While streaming, each window's new samples are appended to a raw temp file, which becomes
+        the .npy entry once the last window is through. Files abandoned mid-way leave nothing behind.
+        """
+        audio = self.load(input_file)
+        if audio is not None:
+            yield from array_windows(audio, window_seconds, overlap_seconds)
+            return
+
+        name = self.entry_name(input_file)
+        path = os.path.join(self.cache_dir, name)
+        raw_path = f"{path}.{os.getpid()}.{threading.get_ident()}.raw"
+        written = 0
+        try:
+            with open(raw_path, "wb") as raw:
+                for offset, window, is_last in stream_audio_windows(input_file, window_seconds, overlap_seconds):
+                    start = round(offset * SAMPLE_RATE)
+                    # Skip the overlap already written with the previous window
+                    window[written - start:].tofile(raw)
+                    written = start + len(window)
+                    yield offset, window, is_last
+            self._store_raw(raw_path, path, name, written)
+        finally:
+            if os.path.exists(raw_path):
+                os.remove(raw_path)
+
+    def _store_raw(self, raw_path, path, name, samples):
+        temp_path = path + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as out, open(raw_path, "rb") as raw:
+            np.lib.format.write_array_header_1_0(
+                out, {"descr": np.lib.format.dtype_to_descr(np.dtype(np.float32)), "fortran_order": False,
+                      "shape": (samples,)})
+            shutil.copyfileobj(raw, out, 1 << 20)
+        self._commit(temp_path, path, name)
+
+    def mel(self, input_file, audio, n_mels):
+        """The 30 s log-mel window whisper computes for a short clip, cached when `store_mel` is on.
+
+        `audio` must be the file's whole decoded audio, since the entry is keyed on the file alone.
+        """
+        import torch
+        import whisper
+
+        kind = f"mel{n_mels}"
+        if self.store_mel:
+            mel = self.load(input_file, kind)
+            if mel is not None:
+                return mel
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(np.asarray(audio))),
+                                          n_mels=n_mels).numpy()
+        if self.store_mel:
+            self.store(input_file, mel, kind)
+        return mel
+
+    def _evict(self):
+        """Delete least-recently-used entries until the cache fits in max_bytes (caller holds the lock)."""
+        total = self._db.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for name, size_bytes in self._db.execute("SELECT name, size_bytes FROM entries ORDER BY last_used").fetchall():
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # Still memory-mapped somewhere (Windows won't delete it); try again next time
+                continue
+            self._db.execute("DELETE FROM entries WHERE name = ?", (name,))
+            total -= size_bytes
+            if total <= self.max_bytes:
+                break
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+        if self._owns_hashes:
+            self.hashes.close()
@@ -0,0 +1,145 @@
+import numpy as np
+
+from .decode_audio import SAMPLE_RATE
+
+# Whisper works on 30-second windows; anything up to this many samples fits in one batch slot
+CLIP_SAMPLES = 30 * SAMPLE_RATE
+# Each timestamp token is worth 20 ms (mel hop of 10 ms x the encoder's stride of 2)
+TIME_PRECISION = 0.02
+
+# The same quality gates model.transcribe uses before it falls back to re-decoding
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+# transcribe() options that carry straight over to a single decoding pass
+_DECODING_KEYS = ("task", "language", "beam_size", "patience", "length_penalty", "suppress_tokens",
+                  "suppress_blank")
+
+
+def is_short_clip(audio):
+    return audio is not None and len(audio) <= CLIP_SAMPLES
+
+
+class BatchTranscriber:
+    """Transcribe many short clips in one forward pass instead of one model.transcribe call each.
+
+    Every clip is padded to a single 30 s log-mel window, the mels are stacked, and language
+    detection and decoding run once for the whole batch. Clips whose decode fails whisper's
+    usual quality checks come back as None so the caller can retry them with model.transcribe,
+    which has the temperature fallback this single pass skips.
+    """
+
+    def __init__(self, model, transcribe_options=None):
+        self.model = model
+        self.transcribe_options = transcribe_options or {}
+        options = self.transcribe_options
+        # With a single temperature there's nothing to fall back to: whatever this pass decodes is final
+        temperatures = options.get("temperature", (0.0, 0.2))
+        self.can_fall_back = isinstance(temperatures, (tuple, list)) and len(temperatures) > 1
+        # A profile's quality gates replace whisper's defaults; None switches a gate off
+        self.compression_ratio_threshold = options.get("compression_ratio_threshold", COMPRESSION_RATIO_THRESHOLD)
+        self.logprob_threshold = options.get("logprob_threshold", LOGPROB_THRESHOLD)
+        self.no_speech_threshold = options.get("no_speech_threshold", NO_SPEECH_THRESHOLD)
+
+    def decoding_options(self):
+        import whisper
+
+        options = {key: self.transcribe_options[key] for key in _DECODING_KEYS if key in self.transcribe_options}
+        temperature = self.transcribe_options.get("temperature", 0.0)
+        if isinstance(temperature, (tuple, list)):
+            temperature = temperature[0]
+        options["temperature"] = temperature
+        if temperature > 0 and "best_of" in self.transcribe_options:
+            options["best_of"] = self.transcribe_options["best_of"]
+        # Half precision only makes sense (and only works) off the CPU
+        options["fp16"] = self.transcribe_options.get("fp16", True) and self.model.device.type != "cpu"
+        return whisper.DecodingOptions(without_timestamps=False, **options)
+
+    def transcribe_batch(self, audios, mels=None):
+        """Return one result dict (shaped like model.transcribe's) per clip, or None where it should be retried.
+
+        `mels` can supply each clip's precomputed 30 s log-mel window (e.g. from the audio cache).
+        """
+        import torch
+        import whisper
+        from whisper.tokenizer import get_tokenizer
+
+        if not audios:
+            return []
+
+        decoding_options = self.decoding_options()
+        n_mels = self.model.dims.n_mels
+        mels = torch.stack([
+            torch.from_numpy(np.asarray(mel)) if mel is not None else
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(np.asarray(audio))), n_mels=n_mels)
+            for audio, mel in zip(audios, mels or [None] * len(audios))
+        ]).to(self.model.device)
+        if decoding_options.fp16:
+            mels = mels.half()
+
+        with torch.no_grad():
+            decoded = whisper.decode(self.model, mels, decoding_options)
+
+        results = []
+        for audio, decoding in zip(audios, decoded):
+            low_logprob = self.logprob_threshold is not None and decoding.avg_logprob < self.logprob_threshold
+            if (self.no_speech_threshold is not None and decoding.no_speech_prob > self.no_speech_threshold
+                    and low_logprob):
+                # Whisper treats this as silence rather than a failed decode
+                results.append({"text": "", "segments": [], "language": decoding.language})
+                continue
+            too_repetitive = (self.compression_ratio_threshold is not None
+                              and decoding.compression_ratio > self.compression_ratio_threshold)
+            if self.can_fall_back and (too_repetitive or low_logprob):
+                results.append(None)
+                continue
+
+            tokenizer = get_tokenizer(self.model.is_multilingual, num_languages=self.model.num_languages,
+                                      language=decoding.language, task=decoding_options.task)
+            duration = len(audio) / SAMPLE_RATE
+            segments = self._segments_from_tokens(decoding, tokenizer, duration)
+            results.append({
+                "text": "".join(segment["text"] for segment in segments),
+                "segments": segments,
+                "language": decoding.language,
+            })
+        return results
+
+    @staticmethod
+    def _segments_from_tokens(decoding, tokenizer, duration):
+        """Split a decoded token sequence on its timestamp tokens: <|t0|> text <|t1|><|t1|> text <|t2|> ..."""
+        segments = []
+        start = None
+        last_end = 0.0
+        text_tokens = []
+
+        def close_segment(end):
+            segments.append({
+                "id": len(segments),
+                "seek": 0,
+                "start": round(last_end if start is None else start, 2),
+                "end": round(min(end, duration), 2),
+                "text": tokenizer.decode(text_tokens),
+                "tokens": list(text_tokens),
+                "temperature": decoding.temperature,
+                "avg_logprob": decoding.avg_logprob,
+                "compression_ratio": decoding.compression_ratio,
+                "no_speech_prob": decoding.no_speech_prob,
+            })
+
+        for token in decoding.tokens:
+            if token >= tokenizer.timestamp_begin:
+                timestamp = (token - tokenizer.timestamp_begin) * TIME_PRECISION
+                if start is not None and text_tokens:
+                    close_segment(timestamp)
+                    start, text_tokens, last_end = None, [], timestamp
+                else:
+                    start = timestamp
+            elif token < tokenizer.eot:
+                text_tokens.append(token)
+
+        if text_tokens:
+            # The clip ended mid-segment without a closing timestamp
+            close_segment(duration)
+        return segments
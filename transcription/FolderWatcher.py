@@ -0,0 +1,184 @@
+import os
+import time
+import threading
+
+from .file_discovery import iter_media_files
+
+
+def file_signature(path):
+    """(size, mtime_ns) of a file, or None if it's gone."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def can_open(path):
+    """False while another program still holds the file exclusively (Windows copies do)."""
+    try:
+        with open(path, "rb"):
+            return True
+    except OSError:
+        return False
+
+
+class FolderWatcher:
+    """Reports media files that appear (or change) in a folder tree, once they've finished being written.
+
+    With the optional `watchdog` package installed, file-system events (inotify on Linux,
+    ReadDirectoryChangesW on Windows, FSEvents on macOS) say which paths to look at; without it
+    the tree is re-scanned every `poll_interval` seconds. Either way a file is only reported
+    after its size and mtime have stayed the same for `settle_seconds`, so half-copied
+    recordings are never picked up.
+    """
+
+    # How often files that are still settling are re-checked
+    SETTLE_CHECK_INTERVAL = 0.5
+
+    def __init__(self, folder, extensions, settle_seconds=2.0, poll_interval=2.0, use_events=True):
+        self.folder = folder
+        self.extensions = frozenset(extensions)
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.use_events = use_events
+        # Signature each file had when it was last reported (or when watching began)
+        self._known = {}
+        # path -> (signature, time that signature was first seen)
+        self._settling = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._observer = None
+        # Set once the files already in the folder have all been recorded in _known
+        self._baseline_done = threading.Event()
+        self._stopped = threading.Event()
+
+    @property
+    def event_driven(self):
+        return self._observer is not None
+
+    def start(self):
+        """Start watching, and remember what's already in the folder (only later arrivals are reported).
+
+        The folder is listed on a background thread, so a large tree doesn't hold up the caller
+        (which is usually about to walk the same tree for its backlog); poll() reports nothing
+        until the listing is done.
+        """
+        if self.use_events:
+            self._observer = self._start_observer()
+        threading.Thread(target=self._record_baseline, name="FolderWatcher baseline", daemon=True).start()
+        return self
+
+    def _record_baseline(self):
+        try:
+            for path in iter_media_files(self.folder, self.extensions):
+                if self._stopped.is_set():
+                    return
+                signature = file_signature(path)
+                with self._lock:
+                    # mark_seen() may already have recorded the file
+                    self._known.setdefault(path, signature)
+        finally:
+            self._baseline_done.set()
+            self._wakeup.set()
+
+    def _start_observer(self):
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return None
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                for path in (event.src_path, getattr(event, "dest_path", None)):
+                    if not path:
+                        continue
+                    if event.is_directory:
+                        # A folder copied or moved in only raises an event for the folder itself
+                        if event.event_type in ("created", "moved") and os.path.isdir(path):
+                            watcher._mark_dirty(iter_media_files(path, watcher.extensions))
+                    elif os.path.splitext(path)[1].lower() in watcher.extensions:
+                        watcher._mark_dirty([path])
+
+        observer = Observer()
+        observer.schedule(Handler(), self.folder, recursive=True)
+        observer.daemon = True
+        observer.start()
+        return observer
+
+    def _mark_dirty(self, paths):
+        with self._lock:
+            self._dirty.update(paths)
+        self._wakeup.set()
+
+    def mark_seen(self, path):
+        """Treat the file's current contents as handled, e.g. because the backlog just transcribed it."""
+        with self._lock:
+            self._known[path] = file_signature(path)
+            self._settling.pop(path, None)
+            self._dirty.discard(path)
+
+    def poll(self):
+        """Check for changes and return the files that are new or changed and have settled."""
+        if not self._baseline_done.is_set():
+            # Until then, files that were there all along would look new
+            return []
+        now = time.monotonic()
+        with self._lock:
+            if self.event_driven:
+                paths = self._dirty | set(self._settling)
+                self._dirty = set()
+            else:
+                paths = set(iter_media_files(self.folder, self.extensions))
+                # Forget deleted files, so one dropped in again under the same name counts as new
+                for gone in set(self._known) - paths:
+                    self._known.pop(gone)
+                    self._settling.pop(gone, None)
+
+            ready = []
+            for path in sorted(paths):
+                signature = file_signature(path)
+                if signature is None:
+                    self._known.pop(path, None)
+                    self._settling.pop(path, None)
+                    continue
+                if signature == self._known.get(path):
+                    self._settling.pop(path, None)
+                    continue
+                settling = self._settling.get(path)
+                if settling is None or settling[0] != signature:
+                    self._settling[path] = (signature, now)
+                    continue
+                # An empty file is a copy that hasn't started writing yet
+                if now - settling[1] >= self.settle_seconds and signature[0] > 0 and can_open(path):
+                    self._known[path] = signature
+                    del self._settling[path]
+                    ready.append(path)
+            return ready
+
+    def wait(self, timeout=None):
+        """Sleep until the next poll is due: sooner while files are settling, early on events or wake()."""
+        if timeout is None:
+            with self._lock:
+                settling = bool(self._settling)
+            if settling:
+                timeout = self.SETTLE_CHECK_INTERVAL
+            else:
+                timeout = 5.0 if self.event_driven else self.poll_interval
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopped.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        self.wake()
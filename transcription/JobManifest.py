@@ -0,0 +1,156 @@
+import os
+import json
+import threading
+from datetime import datetime
+
+from .normalize_path import normalize_path
+
+
+class JobManifest:
+    """On-disk record of a batch job's per-file progress, kept next to the output so a crashed run can resume.
+
+    Settings and the file list are written in full through a temp file + os.replace, so the
+    manifest on disk is always either the previous state or the new one, never half-written.
+    Finished files, which arrive one flush at a time, are appended to a log next to it
+    instead (one JSON line per flush), so recording progress costs the same on the
+    hundred-thousandth file as on the first. The log is replayed on load and folded back
+    into the manifest by the next full save; a line cut short by a crash is ignored, along
+    with the files and checkpoint it would have recorded.
+    """
+
+    FILENAME = "Whispering Wizard Job.json"
+    LOG_SUFFIX = ".log"
+    VERSION = 2
+
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+        # Discovery adds files while the writer thread marks others done
+        self._lock = threading.RLock()
+
+    @classmethod
+    def manifest_path(cls, output_folder):
+        return normalize_path(os.path.join(output_folder, cls.FILENAME))
+
+    @classmethod
+    def create(cls, output_folder, settings, output_filename=None):
+        """Start a fresh manifest for a new job, replacing any previous one in this output folder."""
+        data = {
+            "version": cls.VERSION,
+            "settings": settings,
+            # Single-file outputs (CSV, JSONL, Parquet) name their file here and record how far it is known good
+            "output_filename": output_filename,
+            "output_checkpoint": None,
+            "complete": False,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "files": {},
+        }
+        manifest = cls(cls.manifest_path(output_folder), data)
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def load_resumable(cls, output_folder, settings):
+        """Return the previous unfinished job's manifest if it was started with the same settings, else None."""
+        path = cls.manifest_path(output_folder)
+        try:
+            with open(path, "r", encoding="utf-8") as manifest_file:
+                data = json.load(manifest_file)
+        except (OSError, ValueError):
+            return None
+
+        if data.get("version") != cls.VERSION or data.get("complete") or data.get("settings") != settings:
+            return None
+        manifest = cls(path, data)
+        manifest._replay_log()
+        # Start this run's log afresh
+        manifest.save()
+        return manifest
+
+    @property
+    def log_path(self):
+        return self.path + self.LOG_SUFFIX
+
+    def _replay_log(self):
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as log_file:
+                lines = log_file.readlines()
+        except OSError:
+            return
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # The last flush before a crash, only partly written
+                break
+            self._apply_done(entry["files"], entry["finished_at"], entry["checkpoint"])
+
+    def _apply_done(self, input_files, finished_at, output_checkpoint):
+        for input_file in input_files:
+            self.data["files"][input_file] = {"status": "done", "finished_at": finished_at}
+        if output_checkpoint is not None:
+            self.data["output_checkpoint"] = output_checkpoint
+
+    @property
+    def output_filename(self):
+        return self.data["output_filename"]
+
+    @property
+    def output_checkpoint(self):
+        return self.data["output_checkpoint"]
+
+    def add_files(self, files, save=True):
+        """Register newly discovered files as pending; files already recorded keep their status.
+
+        With save=False they are written out with the next save instead, which keeps discovery
+        from rewriting the manifest for every directory it scans.
+        """
+        with self._lock:
+            for input_file in files:
+                self.data["files"].setdefault(input_file, {"status": "pending"})
+            if save:
+                self.save()
+
+    def pending_files(self, files):
+        with self._lock:
+            return [input_file for input_file in files
+                    if self.data["files"].get(input_file, {}).get("status") != "done"]
+
+    def done_count(self):
+        with self._lock:
+            return sum(1 for entry in self.data["files"].values() if entry["status"] == "done")
+
+    def mark_done(self, input_files, output_checkpoint=None):
+        """Record files whose output is safely written (and, for single-file outputs, the writer's checkpoint).
+
+        Output writers flush several files at once, so they are all recorded with one log append.
+        """
+        finished_at = datetime.now().isoformat(timespec="seconds")
+        input_files = list(input_files)
+        with self._lock:
+            self._apply_done(input_files, finished_at, output_checkpoint)
+            line = json.dumps({"files": input_files, "finished_at": finished_at, "checkpoint": output_checkpoint},
+                              ensure_ascii=False)
+            with open(self.log_path, "a", encoding="utf-8") as log_file:
+                log_file.write(line + "\n")
+                log_file.flush()
+                os.fsync(log_file.fileno())
+
+    def mark_complete(self):
+        with self._lock:
+            self.data["complete"] = True
+            self.save()
+
+    def save(self):
+        with self._lock:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as manifest_file:
+                json.dump(self.data, manifest_file, ensure_ascii=False, indent=1)
+                manifest_file.flush()
+                os.fsync(manifest_file.fileno())
+            os.replace(temp_path, self.path)
+            # Everything in the log is in the manifest now
+            try:
+                os.remove(self.log_path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,453 @@
+import os
+import sys
+import json
+import time
+import queue
+import tempfile
+import itertools
+import threading
+import socketserver
+from collections import deque, Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from .decode_audio import decode_audio
+from .ModelRegistry import ModelRegistry
+from .BatchTranscriber import BatchTranscriber, is_short_clip
+from .OutputWriters import TranscriptWriter, RENDERABLE_FORMATS, render_transcript
+from .decoding_profiles import DECODING_PROFILES, DEFAULT_PROFILE, profile_options
+
+# Latency percentiles are computed over this many of the most recent jobs
+LATENCY_WINDOW = 1000
+# Uploads are streamed to a temp file in chunks of this size rather than held in memory
+UPLOAD_CHUNK_BYTES = 1 << 20
+# Results nobody has fetched are dropped after this long, or sooner once this many are waiting
+RESULT_TTL_SECONDS = 3600
+MAX_FINISHED_JOBS = 1000
+
+
+def flag(value, default):
+    """A boolean option from JSON (true/false) or a query string ("1", "true", "0", "false")."""
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in ("0", "false", "no", "off", "")
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 4)
+
+
+class TranscriptionJob:
+    """One submitted recording, from the queue to its result."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, input_file, audio, model_name, profile=DEFAULT_PROFILE, language=None, priority=0,
+                 output_format=None, include_timestamps=True):
+        self.id = next(self._ids)
+        self.input_file = input_file
+        self.audio = audio
+        self.model_name = model_name
+        self.profile = profile
+        self.language = language
+        self.priority = priority
+        self.output_format = output_format
+        self.include_timestamps = include_timestamps
+        self.status = "queued"
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.finished = None
+        self.batch_size = None
+        self.result = None
+        self.error = None
+        self.sequence = None
+        self.done = threading.Event()
+
+    @property
+    def batch_key(self):
+        """Jobs can share a decoding pass only if they'd be decoded with identical settings."""
+        return self.model_name, self.profile, self.language
+
+    def transcribe_options(self):
+        options = dict({"verbose": None}, **profile_options(self.profile))
+        if self.language:
+            options["language"] = self.language
+        return options
+
+    def as_response(self):
+        """The job's status and, once done, its transcript as the rows the output writers produce."""
+        response = {"id": self.id, "status": self.status, "file": self.input_file, "model": self.model_name,
+                    "priority": self.priority}
+        if self.error is not None:
+            response["error"] = self.error
+        if self.result is not None:
+            segments = self.result["segments"]
+            response["language"] = self.result.get("language")
+            response["text"] = self.result.get("text", "")
+            response["rows"] = [dict(zip(("filename", "start_time", "stop_time", "text"),
+                                         TranscriptWriter.segment_fields(self.input_file, segment)))
+                                for segment in segments]
+            if self.output_format:
+                response["output"] = render_transcript(self.output_format, self.input_file, segments,
+                                                       self.include_timestamps)
+            response["batch_size"] = self.batch_size
+            response["queued_seconds"] = round(self.started - self.submitted, 4)
+            response["processing_seconds"] = round(self.finished - self.started, 4)
+        return response
+
+
+class TranscriptionServer:
+    """Priority job queue in front of warm models, for other programs on this machine.
+
+    Jobs are decoded as they are submitted (on the submitting connection's thread) and
+    queued by priority, higher first. One dispatcher thread takes the next job and, if it's a
+    short clip, coalesces it with other queued short clips that share its model and decoding
+    settings, waiting up to `batch_wait` seconds for more, so concurrent clients share one
+    batched forward pass instead of queueing for a model.transcribe call each. Models stay
+    resident in a ModelRegistry between jobs.
+
+    Finished jobs are kept until their result is fetched, but for at most `result_ttl`
+    seconds and only the newest `max_finished` of them, so clients that submit without
+    waiting and never come back can't fill up memory.
+    """
+
+    def __init__(self, model_name, model_dir=None, preload=(), max_batch=16, batch_wait=0.02,
+                 memory_budget=ModelRegistry.DEFAULT_MEMORY_BUDGET, result_ttl=RESULT_TTL_SECONDS,
+                 max_finished=MAX_FINISHED_JOBS):
+        self.model_name = model_name
+        self.registry = ModelRegistry(model_dir, memory_budget)
+        self.preload = [model_name] + [name for name in preload if name != model_name]
+        self.max_batch = max(1, max_batch)
+        self.batch_wait = batch_wait
+        self.result_ttl = result_ttl
+        self.max_finished = max_finished
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._jobs = {}
+        # (finished, job id) in the order jobs finished, for expiring unfetched results
+        self._finished = deque()
+        self._queued_priorities = Counter()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._waits = deque(maxlen=LATENCY_WINDOW)
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._dispatcher = None
+
+    def start(self):
+        for model_name in self.preload:
+            self.registry.prewarm(model_name)
+        self._running.set()
+        self._dispatcher = threading.Thread(target=self._dispatch, name="ww-dispatcher", daemon=True)
+        self._dispatcher.start()
+        return self
+
+    def stop(self):
+        self._running.clear()
+        # Wake the dispatcher if it's waiting on an empty queue
+        self._queue.put((float("inf"), next(self._sequence), None))
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+        self.registry.shutdown()
+
+    def submit(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+            self._queued_priorities[job.priority] += 1
+            self._counts["submitted"] += 1
+        job.sequence = next(self._sequence)
+        self._put(job)
+        return job
+
+    def _put(self, job):
+        self._queue.put((-job.priority, job.sequence, job))
+
+    def _take(self, timeout=None):
+        """The highest-priority queued job, or None (on timeout or at shutdown)."""
+        try:
+            _, _, job = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return job
+
+    def get_job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def next_batch(self):
+        """Take the next job plus whatever compatible short clips arrive within `batch_wait`."""
+        job = self._take()
+        if job is None:
+            return []
+        batch = [job]
+        if self.max_batch == 1 or not is_short_clip(job.audio):
+            return batch
+
+        held_back = []
+        deadline = time.perf_counter() + self.batch_wait
+        while len(batch) < self.max_batch:
+            # Jobs already queued are taken straight away; new ones are waited for until the deadline
+            other = self._take(timeout=max(deadline - time.perf_counter(), 0))
+            if other is None:
+                break
+            if other.batch_key == job.batch_key and is_short_clip(other.audio):
+                batch.append(other)
+            else:
+                held_back.append(other)
+        for other in held_back:
+            # Back in the queue with their original priority and order
+            self._put(other)
+        return batch
+
+    def _dispatch(self):
+        while self._running.is_set():
+            batch = self.next_batch()
+            if not batch:
+                continue
+            started = time.perf_counter()
+            with self._lock:
+                for job in batch:
+                    job.status = "running"
+                    job.started = started
+                    job.batch_size = len(batch)
+                    self._queued_priorities[job.priority] -= 1
+            try:
+                results = self.transcribe(batch)
+                errors = [None] * len(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    print(f"Error transcribing {batch[0].input_file}: {e}", file=sys.stderr)
+                    results, errors = [None], [str(e)]
+                else:
+                    # One bad clip shouldn't fail the others: retry them one at a time
+                    print(f"Error transcribing a batch of {len(batch)}, retrying each clip on its own: {e}",
+                          file=sys.stderr)
+                    results, errors = self.transcribe_each(batch)
+            self._finish(batch, results, errors)
+
+    def transcribe(self, batch):
+        model = self.registry.get(batch[0].model_name)
+        options = batch[0].transcribe_options()
+        if len(batch) == 1:
+            return [model.transcribe(batch[0].audio, **options)]
+
+        results = BatchTranscriber(model, options).transcribe_batch([job.audio for job in batch])
+        # Clips that failed the single pass's quality checks get transcribe()'s temperature fallback
+        return [result if result is not None else model.transcribe(job.audio, **options)
+                for job, result in zip(batch, results)]
+
+    def transcribe_each(self, batch):
+        """([result], [error]) for the batch's jobs, transcribed separately."""
+        results, errors = [], []
+        for job in batch:
+            job.batch_size = 1
+            try:
+                results.append(self.transcribe([job])[0])
+                errors.append(None)
+            except Exception as e:
+                print(f"Error transcribing {job.input_file}: {e}", file=sys.stderr)
+                results.append(None)
+                errors.append(str(e))
+        return results, errors
+
+    def _finish(self, batch, results, errors):
+        finished = time.perf_counter()
+        with self._lock:
+            self._counts["batches"] += 1
+            self._counts["batched_jobs"] += len(batch)
+            for job, result, error in zip(batch, results, errors):
+                job.finished = finished
+                job.result = result
+                job.error = error
+                job.status = "error" if error is not None else "done"
+                # The decoded audio isn't needed any more; the result stays until the job is fetched
+                job.audio = None
+                self._counts["failed" if error is not None else "completed"] += 1
+                self._waits.append(job.started - job.submitted)
+                self._latencies.append(finished - job.submitted)
+                self._finished.append((finished, job.id))
+                job.done.set()
+            self._expire(finished)
+
+    def _expire(self, now):
+        """Drop finished jobs past their time or beyond the cap (caller holds the lock)."""
+        while self._finished and (len(self._finished) > self.max_finished
+                                  or now - self._finished[0][0] > self.result_ttl):
+            _, job_id = self._finished.popleft()
+            # Already gone if it was fetched
+            self._jobs.pop(job_id, None)
+
+    def forget(self, job):
+        with self._lock:
+            self._jobs.pop(job.id, None)
+
+    def stats(self):
+        with self._lock:
+            waits, latencies = list(self._waits), list(self._latencies)
+            counts = dict(self._counts)
+            queued = {str(priority): count for priority, count in sorted(self._queued_priorities.items()) if count}
+            running = sum(1 for job in self._jobs.values() if job.status == "running")
+        return {
+            "queue_depth": sum(queued.values()),
+            "queued_by_priority": queued,
+            "running": running,
+            "submitted": counts.get("submitted", 0),
+            "completed": counts.get("completed", 0),
+            "failed": counts.get("failed", 0),
+            "batches": counts.get("batches", 0),
+            "mean_batch_size": (round(counts["batched_jobs"] / counts["batches"], 2)
+                                if counts.get("batches") else None),
+            "queue_wait_seconds": {"p50": percentile(waits, 0.5), "p95": percentile(waits, 0.95)},
+            "latency_seconds": {"p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95)},
+            "models_loaded": list(self.registry.loaded_models()),
+        }
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end for a TranscriptionServer (self.server.app).
+
+    POST /transcribe    JSON {"path": ...} or a raw audio body (?filename=clip.mp3), plus the
+                        options priority, model, profile, language, format, timestamps and wait;
+                        answers with the result, or with the job id when wait is false
+    GET  /jobs/<id>     a job's status, and its result once done
+    GET  /stats         queue depth, batch sizes and latency percentiles
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/stats":
+            return self.send_json(200, self.server.app.stats())
+        if path.startswith("/jobs/"):
+            try:
+                job = self.server.app.get_job(int(path[len("/jobs/"):]))
+            except ValueError:
+                job = None
+            if job is None:
+                return self.send_json(404, {"error": "no such job"})
+            if job.done.is_set():
+                self.server.app.forget(job)
+            return self.send_json(200, job.as_response())
+        self.send_json(404, {"error": "unknown endpoint"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/transcribe":
+            return self.send_json(404, {"error": "unknown endpoint"})
+        try:
+            params, audio, input_file = self.read_submission(url)
+            job = self.build_job(params, audio, input_file)
+        except (ValueError, KeyError, OSError, RuntimeError) as e:
+            return self.send_json(400, {"error": str(e)})
+
+        app = self.server.app
+        app.submit(job)
+        if not flag(params.get("wait"), True):
+            return self.send_json(202, {"id": job.id, "status": job.status})
+        job.done.wait()
+        app.forget(job)
+        self.send_json(200 if job.error is None else 500, job.as_response())
+
+    def read_submission(self, url):
+        """(options, decoded audio, file name) from a JSON request or an uploaded recording."""
+        length = int(self.headers.get("Content-Length", 0))
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("the JSON body must be an object")
+            params.update(body)
+            input_file = params["path"]
+            if not os.path.isfile(input_file):
+                raise ValueError(f"no such file: {input_file}")
+            return params, decode_audio(input_file), input_file
+
+        # Anything else is the recording itself; ffmpeg works out the container from the content
+        input_file = params.get("filename", "upload")
+        fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(input_file)[1], prefix="ww-upload-")
+        try:
+            with os.fdopen(fd, "wb") as upload:
+                remaining = length
+                while remaining > 0:
+                    chunk = self.rfile.read(min(remaining, UPLOAD_CHUNK_BYTES))
+                    if not chunk:
+                        break
+                    upload.write(chunk)
+                    remaining -= len(chunk)
+            return params, decode_audio(temp_path), input_file
+        finally:
+            os.remove(temp_path)
+
+    def build_job(self, params, audio, input_file):
+        app = self.server.app
+        profile = params.get("profile", DEFAULT_PROFILE)
+        if profile not in DECODING_PROFILES:
+            raise ValueError(f"unknown profile: {profile}")
+        output_format = params.get("format")
+        if output_format is not None and output_format not in RENDERABLE_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(RENDERABLE_FORMATS)}")
+        return TranscriptionJob(input_file, audio, params.get("model", app.model_name), profile=profile,
+                                language=params.get("language"), priority=int(params.get("priority", 0)),
+                                output_format=output_format,
+                                include_timestamps=flag(params.get("timestamps"), True))
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=float).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}", file=sys.stderr)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_http_server(app, port=8765, unix_socket=None):
+    """Bind the HTTP front end to 127.0.0.1:`port`, or to a Unix socket only this user can open."""
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        old_umask = os.umask(0o177)
+        try:
+            server = ThreadingUnixHTTPServer(unix_socket, JobRequestHandler)
+        finally:
+            os.umask(old_umask)
+    else:
+        # Localhost only: requests can name any file this user can read
+        server = ThreadingHTTPServer(("127.0.0.1", port), JobRequestHandler)
+        server.daemon_threads = True
+    server.app = app
+    return server
+
+
+def serve(model_name, port=8765, unix_socket=None, preload=(), max_batch=16, batch_wait=0.02, model_dir=None):
+    """Run the service until interrupted."""
+    app = TranscriptionServer(model_name, model_dir, preload=preload, max_batch=max_batch,
+                              batch_wait=batch_wait).start()
+    server = create_http_server(app, port, unix_socket)
+    where = unix_socket or f"http://127.0.0.1:{port}"
+    print(f"Whispering Wizard is listening on {where} (model {model_name}); Ctrl+C to stop.", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        app.stop()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
@@ -0,0 +1,123 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .normalize_path import normalize_path
+from .quantized_model import load_model, is_quantized, base_model_name, quantized_cache_path
+
+
+def model_size_bytes(model):
+    """Memory held by a model's weights, including the packed int8 weights of quantized layers."""
+    import torch
+
+    def tensor_bytes(value):
+        if isinstance(value, torch.Tensor):
+            return value.numel() * value.element_size()
+        if isinstance(value, (tuple, list)):
+            return sum(tensor_bytes(item) for item in value)
+        return 0
+
+    return sum(tensor_bytes(value) for value in model.state_dict().values())
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded Whisper models, evicted least-recently-used past a memory budget.
+
+    The app owns one registry and hands it to every TranscriptionWorker, so a model is
+    deserialized once and reused across jobs. Loads run on a single background thread;
+    asking for a model that is already being prewarmed just waits for that load.
+    """
+
+    DEFAULT_MEMORY_BUDGET = 6 * 1024 ** 3
+
+    def __init__(self, model_dir=None, memory_budget=DEFAULT_MEMORY_BUDGET):
+        self.model_dir = normalize_path(model_dir or "whisper_models")
+        self.memory_budget = memory_budget
+        self._models = OrderedDict()   # model_name -> (model, size in bytes), oldest first
+        self._loading = {}             # model_name -> Future of an in-progress load
+        self._lock = threading.Lock()
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ww-model-loader")
+
+    def is_loaded(self, model_name):
+        with self._lock:
+            return model_name in self._models
+
+    def loaded_models(self):
+        """{model_name: size in bytes} of the resident models, least recently used first."""
+        with self._lock:
+            return {model_name: size for model_name, (_, size) in self._models.items()}
+
+    def is_downloaded(self, model_name):
+        """True if the checkpoint is already in model_dir, so loading it won't hit the network."""
+        import whisper
+        if is_quantized(model_name) and os.path.exists(quantized_cache_path(model_name, self.model_dir)):
+            return True
+        url = whisper._MODELS.get(base_model_name(model_name))
+        return url is not None and os.path.exists(os.path.join(self.model_dir, os.path.basename(url)))
+
+    def get(self, model_name):
+        """Return the loaded model, loading it (or waiting for a prewarm already underway) if needed."""
+        return self._load_future(model_name).result()
+
+    def prewarm(self, model_name, allow_download=True):
+        """Start loading a model in the background; returns immediately."""
+        if not allow_download and not self.is_downloaded(model_name):
+            return None
+        return self._load_future(model_name)
+
+    def _load_future(self, model_name):
+        with self._lock:
+            if model_name in self._models:
+                self._models.move_to_end(model_name)
+                # Already resident: don't queue behind whatever the loader thread is doing
+                future = Future()
+                future.set_result(self._models[model_name][0])
+                return future
+            future = self._loading.get(model_name)
+            if future is None:
+                future = self._loader.submit(self._load, model_name)
+                self._loading[model_name] = future
+            return future
+
+    def _load(self, model_name):
+        try:
+            os.makedirs(self.model_dir, exist_ok=True)
+            # Re-check: an earlier queued load may have finished this model already
+            with self._lock:
+                if model_name in self._models:
+                    self._models.move_to_end(model_name)
+                    return self._models[model_name][0]
+
+            model = load_model(model_name, self.model_dir)
+            size = model_size_bytes(model)
+
+            with self._lock:
+                self._models[model_name] = (model, size)
+                self._evict_over_budget()
+            return model
+        finally:
+            with self._lock:
+                self._loading.pop(model_name, None)
+
+    def _evict_over_budget(self):
+        """Drop the least recently used models until we fit (caller holds the lock); the newest always stays."""
+        total = sum(size for _, size in self._models.values())
+        evicted = False
+        while total > self.memory_budget and len(self._models) > 1:
+            _, (_, size) = self._models.popitem(last=False)
+            total -= size
+            evicted = True
+
+        if evicted:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def shutdown(self):
+        self._loader.shutdown(wait=False, cancel_futures=True)
+        self.clear()
@@ -0,0 +1,534 @@
+import os
+import io
+import csv
+import json
+import time
+
+from .normalize_path import normalize_path
+from .TranscriptIndex import TranscriptIndex, DEFAULT_INDEX_FILENAME
+
+# Output formats offered in the app, in the order they're shown
+OUTPUT_FORMATS = {
+    "txt": "Text Files (.txt)",
+    "csv": "Single CSV File (.csv)",
+    "jsonl": "Single JSON Lines File (.jsonl)",
+    "parquet": "Parquet Dataset (.parquet)",
+    "srt": "SubRip Subtitle Files (.srt)",
+    "vtt": "WebVTT Subtitle Files (.vtt)",
+    "sqlite": "Searchable Transcript Database (.sqlite)",
+}
+
+
+class TranscriptWriter:
+    """Base class for output targets.
+
+    The worker calls write_segments() one or more times per file (several times for files
+    streamed in windows), then end_file() once the file is complete, and close() at the end.
+    Writers buffer rows and flush in batches; each flush reports which files are now safely
+    on disk, plus a checkpoint that open() can later resume from, to `on_checkpoint`.
+    With `channel_column`, segments carry the audio channel they came from ("channel", from 1)
+    and the output says which channel each line is.
+    """
+
+    # Per-file formats write one output file per input; single-file formats write one shared output
+    single_file = False
+    extension = None
+    # Set for outputs that every job adds to, rather than a new timestamped file per job
+    shared_filename = None
+
+    def __init__(self, output_folder, include_timestamps, filename=None, on_checkpoint=None, channel_column=False):
+        self.output_folder = output_folder
+        self.include_timestamps = include_timestamps
+        self.filename = filename
+        self.on_checkpoint = on_checkpoint
+        self.channel_column = channel_column
+        self._completed = []
+
+    def open(self, checkpoint=None):
+        """Prepare for writing; `checkpoint` is the last one reported by a previous run of the same job."""
+
+    def write_segments(self, input_file, segments, append=False):
+        raise NotImplementedError
+
+    def end_file(self, input_file):
+        """Mark a file's output complete; per-file formats are durable straight away."""
+        self._completed.append(input_file)
+        self._report(None)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def _report(self, checkpoint):
+        completed, self._completed = self._completed, []
+        if self.on_checkpoint is not None and (completed or checkpoint is not None):
+            self.on_checkpoint(completed, checkpoint)
+
+    def output_path(self, filename):
+        return normalize_path(os.path.join(self.output_folder, filename))
+
+    @staticmethod
+    def segment_fields(input_file, segment):
+        return os.path.basename(input_file), segment["start"], segment["end"], segment["text"].strip()
+
+    def labelled(self, segment, text):
+        """`text` prefixed with its channel, for formats with no column to put it in."""
+        if self.channel_column and segment.get("channel") is not None:
+            return f"[Channel {segment['channel']}] {text}"
+        return text
+
+
+class TxtWriter(TranscriptWriter):
+    """One .txt per input file, the app's original output."""
+
+    extension = "txt"
+
+    def write_segments(self, input_file, segments, append=False):
+        output_file_path = self.output_path(os.path.basename(input_file) + ".txt")
+        # Streamed files arrive in several parts; later parts append to the same .txt
+        with open(output_file_path, 'a' if append else 'w', encoding='utf-8-sig') as output_file:
+            output_file.write(self.render(input_file, segments))
+
+    def render(self, input_file, segments):
+        lines = []
+        for segment in segments:
+            _, start_time, end_time, text = self.segment_fields(input_file, segment)
+            text = self.labelled(segment, text)
+            if self.include_timestamps:
+                lines.append(f"[{start_time:.2f}s - {end_time:.2f}s]: {text}\n")
+            else:
+                lines.append(f"{text}\n")
+        return "".join(lines)
+
+
+class SubtitleWriter(TranscriptWriter):
+    """One subtitle file per input file; cue numbers carry on across streamed parts."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cue_numbers = {}
+
+    def write_segments(self, input_file, segments, append=False):
+        output_file_path = self.output_path(os.path.basename(input_file) + "." + self.extension)
+        with open(output_file_path, 'a' if append else 'w', encoding='utf-8') as output_file:
+            output_file.write(self.render(input_file, segments, append))
+
+    def render(self, input_file, segments, append=False):
+        if not append:
+            self._cue_numbers[input_file] = 0
+        parts = [self.header()] if not append else []
+        for segment in segments:
+            self._cue_numbers[input_file] += 1
+            parts.append(self.cue(self._cue_numbers[input_file], segment))
+        return "".join(parts)
+
+    def end_file(self, input_file):
+        self._cue_numbers.pop(input_file, None)
+        super().end_file(input_file)
+
+    def header(self):
+        return ""
+
+    @staticmethod
+    def timestamp(seconds, decimal_marker):
+        milliseconds = int(round(seconds * 1000))
+        hours, milliseconds = divmod(milliseconds, 3_600_000)
+        minutes, milliseconds = divmod(milliseconds, 60_000)
+        seconds, milliseconds = divmod(milliseconds, 1000)
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}"
+
+
+class SrtWriter(SubtitleWriter):
+    extension = "srt"
+
+    def cue(self, number, segment):
+        start = self.timestamp(segment["start"], ",")
+        end = self.timestamp(segment["end"], ",")
+        return f"{number}\n{start} --> {end}\n{self.labelled(segment, segment['text'].strip())}\n\n"
+
+
+class VttWriter(SubtitleWriter):
+    extension = "vtt"
+
+    def header(self):
+        return "WEBVTT\n\n"
+
+    def cue(self, number, segment):
+        start = self.timestamp(segment["start"], ".")
+        end = self.timestamp(segment["end"], ".")
+        return f"{start} --> {end}\n{self.labelled(segment, segment['text'].strip())}\n\n"
+
+
+class BufferedFileWriter(TranscriptWriter):
+    """Shared machinery for single-file text formats (CSV, JSONL): buffered rows, rotation and resume.
+
+    A file's rows are held back until end_file(), so only whole files ever reach the output.
+    Completed rows are written out in one go once `buffer_rows` rows or `flush_seconds` have
+    built up. Outputs can be split into parts of at most `max_rows_per_part` rows, always on a
+    file boundary (a single file with more rows than that gets a part to itself). Checkpoints
+    are {"part", "offset", "rows"}: resuming truncates the current part back to the offset,
+    dropping anything written after the last reported checkpoint.
+    """
+
+    single_file = True
+    encoding = "utf-8"
+
+    def __init__(self, output_folder, include_timestamps, filename=None, on_checkpoint=None, channel_column=False,
+                 buffer_rows=2000, flush_seconds=2.0, max_rows_per_part=None):
+        super().__init__(output_folder, include_timestamps, filename, on_checkpoint, channel_column)
+        self.buffer_rows = buffer_rows
+        self.flush_seconds = flush_seconds
+        self.max_rows_per_part = max_rows_per_part
+        self.part = 1
+        self.rows_in_part = 0
+        # Completed files' (text, rows), kept apart so parts can be cut between them
+        self._buffer = []
+        self._buffered_rows = 0
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._file = None
+
+    def part_path(self, part):
+        if part == 1:
+            return self.output_path(self.filename)
+        stem, extension = os.path.splitext(self.filename)
+        return self.output_path(f"{stem} (part {part}){extension}")
+
+    def open(self, checkpoint=None):
+        if checkpoint and os.path.exists(self.part_path(checkpoint["part"])):
+            self.part = checkpoint["part"]
+            self.rows_in_part = checkpoint.get("rows", 0)
+            # Drop rows written after the last checkpoint, and any part begun after it
+            os.truncate(self.part_path(self.part), checkpoint["offset"])
+            later_part = self.part + 1
+            while os.path.exists(self.part_path(later_part)):
+                os.remove(self.part_path(later_part))
+                later_part += 1
+            self._file = open(self.part_path(self.part), 'a', newline='', encoding=self.encoding)
+        else:
+            self._start_part(1)
+            self._sync()
+            self._report(self.checkpoint())
+
+    def _start_part(self, part):
+        if self._file is not None:
+            self._file.close()
+        self.part = part
+        self.rows_in_part = 0
+        self._file = open(self.part_path(part), 'w', newline='', encoding=self.encoding)
+        self._file.write(self.header())
+
+    def header(self):
+        return ""
+
+    def render_rows(self, out, input_file, segments):
+        """Write segments to the text stream `out` in this format."""
+        raise NotImplementedError
+
+    def write_segments(self, input_file, segments, append=False):
+        pending = self._pending.get(input_file)
+        if pending is None or not append:
+            pending = self._pending[input_file] = [io.StringIO(), 0]
+        self.render_rows(pending[0], input_file, segments)
+        pending[1] += len(segments)
+
+    def end_file(self, input_file):
+        pending = self._pending.pop(input_file, None)
+        if pending is not None:
+            self._buffer.append((pending[0].getvalue(), pending[1]))
+            self._buffered_rows += pending[1]
+        self._completed.append(input_file)
+        if (self._buffered_rows >= self.buffer_rows
+                or time.monotonic() - self._last_flush >= self.flush_seconds
+                or (self.max_rows_per_part and self.rows_in_part + self._buffered_rows >= self.max_rows_per_part)):
+            self.flush()
+
+    def flush(self):
+        """Write out the rows of every completed file, then report them with the new checkpoint."""
+        for text, rows in self._buffer:
+            if (self.max_rows_per_part and self.rows_in_part
+                    and self.rows_in_part + rows > self.max_rows_per_part):
+                # Rotate on a file boundary, with the finished part safely on disk first
+                self._sync()
+                self._start_part(self.part + 1)
+            self._file.write(text)
+            self.rows_in_part += rows
+        self._buffer = []
+        self._buffered_rows = 0
+        self._sync()
+        self._last_flush = time.monotonic()
+        self._report(self.checkpoint())
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def checkpoint(self):
+        return {"part": self.part, "offset": os.fstat(self._file.fileno()).st_size, "rows": self.rows_in_part}
+
+    def close(self):
+        """Flush completed files; rows of a file that never reached end_file() are dropped."""
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+        self._pending.clear()
+
+
+class CsvWriter(BufferedFileWriter):
+    extension = "csv"
+    # Keeps the BOM Excel needs to detect UTF-8
+    encoding = "utf-8-sig"
+
+    def header(self):
+        header = ['filename', 'start_time', 'stop_time', 'text'] if self.include_timestamps else ['filename', 'text']
+        if self.channel_column:
+            header.insert(1, 'channel')
+        line = io.StringIO()
+        csv.writer(line).writerow(header)
+        return line.getvalue()
+
+    def render_rows(self, out, input_file, segments):
+        rows = []
+        for segment in segments:
+            filename, start_time, end_time, text = self.segment_fields(input_file, segment)
+            row = [filename, start_time, end_time, text] if self.include_timestamps else [filename, text]
+            if self.channel_column:
+                row.insert(1, segment.get("channel"))
+            rows.append(row)
+        csv.writer(out).writerows(rows)
+
+
+class JsonlWriter(BufferedFileWriter):
+    """One JSON object per segment, with float start/end, so consumers can load it without a CSV parse."""
+
+    extension = "jsonl"
+
+    def render_rows(self, out, input_file, segments):
+        lines = []
+        for segment in segments:
+            filename, start_time, end_time, text = self.segment_fields(input_file, segment)
+            record = {"filename": filename, "start": float(start_time), "end": float(end_time), "text": text}
+            if self.channel_column:
+                record["channel"] = segment.get("channel")
+            lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+        out.write("".join(lines))
+
+
+class ParquetWriter(TranscriptWriter):
+    """Columnar output through pyarrow: float64 start/stop times and a dictionary-encoded (categorical) filename.
+
+    Timestamps are always stored, whatever include_timestamps says, since they cost little in a
+    columnar file. Completed rows are written as row groups of about `buffer_rows`. A Parquet
+    file is only readable once its footer is written, so the output is partitioned into parts of
+    at most `max_rows_per_part` rows (cut between files), and files count as done only when
+    their part is closed. Resuming
+    starts a fresh part after the last closed one.
+    """
+
+    single_file = True
+    extension = "parquet"
+
+    def __init__(self, output_folder, include_timestamps, filename=None, on_checkpoint=None, channel_column=False,
+                 buffer_rows=50_000, max_rows_per_part=1_000_000):
+        super().__init__(output_folder, include_timestamps, filename, on_checkpoint, channel_column)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet output needs the 'pyarrow' package (pip install pyarrow).")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.buffer_rows = buffer_rows
+        self.max_rows_per_part = max_rows_per_part
+        columns = [
+            ("filename", pyarrow.dictionary(pyarrow.int32(), pyarrow.string())),
+            ("start_time", pyarrow.float64()),
+            ("stop_time", pyarrow.float64()),
+            ("text", pyarrow.string()),
+        ]
+        if channel_column:
+            columns.insert(1, ("channel", pyarrow.int16()))
+        self.schema = pyarrow.schema(columns)
+        self.part = 0
+        self.rows_in_part = 0
+        self._rows = []
+        self._pending = {}
+        self._done_in_part = []
+        self._writer = None
+
+    def part_path(self, part):
+        stem, _ = os.path.splitext(self.filename)
+        return self.output_path(f"{stem} (part {part}).parquet")
+
+    def open(self, checkpoint=None):
+        self.part = checkpoint["part"] if checkpoint else 0
+        # Parts after the checkpoint were never closed (unreadable); their files are still pending
+        later_part = self.part + 1
+        while os.path.exists(self.part_path(later_part)):
+            os.remove(self.part_path(later_part))
+            later_part += 1
+
+    def write_segments(self, input_file, segments, append=False):
+        if not append:
+            self._pending[input_file] = []
+        rows = self._pending.setdefault(input_file, [])
+        for segment in segments:
+            filename, start_time, end_time, text = self.segment_fields(input_file, segment)
+            rows.append((filename, segment.get("channel"), float(start_time), float(end_time), text))
+
+    def end_file(self, input_file):
+        rows = self._pending.pop(input_file, [])
+        in_part = self.rows_in_part + len(self._rows)
+        if in_part and in_part + len(rows) > self.max_rows_per_part:
+            # This file would take the part past its limit: it starts the next one instead
+            self._close_part()
+        self._rows.extend(rows)
+        self._done_in_part.append(input_file)
+        if len(self._rows) >= self.buffer_rows:
+            self.flush()
+        if self.rows_in_part >= self.max_rows_per_part:
+            self._close_part()
+
+    def flush(self):
+        """Write completed rows as a row group (they only become durable when the part closes)."""
+        if not self._rows:
+            return
+        if self._writer is None:
+            self.part += 1
+            self.rows_in_part = 0
+            self._writer = self._pq.ParquetWriter(self.part_path(self.part), self.schema)
+        filenames, channels, start_times, stop_times, texts = zip(*self._rows)
+        pa = self._pa
+        arrays = [
+            pa.array(filenames, type=pa.string()).dictionary_encode(),
+            pa.array(start_times, type=pa.float64()),
+            pa.array(stop_times, type=pa.float64()),
+            pa.array(texts, type=pa.string()),
+        ]
+        if self.channel_column:
+            arrays.insert(1, pa.array(channels, type=pa.int16()))
+        table = pa.Table.from_arrays(arrays, schema=self.schema)
+        self._writer.write_table(table)
+        self.rows_in_part += table.num_rows
+        self._rows = []
+
+    def _close_part(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self.rows_in_part = 0
+        self._completed.extend(self._done_in_part)
+        self._done_in_part = []
+        self._report({"part": self.part})
+
+    def close(self):
+        self._close_part()
+        self._pending.clear()
+
+
+class IndexWriter(TranscriptWriter):
+    """Adds every transcript to a TranscriptIndex, the full-text searchable database in the output folder.
+
+    The database is shared by all jobs writing to that folder. Completed files are stored in one
+    transaction per `buffer_rows` segments or `flush_seconds`, and count as done once it commits;
+    a file that is transcribed again (after a resume, say) replaces its earlier rows.
+    Timestamps are always stored, in milliseconds.
+    """
+
+    single_file = True
+    extension = "sqlite"
+    shared_filename = DEFAULT_INDEX_FILENAME
+
+    def __init__(self, output_folder, include_timestamps, filename=None, on_checkpoint=None, channel_column=False,
+                 model_name="", buffer_rows=5000, flush_seconds=2.0):
+        super().__init__(output_folder, include_timestamps, filename or self.shared_filename, on_checkpoint,
+                         channel_column)
+        self.model_name = model_name
+        self.buffer_rows = buffer_rows
+        self.flush_seconds = flush_seconds
+        self.index = None
+        self._pending = {}
+        self._transcripts = []
+        self._buffered_rows = 0
+        self._last_flush = time.monotonic()
+
+    def open(self, checkpoint=None):
+        # Nothing to roll back on resume: rows only reach the database with their file's commit
+        self.index = TranscriptIndex(self.output_path(self.filename))
+
+    def write_segments(self, input_file, segments, append=False):
+        if not append:
+            self._pending[input_file] = []
+        self._pending.setdefault(input_file, []).extend(segments)
+
+    def end_file(self, input_file):
+        segments = self._pending.pop(input_file, [])
+        self._transcripts.append((input_file, segments))
+        self._buffered_rows += len(segments)
+        self._completed.append(input_file)
+        if self._buffered_rows >= self.buffer_rows or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self._transcripts:
+            self.index.add_files(self._transcripts, self.model_name)
+            self._transcripts = []
+            self._buffered_rows = 0
+        self._last_flush = time.monotonic()
+        self._report(None)
+
+    def close(self):
+        if self.index is not None:
+            self.flush()
+            self.index.close()
+            self.index = None
+        self._pending.clear()
+
+
+WRITERS = {
+    "txt": TxtWriter,
+    "csv": CsvWriter,
+    "jsonl": JsonlWriter,
+    "parquet": ParquetWriter,
+    "srt": SrtWriter,
+    "vtt": VttWriter,
+    "sqlite": IndexWriter,
+}
+
+
+# Formats render_transcript() can produce in memory (Parquet and the database only exist as files)
+RENDERABLE_FORMATS = ("txt", "csv", "jsonl", "srt", "vtt")
+
+
+def render_transcript(output_format, input_file, segments, include_timestamps=True):
+    """The text the writer for `output_format` would produce for one file, without touching the disk."""
+    writer = WRITERS[output_format](None, include_timestamps)
+    if isinstance(writer, BufferedFileWriter):
+        out = io.StringIO()
+        out.write(writer.header())
+        writer.render_rows(out, input_file, segments)
+        return out.getvalue()
+    return writer.render(input_file, segments)
+
+
+def create_writer(output_format, output_folder, include_timestamps, filename=None, on_checkpoint=None,
+                  max_rows_per_part=None, model_name=None, channel_column=False):
+    """Build the writer for an output format; single-file formats need `filename`."""
+    writer_class = WRITERS[output_format]
+    kwargs = {"channel_column": channel_column}
+    if max_rows_per_part and writer_class.single_file and not writer_class.shared_filename:
+        kwargs["max_rows_per_part"] = max_rows_per_part
+    if writer_class is IndexWriter:
+        kwargs["model_name"] = model_name or ""
+    return writer_class(output_folder, include_timestamps, filename=filename, on_checkpoint=on_checkpoint, **kwargs)
+
+
+def output_filename(output_format, now):
+    """Name for a single-file output, e.g. '2024-01-01_12-00-00 - Whispering Wizard Output.csv'."""
+    if WRITERS[output_format].shared_filename:
+        return WRITERS[output_format].shared_filename
+    return f"{now} - Whispering Wizard Output.{WRITERS[output_format].extension}"
@@ -0,0 +1,93 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PrefetchDecoder:
+    """Decode upcoming files on a small thread pool so audio is ready before the model asks for it."""
+
+    def __init__(self, files, decode_fn, depth=2):
+        self.files = files
+        self.decode_fn = decode_fn
+        # Never hold more than `depth` decoded buffers ahead of the one being transcribed
+        self.depth = max(1, int(depth))
+
+    def __iter__(self):
+        """Yield (input_file, audio) pairs in input order, decoding up to `depth` files ahead."""
+        files = iter(self.files)
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=self.depth, thread_name_prefix="ww-decode")
+        try:
+            for input_file in files:
+                pending.append((input_file, executor.submit(self.decode_fn, input_file)))
+                if len(pending) >= self.depth:
+                    break
+
+            while pending:
+                input_file, future = pending.popleft()
+                audio = future.result()
+
+                # Refill the window before handing the buffer to the model
+                next_file = next(files, None)
+                if next_file is not None:
+                    pending.append((next_file, executor.submit(self.decode_fn, next_file)))
+
+                yield input_file, audio
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+class AsyncWriter:
+    """Run output writes on a background thread so inference never waits on disk."""
+
+    _STOP = object()
+
+    def __init__(self, max_pending=8):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._drain, name="ww-writer", daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            fn, args = item
+            # After a failure, keep consuming so producers never block, but stop writing
+            if self._error is None:
+                try:
+                    fn(*args)
+                except Exception as e:
+                    self._error = e
+
+    def submit(self, fn, *args):
+        """Queue a write; blocks only if the writer is `max_pending` items behind."""
+        self._raise_if_failed()
+        self._queue.put((fn, args))
+
+    def close(self):
+        """Wait for every queued write to finish and surface the first write error, if any."""
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+        self._raise_if_failed()
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Still flush what we have, but let the original exception win
+            try:
+                self.close()
+            except Exception:
+                pass
+        return False
@@ -0,0 +1,155 @@
+import time
+import threading
+
+
+class ProgressReporter:
+    """Single, rate-limited progress channel for a transcription run.
+
+    Every part of the pipeline reports here; at most one snapshot per `min_interval` is
+    passed on to `emit` (the worker wires it to one Qt signal). Updates that arrive inside
+    the interval replace each other, and the latest goes out once the interval is up, so
+    a run of short files costs a few emits a second rather than two per file. Only the
+    update for the last file of the queue is sent straight away.
+
+    A snapshot is a dict with the status message, overall and within-file percentages,
+    throughput in audio-seconds per second, and an ETA for the rest of the queue.
+    """
+
+    def __init__(self, emit, total_files=0, min_interval=0.2):
+        self.emit = emit
+        self.min_interval = min_interval
+        self.total_files = total_files
+        self.done_files = 0
+        self.done_audio_seconds = 0.0
+        self.known_durations = []
+        self.message = ""
+        self.current_file = None
+        self.current_fraction = 0.0
+        self.current_audio_seconds = None
+        self._started = time.perf_counter()
+        self._last_emit = 0.0
+        self._dirty = False
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def set_total(self, total_files):
+        with self._lock:
+            self.total_files = total_files
+            self._started = time.perf_counter()
+        self._publish(force=True)
+
+    def add_total(self, files):
+        """Grow the total while discovery is still finding files."""
+        if not files:
+            return
+        with self._lock:
+            self.total_files += files
+        self._publish()
+
+    def status(self, message, force=False):
+        with self._lock:
+            self.message = message
+        self._publish(force)
+
+    def file_started(self, input_file, message=None, audio_seconds=None):
+        with self._lock:
+            self.current_file = input_file
+            self.current_fraction = 0.0
+            self.current_audio_seconds = audio_seconds
+            if message is not None:
+                self.message = message
+        self._publish()
+
+    def file_progress(self, fraction, audio_seconds=None):
+        """Within-file progress, e.g. how far whisper's seek has got through the current file."""
+        with self._lock:
+            self.current_fraction = max(0.0, min(1.0, fraction))
+            if audio_seconds:
+                self.current_audio_seconds = audio_seconds
+        self._publish()
+
+    def file_done(self, audio_seconds=None, message=None):
+        with self._lock:
+            self.done_files += 1
+            audio_seconds = audio_seconds or self.current_audio_seconds
+            if audio_seconds:
+                self.done_audio_seconds += audio_seconds
+                self.known_durations.append(audio_seconds)
+            self.current_file = None
+            self.current_fraction = 0.0
+            self.current_audio_seconds = None
+            if message is not None:
+                self.message = message
+            finished = self.done_files >= self.total_files
+        self._publish(force=finished)
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = max(time.perf_counter() - self._started, 1e-6)
+            in_flight = (self.current_audio_seconds or 0.0) * self.current_fraction
+            audio_done = self.done_audio_seconds + in_flight
+            rate = audio_done / elapsed if audio_done else None
+
+            remaining_files = max(self.total_files - self.done_files, 0)
+            eta = None
+            if rate and self.known_durations:
+                # Unseen files are assumed to be as long as the average file so far
+                average = sum(self.known_durations) / len(self.known_durations)
+                remaining_audio = max(remaining_files * average - in_flight, 0.0)
+                eta = remaining_audio / rate
+            elif self.done_files:
+                eta = elapsed / self.done_files * remaining_files
+
+            if self.total_files:
+                percent = int((self.done_files + self.current_fraction) / self.total_files * 100)
+            else:
+                percent = 0
+
+            return {
+                "message": self.message,
+                "percent": min(percent, 100),
+                "file_percent": int(self.current_fraction * 100),
+                "done_files": self.done_files,
+                "total_files": self.total_files,
+                "audio_seconds_per_second": round(rate, 2) if rate else None,
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+            }
+
+    def flush(self):
+        """Send any update that is still being held back by the rate limit."""
+        if self._dirty:
+            self._publish(force=True)
+
+    def _publish(self, force=False):
+        now = time.perf_counter()
+        with self._lock:
+            wait = self._last_emit + self.min_interval - now
+            if not force and wait > 0:
+                self._dirty = True
+                if self._timer is None:
+                    # Send the held-back update when the interval is up, even if nothing else arrives
+                    self._timer = threading.Timer(wait, self._send_held_back)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            self._last_emit = now
+            self._dirty = False
+        self.emit(self.snapshot())
+
+    def _send_held_back(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+
+def format_progress(snapshot):
+    """Human-readable status line for a progress snapshot."""
+    parts = [snapshot["message"]]
+    if snapshot.get("audio_seconds_per_second"):
+        parts.append(f"{snapshot['audio_seconds_per_second']:.1f}x real time")
+    eta = snapshot.get("eta_seconds")
+    if eta is not None and snapshot.get("done_files", 0) < snapshot.get("total_files", 0):
+        minutes, seconds = divmod(int(eta), 60)
+        hours, minutes = divmod(minutes, 60)
+        parts.append(f"about {hours}h {minutes:02d}m left" if hours else f"about {minutes}m {seconds:02d}s left")
+    return " — ".join(part for part in parts if part)
@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import uuid
+import cProfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from .normalize_path import normalize_path
+
+
+class FileMetrics:
+    """Timings and facts for one file as it moves through decode -> detect -> transcribe -> write."""
+
+    def __init__(self, input_file):
+        self.input_file = input_file
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.fields = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block and add it to this file's stage `name` (stages can be entered from any thread)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def set(self, **fields):
+        with self._lock:
+            self.fields.update(fields)
+
+    def as_record(self):
+        with self._lock:
+            record = {
+                "file": self.input_file,
+                "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+                "total_seconds": round(time.perf_counter() - self.started, 4),
+            }
+            record.update(self.fields)
+        audio_seconds = record.get("audio_seconds")
+        processing = sum(self.stages.values())
+        if audio_seconds:
+            # Time actually spent on this file (stages), not the wall time it spent queued in the pipeline
+            record["real_time_factor"] = round(processing / audio_seconds, 4)
+        return record
+
+
+class MetricsRecorder:
+    """Collects per-file and per-job stage timings and appends them as JSON lines to a metrics file.
+
+    Every record also goes to `on_record` (the worker wires this to a Qt signal).
+    """
+
+    def __init__(self, path=None, on_record=None):
+        self.path = normalize_path(path or os.path.join("logs", "ww-metrics.jsonl"))
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.on_record = on_record
+        self.run_id = uuid.uuid4().hex[:12]
+        self._files = {}
+        self._lock = threading.Lock()
+        self._out = open(self.path, "a", encoding="utf-8")
+
+    def file(self, input_file):
+        """The FileMetrics for a file, created on first use (decode threads, the worker and the writer share it)."""
+        with self._lock:
+            metrics = self._files.get(input_file)
+            if metrics is None:
+                metrics = self._files[input_file] = FileMetrics(input_file)
+            return metrics
+
+    def finish_file(self, input_file, **fields):
+        """Emit the file's record and forget it."""
+        with self._lock:
+            metrics = self._files.pop(input_file, None)
+        if metrics is None:
+            metrics = FileMetrics(input_file)
+        metrics.set(**fields)
+        self.record("file", **metrics.as_record())
+
+    def discard_file(self, input_file):
+        with self._lock:
+            self._files.pop(input_file, None)
+
+    @contextmanager
+    def job_stage(self, name):
+        """Time a job-level stage such as model load and record it on its own line."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record("job_stage", stage=name, seconds=round(time.perf_counter() - start, 4))
+
+    def record(self, event, **fields):
+        record = {"event": event, "run_id": self.run_id, "time": datetime.now().isoformat(timespec="milliseconds")}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            if not self._out.closed:
+                self._out.write(line + "\n")
+                self._out.flush()
+        if self.on_record is not None:
+            self.on_record(record)
+
+    def close(self):
+        with self._lock:
+            self._out.close()
+
+
+class RunProfiler:
+    """Opt-in profiler covering the first N files of a run.
+
+    cProfile sees the thread that called start() (the worker's inference loop); with
+    `use_torch` a torch.profiler trace of the same span is exported for chrome://tracing.
+    Only the in-process pipeline is covered: pool processes are not profiled. Profiling
+    starts at most once per run, so a job that processes files in several passes (watch
+    mode, shared queues) keeps the capture of its first files.
+    """
+
+    def __init__(self, max_files, output_dir=None, use_torch=False):
+        self.max_files = max_files
+        self.output_dir = normalize_path(output_dir or "logs")
+        self.use_torch = use_torch
+        self.files_seen = 0
+        self._profile = None
+        self._torch_profile = None
+        self._started = False
+
+    @property
+    def active(self):
+        return self._profile is not None
+
+    def start(self):
+        if self.max_files <= 0 or self._started or self.files_seen >= self.max_files:
+            return
+        self._started = True
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._profile = cProfile.Profile()
+        if self.use_torch:
+            import torch
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            self._torch_profile = torch.profiler.profile(activities=activities, record_shapes=True)
+            self._torch_profile.__enter__()
+        self._profile.enable()
+
+    def file_done(self, count=1):
+        if not self.active:
+            return
+        self.files_seen += count
+        if self.files_seen >= self.max_files:
+            self.stop()
+
+    def stop(self):
+        """Stop profiling and write logs/ww-profile.pstats (and ww-torch-trace.json)."""
+        if not self.active:
+            return
+        self._profile.disable()
+        self._profile.dump_stats(os.path.join(self.output_dir, "ww-profile.pstats"))
+        self._profile = None
+        if self._torch_profile is not None:
+            self._torch_profile.__exit__(None, None, None)
+            self._torch_profile.export_chrome_trace(os.path.join(self.output_dir, "ww-torch-trace.json"))
+            self._torch_profile = None
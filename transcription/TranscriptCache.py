@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from .normalize_path import normalize_path
+
+# 1 MB reads keep hashing fast without holding big media files in memory
+HASH_CHUNK_BYTES = 1 << 20
+
+DEFAULT_HASHES_PATH = "file_hashes.sqlite"
+
+
+def hash_file(input_file):
+    """BLAKE2 of a file's bytes, read in chunks."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(input_file, "rb") as media:
+        for chunk in iter(lambda: media.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FileHashes:
+    """Remembers (size, mtime) -> content hash per path, so unchanged files are recognised
+    from a single stat() and never re-hashed.
+
+    The transcript and audio caches (and the pool processes) share one table, so a new
+    file is only read once to hash it, whichever caches are on.
+    """
+
+    def __init__(self, path=None):
+        path = normalize_path(path or DEFAULT_HASHES_PATH)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS file_hashes (
+                                    path TEXT PRIMARY KEY,
+                                    size INTEGER NOT NULL,
+                                    mtime_ns INTEGER NOT NULL,
+                                    content_hash TEXT NOT NULL)""")
+
+    def content_hash(self, input_file):
+        """BLAKE2 of the file's bytes, reusing the stored hash when size and mtime are unchanged."""
+        path = os.path.abspath(input_file)
+        stat = os.stat(input_file)
+
+        with self._lock:
+            row = self._db.execute("SELECT size, mtime_ns, content_hash FROM file_hashes WHERE path = ?",
+                                   (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        content_hash = hash_file(input_file)
+
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)",
+                             (path, stat.st_size, stat.st_mtime_ns, content_hash))
+        return content_hash
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class TranscriptCache:
+    """Persistent SQLite cache of transcription results, keyed by media content + model + options.
+
+    Content hashes come from `hashes`, a FileHashes shared with the audio cache; without
+    one the cache opens the default table itself.
+    """
+
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, hashes=None):
+        cache_dir = normalize_path(cache_dir or "transcript_cache")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._owns_hashes = hashes is None
+        self.hashes = FileHashes() if hashes is None else hashes
+        self._lock = threading.Lock()
+        # Lookups come from the prefetch threads and writes from the worker, so guard one shared connection
+        self._db = sqlite3.connect(os.path.join(cache_dir, "transcripts.sqlite"), check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS transcripts (
+                                    cache_key TEXT PRIMARY KEY,
+                                    content_hash TEXT NOT NULL,
+                                    model_name TEXT NOT NULL,
+                                    result_json TEXT NOT NULL,
+                                    size_bytes INTEGER NOT NULL,
+                                    last_used REAL NOT NULL)""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS transcripts_last_used ON transcripts (last_used)")
+
+    def content_hash(self, input_file):
+        return self.hashes.content_hash(input_file)
+
+    @staticmethod
+    def cache_key(content_hash, model_name, options):
+        """Combine content, model and decoding options; any change to these is a different transcript."""
+        # verbose only changes console output, not the result
+        options = {k: v for k, v in options.items() if k != "verbose"}
+        payload = json.dumps([content_hash, model_name, options], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def key_for(self, input_file, model_name, options):
+        return self.cache_key(self.content_hash(input_file), model_name, options)
+
+    def get(self, input_file, model_name, options):
+        """Return the cached result dict for this file, or None."""
+        cache_key = self.key_for(input_file, model_name, options)
+        with self._lock, self._db:
+            row = self._db.execute("SELECT result_json FROM transcripts WHERE cache_key = ?",
+                                   (cache_key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE transcripts SET last_used = ? WHERE cache_key = ?", (time.time(), cache_key))
+        return json.loads(row[0])
+
+    def put(self, input_file, model_name, options, result):
+        """Store the parts of a whisper result that output writers need, then evict down to max_bytes."""
+        content_hash = self.content_hash(input_file)
+        cache_key = self.cache_key(content_hash, model_name, options)
+        stored = {
+            "text": result.get("text", ""),
+            "language": result.get("language"),
+            # Token ids are only useful to whisper itself and make up most of a result's size
+            "segments": [{k: v for k, v in segment.items() if k != "tokens"} for segment in result["segments"]],
+        }
+        result_json = json.dumps(stored, ensure_ascii=False, default=float)
+
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?, ?, ?)",
+                             (cache_key, content_hash, model_name, result_json, len(result_json), time.time()))
+            self._evict()
+
+    def _evict(self):
+        """Drop least-recently-used transcripts until the cache fits in max_bytes (caller holds the lock)."""
+        total = self._db.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM transcripts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for cache_key, size_bytes in self._db.execute(
+                "SELECT cache_key, size_bytes FROM transcripts ORDER BY last_used").fetchall():
+            self._db.execute("DELETE FROM transcripts WHERE cache_key = ?", (cache_key,))
+            total -= size_bytes
+            if total <= self.max_bytes:
+                break
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+        if self._owns_hashes:
+            self.hashes.close()
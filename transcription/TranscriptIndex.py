@@ -0,0 +1,154 @@
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from .normalize_path import normalize_path
+
+DEFAULT_INDEX_FILENAME = "Whispering Wizard Transcripts.sqlite"
+
+
+def fts_query(text):
+    """Turn what a user typed into an FTS5 query matching segments that contain every word.
+
+    Each word is quoted, so punctuation and FTS5 keywords (AND, NEAR, ...) are taken literally;
+    a trailing * keeps its meaning as a prefix search.
+    """
+    terms = []
+    for word in re.findall(r'[^\s"]+', text):
+        prefix = word.endswith("*") and len(word) > 1
+        word = word.rstrip("*") if prefix else word
+        terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class TranscriptIndex:
+    """Transcripts kept in one SQLite database with an FTS5 full-text index over the segment text.
+
+    files       one row per (path, model); transcribing a file again with the same model
+                replaces its segments, a different model adds a second transcript
+    segments    file, start/stop in milliseconds, audio channel (for channel-split jobs) and text,
+                one row per segment
+    segments_fts  external-content FTS5 table over segments.text, kept in step by triggers
+
+    The database only grows, job after job, so years of output can be searched in one place.
+    It runs in WAL mode: searches keep working while a job is adding to it.
+    """
+
+    def __init__(self, path):
+        self.path = normalize_path(path)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS files (
+                                    id INTEGER PRIMARY KEY,
+                                    path TEXT NOT NULL,
+                                    filename TEXT NOT NULL,
+                                    model TEXT NOT NULL,
+                                    transcribed_at TEXT NOT NULL,
+                                    UNIQUE (path, model))""")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS segments (
+                                    id INTEGER PRIMARY KEY,
+                                    file_id INTEGER NOT NULL REFERENCES files (id),
+                                    start_ms INTEGER NOT NULL,
+                                    stop_ms INTEGER NOT NULL,
+                                    channel INTEGER,
+                                    text TEXT NOT NULL)""")
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(segments)")]
+            if "channel" not in columns:
+                # Databases from before channel-split jobs
+                self._db.execute("ALTER TABLE segments ADD COLUMN channel INTEGER")
+            self._db.execute("CREATE INDEX IF NOT EXISTS segments_file ON segments (file_id, start_ms)")
+            self._db.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5 (
+                                    text, content='segments', content_rowid='id',
+                                    tokenize='unicode61 remove_diacritics 2')""")
+            self._db.execute("""CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN
+                                    INSERT INTO segments_fts (rowid, text) VALUES (new.id, new.text);
+                                END""")
+            self._db.execute("""CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN
+                                    INSERT INTO segments_fts (segments_fts, rowid, text)
+                                    VALUES ('delete', old.id, old.text);
+                                END""")
+
+    @classmethod
+    def open(cls, location):
+        """Open an index given either the database file or the output folder it was written to."""
+        if os.path.isdir(location):
+            location = os.path.join(location, DEFAULT_INDEX_FILENAME)
+        if not os.path.exists(location):
+            raise FileNotFoundError(f"No transcript database at {location}")
+        return cls(location)
+
+    def add_files(self, transcripts, model_name):
+        """Store [(input_file, segments)] in one transaction, replacing earlier transcripts by the same model."""
+        transcribed_at = datetime.now().isoformat(timespec="seconds")
+        with self._lock, self._db:
+            for input_file, segments in transcripts:
+                path = os.path.abspath(input_file)
+                row = self._db.execute("SELECT id FROM files WHERE path = ? AND model = ?",
+                                       (path, model_name)).fetchone()
+                if row is None:
+                    file_id = self._db.execute(
+                        "INSERT INTO files (path, filename, model, transcribed_at) VALUES (?, ?, ?, ?)",
+                        (path, os.path.basename(input_file), model_name, transcribed_at)).lastrowid
+                else:
+                    file_id = row[0]
+                    self._db.execute("DELETE FROM segments WHERE file_id = ?", (file_id,))
+                    self._db.execute("UPDATE files SET transcribed_at = ? WHERE id = ?", (transcribed_at, file_id))
+                self._db.executemany(
+                    "INSERT INTO segments (file_id, start_ms, stop_ms, channel, text) VALUES (?, ?, ?, ?, ?)",
+                    [(file_id, int(round(segment["start"] * 1000)), int(round(segment["end"] * 1000)),
+                      segment.get("channel"), segment["text"].strip()) for segment in segments])
+
+    def search(self, query, limit=50, model=None, filename=None, raw=False):
+        """Best-matching segments for `query`, as dicts with times in milliseconds.
+
+        Every word has to appear in a segment (end a word with * to match it as a prefix).
+        With raw=True, `query` is passed to FTS5 as is, for phrases, OR, NEAR and so on.
+        `filename` narrows the search to files whose name contains it.
+        """
+        match = query if raw else fts_query(query)
+        if not match:
+            return []
+        sql = ["""SELECT files.filename, files.path, files.model, segments.start_ms, segments.stop_ms,
+                         segments.channel, segments.text
+                  FROM segments_fts
+                  JOIN segments ON segments.id = segments_fts.rowid
+                  JOIN files ON files.id = segments.file_id
+                  WHERE segments_fts MATCH ?"""]
+        params = [match]
+        if model:
+            sql.append("AND files.model = ?")
+            params.append(model)
+        if filename:
+            sql.append("AND files.filename LIKE ?")
+            params.append(f"%{filename}%")
+        sql.append("ORDER BY segments_fts.rank LIMIT ?")
+        params.append(limit)
+
+        with self._lock:
+            rows = self._db.execute(" ".join(sql), params).fetchall()
+        return [{"filename": filename, "path": path, "model": model, "start_ms": start_ms, "stop_ms": stop_ms,
+                 "channel": channel, "text": text} for filename, path, model, start_ms, stop_ms, channel, text in rows]
+
+    def counts(self):
+        """(files, segments) stored so far."""
+        with self._lock:
+            files = self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            segments = self._db.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        return files, segments
+
+    def optimize(self):
+        """Merge the full-text index's segments; worth running after a large job."""
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO segments_fts (segments_fts) VALUES ('optimize')")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
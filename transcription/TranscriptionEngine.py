@@ -0,0 +1,865 @@
+import os
+import sys
+import itertools
+import threading
+import time
+from datetime import datetime
+from .normalize_path import normalize_path
+from .decode_audio import decode_audio, SAMPLE_RATE
+from .windowed_transcribe import transcribe_in_windows, DEFAULT_WINDOW_SECONDS, DEFAULT_OVERLAP_SECONDS
+from .PrefetchPipeline import PrefetchDecoder, AsyncWriter
+from .TranscriptionPool import TranscriptionPool, autotune_layout
+from .TranscriptCache import FileHashes, TranscriptCache
+from .AudioCache import AudioCache
+from .JobManifest import JobManifest
+from .BatchTranscriber import BatchTranscriber, is_short_clip
+from .StageMetrics import MetricsRecorder, FileMetrics, RunProfiler
+from .language_detection import detect_language
+from .ProgressReporter import ProgressReporter
+from .whisper_progress import transcribe_progress
+from .OutputWriters import WRITERS, create_writer, output_filename
+from .file_discovery import (SUPPORTED_EXTENSIONS, iter_media_batches, iter_media_files, may_be_longer_than,
+                             probe_durations, quick_duration, schedule_files)
+from .FolderWatcher import FolderWatcher
+from .WorkQueue import LeaseQueue, QueueResultWriter
+from .quantized_model import load_model
+from .voice_activity import DEFAULT_VAD_OPTIONS, filter_silence, remap_result, empty_result, combine_reports
+from .decoding_profiles import DEFAULT_PROFILE, profile_options, FolderLanguageHints, ProfileStats
+from .channel_split import decode_channels, active_channels, merge_channel_results
+
+
+class TranscriptionEngine:
+    """One transcription job, start to finish, with no GUI attached.
+
+    run() does the work on the calling thread and reports through optional callbacks:
+    on_progress(snapshot) with rate-limited ProgressReporter dicts, on_metrics(record) with
+    StageMetrics records, on_result(input_file, result) as each file's transcript is written,
+    on_error(message) and on_complete(). Callbacks can fire from the decode and writer
+    threads as well as the one running the job. torch and whisper are only imported once a
+    model is actually loaded.
+    """
+
+    MAX_FILENAME_LENGTH = 50
+    # How many files auto-tune times each candidate layout on
+    AUTOTUNE_SAMPLE_FILES = 8
+
+    def __init__(self, input_folder, output_folder, model_name, include_timestamps, output_format,
+                 prefetch_depth=2, processes=1, threads_per_process=None, autotune=False,
+                 use_cache=True, resume=True, model_registry=None,
+                 stream_window_seconds=DEFAULT_WINDOW_SECONDS, stream_overlap_seconds=DEFAULT_OVERLAP_SECONDS,
+                 batch_size=1, metrics_path=None, profile_first_files=0, profile_torch=False,
+                 max_rows_per_part=None, schedule="found", watch=False, vad_options=None,
+                 decoding_profile=DEFAULT_PROFILE, language=None, cache_audio=False, cache_mels=False,
+                 distributed=False, node_id=None, queue_dir=None, split_channels=False,
+                 on_progress=None, on_metrics=None, on_result=None, on_error=None, on_complete=None):
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        self.model_name = model_name
+        self.include_timestamps = include_timestamps
+        self.output_format = output_format
+        # Number of files decoded ahead of the one currently being transcribed
+        self.prefetch_depth = prefetch_depth
+        # Pool mode: more than one process, each with its own model and torch thread budget
+        self.processes = processes
+        self.threads_per_process = threads_per_process
+        self.autotune = autotune
+        # Serve unchanged files from the transcript cache instead of re-transcribing them
+        self.use_cache = use_cache
+        self.cache = None
+        # Keep decoded audio (and, with cache_mels, short clips' log-mel windows) so later runs skip ffmpeg
+        self.cache_audio = cache_audio
+        self.cache_mels = cache_mels
+        self.audio_cache = None
+        self.file_hashes = None
+        # Share the input folder with other machines through a lease queue on the shared drive (see WorkQueue)
+        self.distributed = distributed
+        self.node_id = node_id
+        self.queue_dir = queue_dir
+        self.queue = None
+        # Pick up an unfinished job with the same settings from its manifest in the output folder
+        self.resume = resume
+        self.manifest = None
+        # Single-file outputs (CSV, JSONL, Parquet) are split into parts of at most this many rows
+        self.max_rows_per_part = max_rows_per_part
+        self.output_writer = None
+        # Shared with the app so loaded models stay warm between jobs; None loads a fresh model
+        self.model_registry = model_registry
+        # Files longer than one window are decoded and transcribed window by window; None turns this off
+        self.stream_window_seconds = stream_window_seconds
+        self.stream_overlap_seconds = stream_overlap_seconds
+        # Clips of 30 s or less are decoded together this many at a time; 1 disables batching
+        self.batch_size = batch_size
+        # Per-file/per-stage timings go to this JSONL file (default logs/ww-metrics.jsonl) and on_metrics
+        self.metrics_path = metrics_path
+        self.metrics = None
+        # Opt-in cProfile (and torch.profiler) capture of the first N files
+        self.profiler = RunProfiler(profile_first_files, use_torch=profile_torch)
+        self.on_progress = on_progress
+        self.on_metrics = on_metrics
+        self.on_result = on_result
+        self.on_error = on_error
+        self.on_complete = on_complete
+        self.progress = ProgressReporter(self.emit_progress)
+        # "found" starts on files as discovery finds them; "longest"/"shortest" probe durations and sort first
+        self.schedule = schedule
+        self.durations = {}
+        # After the backlog, keep the model loaded and transcribe files as they land in the input folder
+        self.watch = watch
+        self.watcher = None
+        self._stop_watching = threading.Event()
+        # Cut silence out before inference with these thresholds (see voice_activity); None turns it off
+        self.vad_options = None if vad_options is None else dict(DEFAULT_VAD_OPTIONS, **vad_options)
+        self.vad_reports = []
+        self.vad_totals = None
+        # Speed/accuracy trade-off for decoding (see decoding_profiles)
+        self.decoding_profile = decoding_profile
+        # A fixed language skips detection; whisper-language.txt files in the tree override it per folder
+        self.language = language
+        self.language_hints = FolderLanguageHints(input_folder, language)
+        # Transcribe each channel on its own (stereo calls, multi-mic meetings) and merge them by time;
+        # files are then decoded whole, with no streaming, batching or audio cache
+        self.split_channels = split_channels
+        # Model time and audio duration of the files actually transcribed, for the profile's measured speed
+        self._profile_seconds = [0.0, 0.0]
+        self._profile_lock = threading.Lock()
+
+    def emit_progress(self, snapshot):
+        if self.on_progress is not None:
+            self.on_progress(snapshot)
+
+    def run(self):
+        """Run the whole job; True if it finished, False if it stopped on an error (already reported)."""
+        job_start = time.perf_counter()
+        try:
+            # The manifest, metrics and output files all go here, so make sure it exists before anything is written
+            os.makedirs(self.output_folder, exist_ok=True)
+            self.metrics = MetricsRecorder(self.metrics_path, on_record=self.on_metrics_record)
+            model_dir = normalize_path("whisper_models")
+            os.makedirs(model_dir, exist_ok=True)
+
+            if self.distributed and self.watch:
+                raise ValueError("Watching the input folder isn't available when sharing work with other machines")
+            if self.watch:
+                # Start before discovery so nothing dropped in while the backlog runs is missed
+                self.watcher = FolderWatcher(self.input_folder, SUPPORTED_EXTENSIONS).start()
+
+            if self.distributed:
+                files_to_process = self.join_shared_queue()
+            else:
+                self.open_manifest()
+                files_to_process = iter(self.discover_files())
+            if self.watcher is not None:
+                files_to_process = self.mark_seen_by_watcher(files_to_process)
+
+            if self.use_cache or self.cache_audio:
+                # Both caches key on the file's content; one table means each new file is hashed once
+                self.file_hashes = FileHashes()
+            if self.use_cache:
+                self.cache = TranscriptCache(hashes=self.file_hashes)
+            if self.cache_audio and not self.split_channels:
+                self.audio_cache = AudioCache(store_mel=self.cache_mels, hashes=self.file_hashes)
+
+            sample_files = list(itertools.islice(files_to_process, self.AUTOTUNE_SAMPLE_FILES)) if self.autotune else []
+            if sample_files:
+                files_to_process = itertools.chain(sample_files, files_to_process)
+                self.processes, self.threads_per_process = autotune_layout(
+                    self.model_name, model_dir, sample_files,
+                    self.transcribe_options(), status_callback=self.progress.status,
+                    options_for=self.options_for)
+                self.progress.status(
+                    f"Auto-tune picked {self.processes} process(es) x {self.threads_per_process} thread(s).")
+
+            # Pool processes load their own models; the parent only writes
+            model = self.load_model(model_dir) if self.processes == 1 else None
+            if self.profiler.max_files > 0 and self.processes > 1:
+                self.progress.status("Profiling only covers single-process runs; this run won't be profiled.",
+                                     force=True)
+                print("Profiling needs --processes 1; no profile will be written.", file=sys.stderr)
+            else:
+                # Once per run, so later passes (watch mode, shared queues) don't overwrite the capture
+                self.profiler.start()
+
+            if self.queue is not None:
+                self.process_shared_queue(list(files_to_process), model, model_dir)
+            else:
+                # Files are recorded as done in the manifest only once the writer reports them durable
+                self.output_writer = create_writer(self.output_format, self.output_folder, self.include_timestamps,
+                                                   filename=self.manifest.output_filename,
+                                                   on_checkpoint=self.manifest.mark_done,
+                                                   max_rows_per_part=self.max_rows_per_part,
+                                                   model_name=self.model_name,
+                                                   channel_column=self.split_channels)
+                self.output_writer.open(self.manifest.output_checkpoint)
+                self.process_files(files_to_process, self.output_writer, model, model_dir)
+                if self.watcher is not None:
+                    self.output_writer.flush()
+                    self.watch_folder(self.output_writer, model or self.load_model(model_dir))
+                self.output_writer.close()
+                self.output_writer = None
+                self.manifest.mark_complete()
+
+            vad_totals = self.report_skipped_silence()
+            self.record_profile_speed()
+            self.progress.flush()
+            self.metrics.record("job", model=self.model_name, profile=self.decoding_profile,
+                                files=self.progress.total_files,
+                                wall_seconds=round(time.perf_counter() - job_start, 3), vad=vad_totals)
+            if self.on_complete is not None:
+                self.on_complete()
+            return True
+
+        except Exception as e:
+            print(f"Error during transcription: {e}", file=sys.stderr)
+            if self.on_error is not None:
+                self.on_error(f"Error during transcription: {e}")
+            return False
+
+        finally:
+            self.profiler.stop()
+            if self.queue is not None:
+                # Hands back any leases still held, so other nodes can pick those files up straight away
+                self.queue.stop()
+                self.queue = None
+            if self.watcher is not None:
+                self.watcher.stop()
+                self.watcher = None
+            if self.output_writer is not None:
+                # Keep whatever completed files are buffered, so a resume doesn't redo them
+                try:
+                    self.output_writer.close()
+                except Exception as e:
+                    print(f"Error closing output: {e}", file=sys.stderr)
+                self.output_writer = None
+            if self.metrics is not None:
+                self.metrics.close()
+                self.metrics = None
+            self.manifest = None
+            if self.cache is not None:
+                self.cache.close()
+                self.cache = None
+            if self.audio_cache is not None:
+                self.audio_cache.close()
+                self.audio_cache = None
+            if self.file_hashes is not None:
+                self.file_hashes.close()
+                self.file_hashes = None
+
+    def join_shared_queue(self):
+        """Distributed mode: open the lease queue and list every file, in the same order on every node."""
+        queue_dir = self.queue_dir or os.path.join(self.output_folder, LeaseQueue.DIRNAME)
+        files = sorted(iter_media_files(self.input_folder, SUPPORTED_EXTENSIONS),
+                       key=lambda input_file: os.path.relpath(input_file, self.input_folder).replace(os.sep, "/"))
+        # Nodes may mount the share in different places, so the input folder isn't part of the job's identity
+        settings = {key: value for key, value in self.job_settings().items() if key != "input_folder"}
+        self.queue = LeaseQueue.for_job(self.input_folder, queue_dir, settings, files, node_id=self.node_id)
+        self.progress.status(f"Joining the shared queue as {self.queue.node_id}...", force=True)
+        self.progress.set_total(len(self.queue.unfinished(files)))
+        return iter(files)
+
+    def process_shared_queue(self, files, model, model_dir):
+        """Transcribe whatever this node can claim, wait out other nodes' leases, then merge the results.
+
+        Each pass runs the normal pipeline over the files this node wins; results go to the
+        queue rather than the output. Files still leased elsewhere are retried on the next pass,
+        which reclaims them if their node has stopped renewing.
+        """
+        self.queue.start_renewing()
+        self.output_writer = QueueResultWriter(self.queue)
+        remaining = self.queue.unfinished(files)
+        while remaining:
+            done_before = self.progress.done_files
+            self.process_files(self.queue.claim_files(remaining), self.output_writer, model, model_dir)
+            still_remaining = self.queue.unfinished(remaining)
+            # Count what the other machines finished meanwhile, so the progress bar covers the whole job
+            done_here = self.progress.done_files - done_before
+            for _ in range(len(remaining) - len(still_remaining) - done_here):
+                self.progress.file_done()
+            remaining = still_remaining
+            if remaining:
+                self.progress.status(f"Waiting for {len(remaining)} file(s) being transcribed on other machines...")
+                time.sleep(self.queue.lease_seconds / 4)
+        self.output_writer = None
+
+        if self.queue.is_merged():
+            self.progress.status("This job's transcripts were already merged into the output.", force=True)
+            return
+        filename = self.get_output_filename() if WRITERS[self.output_format].single_file else None
+        output_writer = create_writer(self.output_format, self.output_folder, self.include_timestamps,
+                                      filename=filename, max_rows_per_part=self.max_rows_per_part,
+                                      model_name=self.model_name, channel_column=self.split_channels)
+        if self.queue.merge(files, output_writer):
+            self.progress.status("Merged every machine's transcripts into the output.", force=True)
+        else:
+            self.progress.status("All files are transcribed; another machine is writing the output.", force=True)
+
+    def load_model(self, model_dir):
+        """The in-process model: from the app's registry when there is one (possibly already warm)."""
+        if self.model_registry is not None and self.model_registry.is_loaded(self.model_name):
+            self.progress.status("Model already loaded.")
+            return self.model_registry.get(self.model_name)
+
+        self.progress.status(f"Downloading/loading model: {self.model_name}...", force=True)
+        with self.metrics.job_stage("load_model"):
+            if self.model_registry is not None:
+                model = self.model_registry.get(self.model_name)
+            else:
+                model = load_model(self.model_name, model_dir)
+        self.progress.status("Model loaded successfully.", force=True)
+        return model
+
+    def stop_watching(self):
+        """Ask a watching job to finish; safe to call from any thread."""
+        self._stop_watching.set()
+        if self.watcher is not None:
+            self.watcher.wake()
+
+    def mark_seen_by_watcher(self, files_to_process):
+        """Pass backlog files through, telling the watcher not to report them again."""
+        for input_file in files_to_process:
+            self.watcher.mark_seen(input_file)
+            yield input_file
+
+    def watch_folder(self, output_writer, model):
+        """Transcribe new and changed files as they settle in the input folder, until stop_watching().
+
+        Files go through the same per-file path as the backlog, one at a time with the warm
+        model. Per-file outputs are rewritten when a file changes; single-file outputs get the
+        new transcript appended.
+        """
+        idle_message = ("Watching the input folder for new files..." if self.watcher.event_driven
+                        else "Watching the input folder for new files (polling)...")
+        self.progress.status(idle_message, force=True)
+        while not self._stop_watching.is_set():
+            for input_file in self.watcher.poll():
+                if self._stop_watching.is_set():
+                    break
+                self.progress.add_total(1)
+                self.manifest.add_files([input_file], save=False)
+                self.progress.file_started(
+                    input_file, f"Processing file: {self.truncate_filename(os.path.basename(input_file))}")
+                try:
+                    self.process_and_transcribe_file(input_file, output_writer, model)
+                except Exception as e:
+                    # One unreadable drop shouldn't end the watch; it's retried if the file changes again
+                    print(f"Error transcribing {input_file}: {e}", file=sys.stderr)
+                    if self.metrics is not None:
+                        self.metrics.discard_file(input_file)
+                    self.progress.file_done(message=f"Could not transcribe {os.path.basename(input_file)}: {e}")
+                    continue
+                # Make the transcript durable straight away rather than waiting for a bigger batch
+                output_writer.flush()
+                self.progress.file_done(message=idle_message)
+            self.watcher.wait()
+
+    def process_files(self, files_to_process, output_writer, model, model_dir):
+        """Transcribe files while the next ones decode in the background and finished ones are written."""
+        if self.split_channels:
+            self.process_channel_files(files_to_process, output_writer, model, model_dir)
+            return
+        if self.processes > 1:
+            self.process_files_in_pool(files_to_process, output_writer, model_dir)
+            return
+
+        prefetcher = PrefetchDecoder(files_to_process, self.prefetch_audio, depth=self.prefetch_depth)
+
+        with AsyncWriter() as writer:
+            batch = []
+            for input_file, audio in prefetcher:
+                if self.batch_size > 1 and is_short_clip(audio):
+                    # Hold short clips back until there are enough for one batched forward pass
+                    batch.append((input_file, audio))
+                    if len(batch) < self.batch_size:
+                        continue
+                    self.process_batch(batch, output_writer, model, writer)
+                    self.profiler.file_done(len(batch))
+                    batch = []
+                else:
+                    self.progress.file_started(
+                        input_file, f"Processing file: {self.truncate_filename(os.path.basename(input_file))}",
+                        audio_seconds=len(audio) / SAMPLE_RATE if audio is not None else None)
+                    self.process_and_transcribe_file(input_file, output_writer, model, audio=audio, writer=writer)
+                    self.progress.file_done()
+                    self.profiler.file_done()
+
+            if batch:
+                self.process_batch(batch, output_writer, model, writer)
+                self.profiler.file_done(len(batch))
+
+    def process_batch(self, batch, output_writer, model, writer):
+        """Transcribe a group of short clips in one pass and scatter the results to per-file writes."""
+        self.progress.status(f"Transcribing a batch of {len(batch)} short clips...", force=True)
+        clips = [self.speech_only(input_file, audio) for input_file, audio in batch]
+        # Clips that are all silence never reach the model. The rest go in one pass per language hint,
+        # since a decoding pass has a single language setting (None detects it per clip).
+        by_language = {}
+        for (input_file, _), (speech, _, _) in zip(batch, clips):
+            if len(speech):
+                by_language.setdefault(self.language_hints.language_for(input_file), []).append((input_file, speech))
+
+        batch_results = {}
+        for language, group in by_language.items():
+            group_start = time.perf_counter()
+            mels = None
+            if self.audio_cache is not None and self.audio_cache.store_mel and self.vad_options is None:
+                mels = [self.audio_cache.mel(input_file, speech, model.dims.n_mels) for input_file, speech in group]
+            results = BatchTranscriber(model, self.options_for(group[0][0])).transcribe_batch(
+                [speech for _, speech in group], mels)
+            # Language detection and decoding share one pass here, so split the pass time evenly
+            group_share = (time.perf_counter() - group_start) / len(group)
+            for (input_file, _), result in zip(group, results):
+                batch_results[input_file] = (result, group_share)
+
+        for (input_file, audio), (speech, timeline, vad_report) in zip(batch, clips):
+            file_metrics = self.file_metrics(input_file)
+            file_metrics.set(mode="batch", audio_seconds=round(len(audio) / SAMPLE_RATE, 3))
+            if not len(speech):
+                result = empty_result(self.language_hints.language_for(input_file))
+            else:
+                result, batch_share = batch_results[input_file]
+                file_metrics.add_stage("transcribe", batch_share)
+                if result is None:
+                    # Failed the quality checks in the single pass; let transcribe() do its temperature fallback
+                    with file_metrics.stage("transcribe"):
+                        result = model.transcribe(speech, **self.options_for(input_file))
+                    file_metrics.set(mode="batch+fallback")
+            result = self.restore_timeline(input_file, result, timeline, vad_report)
+            file_metrics.set(segments=len(result["segments"]))
+            self.store_in_cache(input_file, result)
+            writer.submit(self.finish_file, result, input_file, output_writer)
+            self.progress.file_done(audio_seconds=len(audio) / SAMPLE_RATE)
+
+    def process_files_in_pool(self, files_to_process, output_writer, model_dir):
+        """Fan files out to the process pool; every result comes back here to the one writer."""
+        self.progress.status(f"Starting {self.processes} transcription processes with model: {self.model_name}...",
+                             force=True)
+
+        with AsyncWriter() as writer:
+            # Cache hits are written straight away; only the misses are sent to the pool
+            files_to_transcribe = self.uncached_files(files_to_process, output_writer, writer)
+            first_file = next(files_to_transcribe, None)
+            if first_file is None:
+                return
+            files_to_transcribe = itertools.chain([first_file], files_to_transcribe)
+
+            with TranscriptionPool(self.model_name, model_dir, self.processes, self.threads_per_process,
+                                   self.transcribe_options(), self.stream_window_seconds,
+                                   self.stream_overlap_seconds, self.vad_options,
+                                   options_for=self.options_for,
+                                   audio_cache_dir=self.audio_cache.cache_dir if self.audio_cache else None,
+                                   durations=self.durations) as pool:
+                for input_file, result, stages, audio_seconds in pool.imap_unordered(files_to_transcribe):
+                    file_metrics = self.file_metrics(input_file)
+                    for stage, seconds in stages.items():
+                        file_metrics.add_stage(stage, seconds)
+                    file_metrics.set(mode="pool", segments=len(result["segments"]),
+                                     audio_seconds=round(audio_seconds, 3) if audio_seconds else None)
+                    self.record_vad(input_file, result.get("vad"))
+                    self.store_in_cache(input_file, result)
+                    writer.submit(self.finish_file, result, input_file, output_writer)
+                    self.progress.file_done(
+                        audio_seconds=audio_seconds,
+                        message=f"Transcribed file: {self.truncate_filename(os.path.basename(input_file))}")
+
+    def process_channel_files(self, files_to_process, output_writer, model, model_dir):
+        """Split mode: each file's channels are transcribed separately and merged into one transcript."""
+        if self.processes > 1:
+            self.process_channel_files_in_pool(files_to_process, output_writer, model_dir)
+            return
+
+        prefetcher = PrefetchDecoder(files_to_process, self.prefetch_channels, depth=self.prefetch_depth)
+        with AsyncWriter() as writer:
+            for input_file, channels in prefetcher:
+                self.progress.file_started(
+                    input_file, f"Processing file: {self.truncate_filename(os.path.basename(input_file))}")
+                self.process_and_transcribe_file(input_file, output_writer, model, audio=channels, writer=writer)
+                self.progress.file_done()
+                self.profiler.file_done()
+
+    def process_channel_files_in_pool(self, files_to_process, output_writer, model_dir):
+        """Split mode with a pool: channels go out as separate tasks, so one file's parties run side by side."""
+        self.progress.status(f"Starting {self.processes} transcription processes with model: {self.model_name}...",
+                             force=True)
+        expected = {}   # input_file -> (channels sent to the pool, skipped channel numbers, audio seconds)
+        finished = {}   # input_file -> [(channel number, result)] back so far
+
+        with AsyncWriter() as writer:
+            def channel_tasks():
+                # Cache hits and files with nothing to transcribe are written here; the rest become one task per channel
+                files_to_decode = self.uncached_files(files_to_process, output_writer, writer)
+                for input_file, (kept, skipped, audio_seconds) in PrefetchDecoder(
+                        files_to_decode, self.prefetch_channels, depth=self.prefetch_depth):
+                    if not kept:
+                        self.finish_channels(input_file, [], skipped, audio_seconds, output_writer, writer)
+                        continue
+                    expected[input_file] = (len(kept), skipped, audio_seconds)
+                    for number, audio in kept:
+                        yield (input_file, number), audio, self.options_for(input_file)
+
+            with TranscriptionPool(self.model_name, model_dir, self.processes, self.threads_per_process,
+                                   self.transcribe_options(), vad_options=self.vad_options,
+                                   options_for=self.options_for) as pool:
+                for (input_file, number), result, stages, _ in pool.imap_audio(channel_tasks()):
+                    file_metrics = self.file_metrics(input_file)
+                    for stage, seconds in stages.items():
+                        file_metrics.add_stage(stage, seconds)
+                    self.record_vad(input_file, result.pop("vad", None))
+                    finished.setdefault(input_file, []).append((number, result))
+                    channel_count, skipped, audio_seconds = expected[input_file]
+                    if len(finished[input_file]) == channel_count:
+                        del expected[input_file]
+                        self.finish_channels(input_file, sorted(finished.pop(input_file)), skipped, audio_seconds,
+                                             output_writer, writer)
+
+    def finish_channels(self, input_file, channel_results, skipped, audio_seconds, output_writer, writer):
+        result = merge_channel_results(channel_results, skipped, self.language_hints.language_for(input_file))
+        self.file_metrics(input_file).set(mode="channels", channels=len(channel_results),
+                                          segments=len(result["segments"]), audio_seconds=round(audio_seconds, 3))
+        self.store_in_cache(input_file, result)
+        writer.submit(self.finish_file, result, input_file, output_writer)
+        self.progress.file_done(
+            audio_seconds=audio_seconds,
+            message=f"Transcribed file: {self.truncate_filename(os.path.basename(input_file))}")
+
+    def prefetch_channels(self, input_file):
+        """Decoder stage for split mode; skips files the cache will serve."""
+        if self.cached_result(input_file) is not None:
+            return None
+        return self.decode_active_channels(input_file)
+
+    def decode_active_channels(self, input_file):
+        """(channels worth transcribing, skipped channel numbers, audio seconds) for split mode.
+
+        A mono file has nothing to split: it is transcribed as it is, with its lines left unlabelled
+        (channel number None).
+        """
+        file_metrics = self.file_metrics(input_file)
+        with file_metrics.stage("decode"):
+            channels = decode_channels(input_file)
+        audio_seconds = len(channels[0]) / SAMPLE_RATE
+        if len(channels) == 1:
+            return [(None, channels[0])], [], audio_seconds
+        with file_metrics.stage("channels"):
+            kept, skipped = active_channels(channels, self.vad_options)
+        if skipped:
+            numbers = ", ".join(str(number) for number in skipped)
+            self.progress.status(f"{self.truncate_filename(os.path.basename(input_file))}: skipped channel(s) "
+                                 f"{numbers} (silent, or a copy of another channel)", force=True)
+        return kept, skipped, audio_seconds
+
+    def transcribe_channels(self, model, input_file, kept, skipped, audio_seconds):
+        """Transcribe the channels one after another with the in-process model and merge them."""
+        channel_results = []
+        for number, audio in kept:
+            result = self.transcribe_audio(model, audio, input_file)
+            result.pop("vad", None)
+            channel_results.append((number, result))
+        result = merge_channel_results(channel_results, skipped, self.language_hints.language_for(input_file))
+        self.file_metrics(input_file).set(mode="channels", channels=len(kept), segments=len(result["segments"]),
+                                          audio_seconds=round(audio_seconds, 3))
+        return result
+
+    def uncached_files(self, files_to_process, output_writer, writer):
+        """Write cache hits as they come up and yield the files that still need the model."""
+        for input_file in files_to_process:
+            cached_result = self.cached_result(input_file)
+            if cached_result is None:
+                yield input_file
+                continue
+            self.file_metrics(input_file).set(mode="cached", segments=len(cached_result["segments"]))
+            writer.submit(self.finish_file, cached_result, input_file, output_writer)
+            self.progress.file_done()
+
+    def transcribe_options(self):
+        """Keyword arguments passed to model.transcribe, shared by the in-process and pool paths."""
+        # verbose=None keeps whisper silent; progress comes from the hook in whisper_progress instead
+        return dict({"verbose": None}, **profile_options(self.decoding_profile))
+
+    def options_for(self, input_file):
+        """transcribe_options() plus the file's language hint, if it has one."""
+        options = self.transcribe_options()
+        language = self.language_hints.language_for(input_file)
+        if language is not None:
+            options["language"] = language
+        return options
+
+    def cache_options(self, input_file):
+        """Everything besides the audio and model that changes a transcript, for the cache key."""
+        options = self.options_for(input_file)
+        if self.vad_options is not None:
+            options["vad"] = self.vad_options
+        if self.split_channels:
+            options["split_channels"] = True
+        return options
+
+    def cached_result(self, input_file):
+        """Look the file up in the transcript cache; None on a miss or when caching is off."""
+        if self.cache is None:
+            return None
+        return self.cache.get(input_file, self.model_name, self.cache_options(input_file))
+
+    def store_in_cache(self, input_file, result):
+        if self.cache is not None:
+            self.cache.put(input_file, self.model_name, self.cache_options(input_file), result)
+
+    def speech_only(self, input_file, audio):
+        """(audio to transcribe, timeline back to the original or None, silence report or None)."""
+        if self.vad_options is None:
+            return audio, None, None
+        with self.file_metrics(input_file).stage("vad"):
+            return filter_silence(audio, self.vad_options)
+
+    def restore_timeline(self, input_file, result, timeline, vad_report):
+        """Put a result from speech_only() audio back on the file's own timeline and note what was skipped."""
+        if vad_report is None:
+            return result
+        if timeline is not None and len(timeline):
+            result = remap_result(result, timeline)
+        result["vad"] = vad_report
+        self.record_vad(input_file, vad_report)
+        return result
+
+    def record_vad(self, input_file, vad_report):
+        if vad_report is None:
+            return
+        self.file_metrics(input_file).set(speech_seconds=vad_report["speech_seconds"],
+                                          skipped_seconds=vad_report["skipped_seconds"])
+        self.vad_reports.append(vad_report)
+
+    def on_metrics_record(self, record):
+        """Pass metrics on to the app, adding transcribed files' timings to the profile's speed tally."""
+        if record["event"] == "file" and record.get("mode") != "cached" and record.get("audio_seconds"):
+            # Writing is the same whatever the profile, so only the model's side counts
+            seconds = sum(seconds for stage, seconds in record["stages"].items() if stage != "write")
+            with self._profile_lock:
+                self._profile_seconds[0] += seconds
+                self._profile_seconds[1] += record["audio_seconds"]
+        if self.on_metrics is not None:
+            self.on_metrics(record)
+
+    def record_profile_speed(self):
+        """Fold this job's real-time factor into the per-model, per-profile figures the app shows."""
+        processing_seconds, audio_seconds = self._profile_seconds
+        try:
+            ProfileStats().add(self.model_name, self.decoding_profile, processing_seconds, audio_seconds)
+        except OSError as e:
+            print(f"Could not save profile timings: {e}", file=sys.stderr)
+
+    def report_skipped_silence(self):
+        """Sum the job's silence reports (kept as vad_totals for the app to show)."""
+        self.vad_totals = combine_reports(self.vad_reports) if self.vad_reports else None
+        return self.vad_totals
+
+    def is_long_file(self, input_file):
+        """True if the file should be streamed in windows rather than decoded whole."""
+        if not self.stream_window_seconds:
+            return False
+        if input_file not in self.durations and not may_be_longer_than(input_file, self.stream_window_seconds):
+            # Too small to run past one window: decode it whole without probing it first
+            return False
+        duration = self.media_duration(input_file)
+        if duration is not None:
+            self.file_metrics(input_file).set(audio_seconds=round(duration, 3))
+        return duration is not None and duration > self.stream_window_seconds
+
+    def media_duration(self, input_file):
+        """Duration in seconds: from discovery's probe, the audio cache, or the file's header, in that order."""
+        if input_file in self.durations:
+            return self.durations[input_file]
+        if self.audio_cache is not None:
+            audio = self.audio_cache.load(input_file)
+            if audio is not None:
+                return len(audio) / SAMPLE_RATE
+        return quick_duration(input_file)
+
+    def decode(self, input_file):
+        """The file's audio, from the audio cache when it's on (a memory map, decoded once and kept)."""
+        if self.audio_cache is not None:
+            return self.audio_cache.decode(input_file)
+        return decode_audio(input_file)
+
+    def file_metrics(self, input_file):
+        """This file's metrics record (a throwaway one if metrics aren't being collected)."""
+        return self.metrics.file(input_file) if self.metrics is not None else FileMetrics(input_file)
+
+    def prefetch_audio(self, input_file):
+        """Decoder stage: skip ffmpeg entirely for files the cache will serve, and leave long files to streaming."""
+        if self.cached_result(input_file) is not None or self.is_long_file(input_file):
+            return None
+        with self.file_metrics(input_file).stage("decode"):
+            return self.decode(input_file)
+
+    def report_frames(self, frames_done, total_frames):
+        """Within-file progress from whisper's seek position through the mel frames."""
+        self.progress.file_progress(frames_done / total_frames)
+
+    def transcribe_audio(self, model, audio, input_file):
+        """Run language detection and decoding as separately timed stages."""
+        file_metrics = self.file_metrics(input_file)
+        file_metrics.set(audio_seconds=round(len(audio) / SAMPLE_RATE, 3))
+        audio, timeline, vad_report = self.speech_only(input_file, audio)
+        options = self.options_for(input_file)
+        if not len(audio):
+            return self.restore_timeline(input_file, empty_result(options.get("language")), timeline, vad_report)
+
+        # A language hint skips detection altogether
+        if "language" not in options:
+            with file_metrics.stage("detect_language"):
+                options["language"] = detect_language(model, audio)
+        with file_metrics.stage("transcribe"), transcribe_progress(self.report_frames):
+            result = model.transcribe(audio, **options)
+        result = self.restore_timeline(input_file, result, timeline, vad_report)
+        file_metrics.set(segments=len(result["segments"]), language=result.get("language"))
+        return result
+
+    def transcribe_long_file(self, input_file, output_writer, model, writer=None):
+        """Stream a long recording through the model in windows, writing each window's segments as it finishes."""
+        first_window = [True]
+        duration = self.file_metrics(input_file).fields.get("audio_seconds")
+
+        def write_window(segments):
+            append = not first_window[0]
+            first_window[0] = False
+            if segments and duration:
+                # Within-file progress: how far the last finished segment reaches into the recording
+                self.progress.file_progress(segments[-1]["end"] / duration, audio_seconds=duration)
+            if writer is not None:
+                writer.submit(self.timed_write, {"segments": segments}, input_file, output_writer, append)
+            else:
+                self.timed_write({"segments": segments}, input_file, output_writer, append)
+
+        file_metrics = self.file_metrics(input_file)
+        windows = None
+        if self.audio_cache is not None:
+            windows = self.audio_cache.windows(input_file, self.stream_window_seconds, self.stream_overlap_seconds)
+        # Decoding is streamed inside the windows, so it counts towards this one stage
+        with file_metrics.stage("transcribe"):
+            result = transcribe_in_windows(model, input_file, self.options_for(input_file), on_segments=write_window,
+                                           window_seconds=self.stream_window_seconds,
+                                           overlap_seconds=self.stream_overlap_seconds,
+                                           windows=windows, vad_options=self.vad_options)
+        file_metrics.set(mode="windowed", segments=len(result["segments"]))
+        self.record_vad(input_file, result.get("vad"))
+        if first_window[0]:
+            # Nothing was said: still leave an (empty) output behind, as the whole-file path does
+            write_window([])
+        return result
+
+    def process_and_transcribe_file(self, input_file, output_writer, model, audio=None, writer=None):
+        """Transcribe and write one file; `audio` is its decoded audio (in split mode, its channels) if prefetched."""
+        result = self.cached_result(input_file)
+        if result is not None:
+            self.file_metrics(input_file).set(mode="cached", segments=len(result["segments"]))
+        elif self.split_channels:
+            result = self.transcribe_channels(model, input_file, *(audio or self.decode_active_channels(input_file)))
+            self.store_in_cache(input_file, result)
+        elif audio is None and self.is_long_file(input_file):
+            # Segments were already written window by window; only the bookkeeping is left
+            result = self.transcribe_long_file(input_file, output_writer, model, writer)
+            self.store_in_cache(input_file, result)
+            if writer is not None:
+                writer.submit(self.mark_file_done, input_file, output_writer, result)
+            else:
+                self.mark_file_done(input_file, output_writer, result)
+            return
+
+        if result is None:
+            # Audio and video both go through one in-memory decode; whisper never re-runs ffmpeg
+            if audio is None:
+                with self.file_metrics(input_file).stage("decode"):
+                    audio = self.decode(input_file)
+            self.file_metrics(input_file).set(mode="whole")
+            result = self.transcribe_audio(model, audio, input_file)
+            self.store_in_cache(input_file, result)
+
+        if writer is not None:
+            writer.submit(self.finish_file, result, input_file, output_writer)
+        else:
+            self.finish_file(result, input_file, output_writer)
+
+    def finish_file(self, result, input_file, output_writer):
+        """Write one file's transcript, then tell the writer the file is complete."""
+        self.timed_write(result, input_file, output_writer)
+        self.mark_file_done(input_file, output_writer, result)
+
+    def timed_write(self, result, input_file, output_writer, append=False):
+        with self.file_metrics(input_file).stage("write"):
+            self.write_transcription(result, input_file, output_writer, append)
+
+    def mark_file_done(self, input_file, output_writer, result=None):
+        # The writer may flush here, and reports the files it made durable to the manifest
+        with self.file_metrics(input_file).stage("write"):
+            output_writer.end_file(input_file)
+        if self.on_result is not None and result is not None:
+            self.on_result(input_file, result)
+        if self.metrics is not None:
+            self.metrics.finish_file(input_file, model=self.model_name)
+
+    def write_transcription(self, result, input_file, output_writer, append=False):
+        output_writer.write_segments(input_file, result['segments'], append)
+
+    def job_settings(self):
+        """Settings that must match for a previous job to be resumed into the same output."""
+        return {
+            "batch_size": self.batch_size,
+            "stream_window_seconds": self.stream_window_seconds,
+            "stream_overlap_seconds": self.stream_overlap_seconds,
+            "input_folder": os.path.abspath(self.input_folder),
+            "model_name": self.model_name,
+            "include_timestamps": self.include_timestamps,
+            "output_format": self.output_format,
+            "max_rows_per_part": self.max_rows_per_part,
+            "transcribe_options": self.transcribe_options(),
+            "vad_options": self.vad_options,
+            "decoding_profile": self.decoding_profile,
+            "split_channels": self.split_channels,
+            "language": self.language,
+        }
+
+    def open_manifest(self):
+        """Resume the matching unfinished job or start a new manifest."""
+        settings = self.job_settings()
+        self.manifest = JobManifest.load_resumable(self.output_folder, settings) if self.resume else None
+
+        if self.manifest is None:
+            filename = self.get_output_filename() if WRITERS[self.output_format].single_file else None
+            self.manifest = JobManifest.create(self.output_folder, settings, filename)
+        else:
+            self.progress.status(
+                f"Resuming previous job: {self.manifest.done_count()} file(s) already transcribed.", force=True)
+
+    def discover_files(self):
+        """The files still to transcribe, in the order set by `schedule`.
+
+        In "found" order this is a generator fed by discovery, so work starts on the first
+        directory's files while the rest of the tree is still being scanned.
+        """
+        self.progress.set_total(0)
+        batches = iter_media_batches(self.input_folder, SUPPORTED_EXTENSIONS)
+        if self.schedule == "found":
+            return self.iter_pending_files(batches)
+
+        self.progress.status("Finding files and measuring their durations...", force=True)
+        found = [input_file for batch in batches for input_file in batch]
+        self.manifest.add_files(found)
+        pending = self.manifest.pending_files(found)
+        self.durations = probe_durations(pending)
+        self.progress.set_total(len(pending))
+        return schedule_files(pending, self.durations, self.schedule)
+
+    def iter_pending_files(self, batches):
+        for batch in batches:
+            # Saved along with the next finished file rather than once per scanned directory
+            self.manifest.add_files(batch, save=False)
+            pending = self.manifest.pending_files(batch)
+            self.progress.add_total(len(pending))
+            yield from pending
+
+    def get_output_filename(self):
+        now = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        return output_filename(self.output_format, now)
+
+    def truncate_filename(self, filename):
+        """Truncate the filename to prevent overflow, adding ellipsis if too long."""
+        if len(filename) > self.MAX_FILENAME_LENGTH:
+            return filename[:self.MAX_FILENAME_LENGTH - 1] + "…"  # Add ellipsis
+        return filename
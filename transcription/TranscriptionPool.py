@@ -0,0 +1,290 @@
+import os
+import time
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .decode_audio import decode_audio, stream_audio_windows, SAMPLE_RATE
+from .file_discovery import may_be_longer_than, quick_duration
+from .windowed_transcribe import transcribe_in_windows, DEFAULT_OVERLAP_SECONDS
+from .voice_activity import transcribe_speech
+from .quantized_model import load_model
+from .AudioCache import AudioCache
+
+# Each pool process keeps its own model here once the initializer has run.
+# torch and whisper are only imported inside the worker processes, after the thread budget is set.
+_worker_model = None
+_worker_barrier = None
+_worker_audio_cache = None
+
+# Auto-tune times each layout on this much audio from the start of every sample file
+AUTOTUNE_SAMPLE_SECONDS = 30
+
+
+def _init_worker(model_name, model_dir, threads, barrier=None, audio_cache_dir=None):
+    """Pin this process to its thread budget, then load its private copy of the model."""
+    global _worker_model, _worker_barrier, _worker_audio_cache
+
+    # These must be in place before torch spins up its thread pools
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already fixed for this process; the intra-op budget is what matters
+        pass
+
+    _worker_model = load_model(model_name, model_dir)
+    _worker_barrier = barrier
+    # Each process opens the shared audio cache itself; entries written by one are visible to all
+    _worker_audio_cache = AudioCache(audio_cache_dir) if audio_cache_dir else None
+
+
+def _wait_until_all_loaded():
+    """Used by auto-tune: returns once every process in the pool has its model loaded."""
+    if _worker_barrier is not None:
+        _worker_barrier.wait()
+    return os.getpid()
+
+
+def _transcribe_file(input_file, transcribe_options, stream_window_seconds=None,
+                     stream_overlap_seconds=DEFAULT_OVERLAP_SECONDS, vad_options=None, duration=None):
+    """Returns (input_file, result, stage timings in seconds, audio seconds) back to the parent.
+
+    `duration` is the file's length if the parent already knows it (e.g. from discovery).
+    """
+    stages = {}
+    cached_audio = _worker_audio_cache.load(input_file) if _worker_audio_cache is not None else None
+    if stream_window_seconds:
+        if cached_audio is not None:
+            duration = len(cached_audio) / SAMPLE_RATE
+        elif duration is None and may_be_longer_than(input_file, stream_window_seconds):
+            duration = quick_duration(input_file)
+        if duration is not None and duration > stream_window_seconds:
+            # Keep each process's memory flat on long recordings too
+            windows = None
+            if _worker_audio_cache is not None:
+                windows = _worker_audio_cache.windows(input_file, stream_window_seconds, stream_overlap_seconds)
+            start = time.perf_counter()
+            result = transcribe_in_windows(_worker_model, input_file, transcribe_options,
+                                           window_seconds=stream_window_seconds,
+                                           overlap_seconds=stream_overlap_seconds, windows=windows,
+                                           vad_options=vad_options)
+            stages["transcribe"] = time.perf_counter() - start
+            return input_file, result, stages, duration
+
+    start = time.perf_counter()
+    if cached_audio is not None:
+        audio = cached_audio
+    elif _worker_audio_cache is not None:
+        audio = _worker_audio_cache.decode(input_file)
+    else:
+        audio = decode_audio(input_file)
+    stages["decode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if vad_options is not None:
+        result = transcribe_speech(_worker_model, audio, transcribe_options, vad_options)
+    else:
+        result = _worker_model.transcribe(audio, **transcribe_options)
+    stages["transcribe"] = time.perf_counter() - start
+    return input_file, result, stages, len(audio) / SAMPLE_RATE
+
+
+def _transcribe_audio(key, audio, transcribe_options, vad_options=None):
+    """Transcribe audio decoded by the parent (e.g. one channel of a file); returns like _transcribe_file."""
+    start = time.perf_counter()
+    if vad_options is not None:
+        result = transcribe_speech(_worker_model, audio, transcribe_options, vad_options)
+    else:
+        result = _worker_model.transcribe(audio, **transcribe_options)
+    return key, result, {"transcribe": time.perf_counter() - start}, len(audio) / SAMPLE_RATE
+
+
+def default_threads_per_process(processes):
+    """Split the machine's cores evenly across the pool."""
+    return max(1, (os.cpu_count() or 1) // max(1, processes))
+
+
+class TranscriptionPool:
+    """N worker processes, each with its own loaded model and an explicit torch thread budget.
+
+    Files are handed out one at a time from a shared queue rather than pre-split into fixed
+    shards, so a process that draws short clips simply takes more of them.
+    """
+
+    def __init__(self, model_name, model_dir, processes, threads_per_process=None, transcribe_options=None,
+                 stream_window_seconds=None, stream_overlap_seconds=DEFAULT_OVERLAP_SECONDS, vad_options=None,
+                 options_for=None, audio_cache_dir=None, durations=None):
+        self.model_name = model_name
+        self.model_dir = model_dir
+        self.processes = max(1, int(processes))
+        self.threads_per_process = threads_per_process or default_threads_per_process(self.processes)
+        self.transcribe_options = transcribe_options or {"verbose": None}
+        self.stream_window_seconds = stream_window_seconds
+        self.stream_overlap_seconds = stream_overlap_seconds
+        # Silence filter thresholds (see voice_activity); None sends whole files to the model
+        self.vad_options = vad_options
+        # Called in the parent with each file to get its own options (e.g. a per-folder language)
+        self.options_for = options_for
+        # Shared decoded-audio cache folder (see AudioCache); None decodes every file with ffmpeg
+        self.audio_cache_dir = audio_cache_dir
+        # {file: seconds} the parent already measured, so workers needn't probe those files again
+        self.durations = durations if durations is not None else {}
+        self._executor = None
+        self._barrier = None
+
+    def start(self, wait_for_models=False):
+        """Spawn the pool. With `wait_for_models`, block until every process has loaded its model."""
+        # spawn keeps CUDA and Qt state out of the children, and matches Windows/macOS behaviour
+        context = multiprocessing.get_context("spawn")
+        self._barrier = context.Barrier(self.processes) if wait_for_models else None
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.model_name, self.model_dir, self.threads_per_process, self._barrier,
+                      self.audio_cache_dir),
+        )
+        if wait_for_models:
+            warmups = [self._executor.submit(_wait_until_all_loaded) for _ in range(self.processes)]
+            for future in warmups:
+                future.result()
+        return self
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self if self._executor is not None else self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _submit(self, input_file):
+        options = self.options_for(input_file) if self.options_for is not None else self.transcribe_options
+        return self._executor.submit(_transcribe_file, input_file, options,
+                                     self.stream_window_seconds, self.stream_overlap_seconds, self.vad_options,
+                                     self.durations.get(input_file))
+
+    def _submit_audio(self, item):
+        key, audio, options = item
+        return self._executor.submit(_transcribe_audio, key, audio, options, self.vad_options)
+
+    def imap_unordered(self, files):
+        """Yield (input_file, result, stages, audio_seconds) as soon as any process finishes a file.
+
+        Only a couple of files per process are in flight at once, so results keep
+        streaming back to the single writer in the parent instead of piling up.
+        """
+        return self._imap(self._submit, files)
+
+    def imap_audio(self, items):
+        """Like imap_unordered, for (key, audio, options) items the parent has already decoded.
+
+        Yields (key, result, stages, audio_seconds); the audio is sent to the worker processes.
+        """
+        return self._imap(self._submit_audio, items)
+
+    def _imap(self, submit, items):
+        items = iter(items)
+        max_in_flight = self.processes * 2
+        in_flight = set()
+
+        for item in items:
+            in_flight.add(submit(item))
+            if len(in_flight) >= max_in_flight:
+                break
+
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                next_item = next(items, None)
+                if next_item is not None:
+                    in_flight.add(submit(next_item))
+                yield future.result()
+
+
+def candidate_layouts(cpu_count=None):
+    """A handful of processes x threads layouts that each use the whole machine."""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    layouts = []
+    processes = 1
+    while processes <= cpu_count:
+        layouts.append((processes, max(1, cpu_count // processes)))
+        processes *= 2
+    return layouts
+
+
+def sample_clip(input_file, seconds=AUTOTUNE_SAMPLE_SECONDS):
+    """The first `seconds` of a file's audio; ffmpeg is stopped as soon as they are in.
+
+    Raises RuntimeError if ffmpeg could not read the file; a file with no audio gives an empty clip.
+    """
+    windows = stream_audio_windows(input_file, seconds, 0)
+    try:
+        for _, clip, is_last in windows:
+            if is_last:
+                # ffmpeg has already stopped: let the generator check how it exited before trusting the clip
+                for _ in windows:
+                    pass
+            return clip
+        return np.zeros(0, dtype=np.float32)
+    finally:
+        windows.close()
+
+
+def autotune_layout(model_name, model_dir, sample_files, transcribe_options=None, layouts=None, status_callback=None,
+                    options_for=None, sample_seconds=AUTOTUNE_SAMPLE_SECONDS):
+    """Time each layout on the same sample (after model load) and return the fastest (processes, threads).
+
+    The sample is the first `sample_seconds` of each file, decoded once here and sent to every
+    layout's processes, so a long recording among the samples doesn't make tuning take as long as
+    transcribing it several times over.
+    """
+    layouts = layouts or candidate_layouts()
+    transcribe_options = transcribe_options or {"verbose": None}
+    if status_callback:
+        status_callback("Auto-tuning: decoding the sample files...")
+    clips = []
+    for input_file in sample_files:
+        try:
+            clip = sample_clip(input_file, sample_seconds)
+        except RuntimeError:
+            # Unreadable files are reported when the job reaches them
+            continue
+        if len(clip) == 0:
+            # Nothing to time: a file without audio would only measure model start-up
+            continue
+        options = options_for(input_file) if options_for is not None else transcribe_options
+        clips.append((input_file, clip, options))
+    best_layout, best_time = layouts[0], None
+    if not clips:
+        return best_layout
+
+    for processes, threads in layouts:
+        # More processes than sample clips can't be measured fairly
+        if processes > max(1, len(clips)):
+            continue
+        if status_callback:
+            status_callback(f"Auto-tuning: trying {processes} process(es) x {threads} thread(s)...")
+
+        with TranscriptionPool(model_name, model_dir, processes, threads, transcribe_options,
+                               options_for=options_for).start(
+                wait_for_models=True) as pool:
+            start = time.perf_counter()
+            for _ in pool.imap_audio(clips):
+                pass
+            elapsed = time.perf_counter() - start
+
+        if best_time is None or elapsed < best_time:
+            best_layout, best_time = (processes, threads), elapsed
+
+    return best_layout
@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import socket
+import hashlib
+import threading
+from datetime import datetime
+
+from .normalize_path import normalize_path
+from .OutputWriters import TranscriptWriter
+
+
+class LeaseQueue:
+    """A broker-free work queue for several machines transcribing one input folder from a shared drive.
+
+    Everything lives in a folder on the share, one per job (see for_job) inside
+    "Whispering Wizard Queue" next to the output by default:
+
+      leases/<key>.lease   a node is working on the file; created with O_CREAT | O_EXCL, so
+                           exactly one node can claim it, and kept fresh by touching its mtime
+      results/<key>.json   the finished transcript, written atomically; its existence means done
+      merged.json          written once every result has been combined into the job's output
+
+    A node that dies stops renewing its leases; once a lease is older than `lease_seconds`
+    another node renames it aside (only one rename can win), checks it really was stale,
+    and claims the file again. Files are identified by their path relative to the input
+    folder, so nodes can mount the share in different places.
+    """
+
+    DIRNAME = "Whispering Wizard Queue"
+    DEFAULT_LEASE_SECONDS = 180
+
+    def __init__(self, input_folder, queue_dir, node_id=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.input_folder = os.path.abspath(input_folder)
+        self.queue_dir = normalize_path(queue_dir)
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.leases_dir = os.path.join(self.queue_dir, "leases")
+        self.results_dir = os.path.join(self.queue_dir, "results")
+        os.makedirs(self.leases_dir, exist_ok=True)
+        os.makedirs(self.results_dir, exist_ok=True)
+        self._held = set()
+        self._lock = threading.Lock()
+        self._stop_renewing = threading.Event()
+        self._renewer = None
+
+    @classmethod
+    def for_job(cls, input_folder, base_dir, settings, files, **kwargs):
+        """The queue for one job: a folder under `base_dir` named after the job's settings and files.
+
+        Results are only valid for the settings they were made with, and a merge only covers
+        the files it was given, so a later run with another model, other options, or files
+        added, removed or changed gets a queue of its own instead of reusing stale results.
+        Every node computes the same name, as long as it runs the same job.
+        """
+        input_folder = os.path.abspath(input_folder)
+        listing = []
+        for input_file in files:
+            stat = os.stat(input_file)
+            listing.append([cls._relative_path(input_folder, input_file), stat.st_size, int(stat.st_mtime)])
+        job = json.dumps({"settings": settings, "files": sorted(listing)}, sort_keys=True, default=str)
+        job_key = hashlib.sha1(job.encode("utf-8")).hexdigest()[:16]
+        return cls(input_folder, os.path.join(base_dir, job_key), **kwargs)
+
+    @staticmethod
+    def _relative_path(input_folder, input_file):
+        return os.path.relpath(os.path.abspath(input_file), input_folder).replace(os.sep, "/")
+
+    def relative_path(self, input_file):
+        return self._relative_path(self.input_folder, input_file)
+
+    def key(self, name):
+        """File-name-safe key for an input file's relative path (or a job-level name such as "merge")."""
+        return hashlib.sha1(name.encode("utf-8")).hexdigest()
+
+    def lease_path(self, name):
+        return os.path.join(self.leases_dir, self.key(name) + ".lease")
+
+    def result_path(self, input_file):
+        return os.path.join(self.results_dir, self.key(self.relative_path(input_file)) + ".json")
+
+    def is_done(self, input_file):
+        return os.path.exists(self.result_path(input_file))
+
+    def _lease_expired(self, path):
+        try:
+            return time.time() - os.stat(path).st_mtime > self.lease_seconds
+        except FileNotFoundError:
+            return True
+
+    def _try_create(self, name):
+        try:
+            fd = os.open(self.lease_path(name), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as lease_file:
+            json.dump({"node": self.node_id, "name": name,
+                       "claimed_at": datetime.now().isoformat(timespec="seconds")}, lease_file)
+        return True
+
+    def _reclaim(self, name):
+        """Move an expired lease out of the way; True if it was stale and is now gone."""
+        path = self.lease_path(name)
+        if not self._lease_expired(path):
+            return False
+        aside = f"{path}.{self.node_id}.stale"
+        try:
+            os.rename(path, aside)
+        except FileNotFoundError:
+            # Another node reclaimed it first (or its owner finished)
+            return False
+        if not self._lease_expired(aside):
+            # Someone re-claimed it between our check and the rename: put their lease back
+            try:
+                os.link(aside, path)
+            except OSError:
+                pass
+            os.remove(aside)
+            return False
+        os.remove(aside)
+        return True
+
+    def claim(self, name):
+        """Take the lease on `name`; False if a live node holds it."""
+        if not self._try_create(name):
+            if not self._reclaim(name) or not self._try_create(name):
+                return False
+        with self._lock:
+            self._held.add(name)
+        return True
+
+    def release(self, name):
+        with self._lock:
+            self._held.discard(name)
+        try:
+            os.remove(self.lease_path(name))
+        except FileNotFoundError:
+            pass
+
+    def renew(self):
+        """Touch every lease this node holds, so other nodes don't take them over."""
+        with self._lock:
+            held = list(self._held)
+        for name in held:
+            try:
+                os.utime(self.lease_path(name))
+            except FileNotFoundError:
+                # Reclaimed by another node after we stalled; it will redo the file, and results are idempotent
+                with self._lock:
+                    self._held.discard(name)
+
+    def start_renewing(self):
+        """Renew leases from a background thread, several times per lease period."""
+        def renew_loop():
+            while not self._stop_renewing.wait(self.lease_seconds / 4):
+                self.renew()
+
+        self._renewer = threading.Thread(target=renew_loop, name="ww-lease-renewer", daemon=True)
+        self._renewer.start()
+        return self
+
+    def stop(self):
+        """Stop renewing and hand back any leases still held (e.g. after an error)."""
+        self._stop_renewing.set()
+        if self._renewer is not None:
+            self._renewer.join()
+            self._renewer = None
+        with self._lock:
+            held = list(self._held)
+        for name in held:
+            self.release(name)
+
+    def claim_files(self, files):
+        """One pass over `files`: yield each unfinished file this node manages to claim.
+
+        Claims are made lazily, as the pipeline asks for its next file, so a node never sits
+        on more files than it has in flight.
+        """
+        for input_file in files:
+            if not self.is_done(input_file) and self.claim(self.relative_path(input_file)):
+                if self.is_done(input_file):
+                    # Finished by its previous holder between the check and the claim
+                    self.release(self.relative_path(input_file))
+                    continue
+                yield input_file
+
+    def unfinished(self, files):
+        return [input_file for input_file in files if not self.is_done(input_file)]
+
+    def complete(self, input_file, result):
+        """Store a file's transcript and give up its lease."""
+        path = self.result_path(input_file)
+        temp_path = f"{path}.{self.node_id}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as result_file:
+            json.dump({"file": self.relative_path(input_file), "node": self.node_id, "result": result},
+                      result_file, ensure_ascii=False, default=float)
+        os.replace(temp_path, path)
+        self.release(self.relative_path(input_file))
+
+    def load_result(self, input_file):
+        with open(self.result_path(input_file), encoding="utf-8") as result_file:
+            return json.load(result_file)["result"]
+
+    @property
+    def merged_path(self):
+        return os.path.join(self.queue_dir, "merged.json")
+
+    def is_merged(self):
+        return os.path.exists(self.merged_path)
+
+    def merge(self, files, output_writer):
+        """Combine every file's result into `output_writer`, once per job whichever node gets here first.
+
+        Returns False if another node holds the merge (it will finish it; if it dies, the next
+        node to run reclaims the merge lease and redoes it).
+        """
+        if self.is_merged() or not self.claim("merge"):
+            return False
+        try:
+            if self.is_merged():
+                return False
+            output_writer.open()
+            for input_file in files:
+                output_writer.write_segments(input_file, self.load_result(input_file)["segments"])
+                output_writer.end_file(input_file)
+            output_writer.close()
+            with open(self.merged_path + ".tmp", "w", encoding="utf-8") as merged_file:
+                json.dump({"node": self.node_id, "files": len(files), "output_filename": output_writer.filename,
+                           "merged_at": datetime.now().isoformat(timespec="seconds")}, merged_file)
+            os.replace(self.merged_path + ".tmp", self.merged_path)
+            return True
+        finally:
+            self.release("merge")
+
+
+class QueueResultWriter(TranscriptWriter):
+    """Output target for a node in a shared queue: each finished file becomes a result in the queue.
+
+    Plugs into the worker where a normal writer would, so streaming, batching and the
+    process pool all work unchanged; the job's real output is written by LeaseQueue.merge.
+    """
+
+    def __init__(self, queue, on_checkpoint=None):
+        super().__init__(queue.queue_dir, include_timestamps=True, on_checkpoint=on_checkpoint)
+        self.queue = queue
+        self._segments = {}
+
+    def write_segments(self, input_file, segments, append=False):
+        # Token ids are only useful to whisper itself and make up most of a result's size
+        segments = [{key: value for key, value in segment.items() if key != "tokens"} for segment in segments]
+        if append:
+            self._segments.setdefault(input_file, []).extend(segments)
+        else:
+            self._segments[input_file] = segments
+
+    def end_file(self, input_file):
+        segments = self._segments.pop(input_file, [])
+        self.queue.complete(input_file, {"text": "".join(segment["text"] for segment in segments),
+                                         "segments": segments})
+        super().end_file(input_file)
@@ -0,0 +1,226 @@
+"""Command-line front end: transcribe a folder without the GUI, serve other programs, or search transcripts.
+
+    python -m transcription INPUT_FOLDER OUTPUT_FOLDER --model small --format csv
+    python -m transcription serve --model small --port 8765
+    python -m transcription search OUTPUT_FOLDER "quarterly budget"
+
+Takes the same options as the app. Only light modules are imported up front, so --help
+answers straight away; torch and whisper load when the job needs a model.
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import multiprocessing
+
+from .OutputWriters import OUTPUT_FORMATS
+from .decoding_profiles import DECODING_PROFILES, DEFAULT_PROFILE
+from .file_discovery import SCHEDULES
+from .quantized_model import QUANTIZED_SUFFIX
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m transcription",
+                                     description="Transcribe every audio and video file in a folder with Whisper. "
+                                                 "Run 'python -m transcription serve --help' for the local service, "
+                                                 "or 'python -m transcription search --help' to search transcripts.")
+    parser.add_argument("input_folder")
+    parser.add_argument("output_folder")
+    parser.add_argument("--model", default="turbo", help="Whisper model name (default: turbo)")
+    parser.add_argument("--int8", action="store_true",
+                        help="use the int8-quantized model (CPU); converted once and kept in whisper_models")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default="csv", dest="output_format")
+    parser.add_argument("--timestamps", action="store_true", help="include start and stop times (in each .txt line, and as CSV columns)")
+    parser.add_argument("--max-rows-per-part", type=int,
+                        help="split single-file outputs into parts of at most this many rows")
+    parser.add_argument("--processes", default="1",
+                        help="transcription processes, or 'auto' to time a few layouts and pick the fastest")
+    parser.add_argument("--threads-per-process", type=int)
+    parser.add_argument("--batch-size", type=int, default=1, help="batch short clips this many at a time")
+    parser.add_argument("--order", choices=SCHEDULES, default="found", dest="schedule")
+    parser.add_argument("--profile", choices=list(DECODING_PROFILES), default=DEFAULT_PROFILE,
+                        dest="decoding_profile")
+    parser.add_argument("--language", help="language code to use instead of detecting it per file")
+    parser.add_argument("--skip-silence", action="store_true", help="cut silence out before transcribing")
+    parser.add_argument("--split-channels", action="store_true",
+                        help="transcribe each audio channel separately (e.g. stereo call recordings) "
+                             "and label every line with its channel")
+    parser.add_argument("--no-streaming", action="store_true",
+                        help="decode long files whole instead of in windows")
+    parser.add_argument("--no-cache", action="store_true", help="don't reuse or save transcripts")
+    parser.add_argument("--cache-audio", action="store_true", help="keep decoded audio for later runs")
+    parser.add_argument("--no-resume", action="store_true", help="start over instead of resuming an unfinished job")
+    parser.add_argument("--watch", action="store_true",
+                        help="after the backlog, keep transcribing new files until interrupted (Ctrl+C)")
+    parser.add_argument("--distributed", action="store_true",
+                        help="split the job with other machines running the same command on a shared drive")
+    parser.add_argument("--node-id", help="name for this machine in a distributed job")
+    parser.add_argument("--metrics", dest="metrics_path", help="JSONL file for per-file timings")
+    parser.add_argument("--profile-first-files", type=int, default=0, metavar="N",
+                        help="cProfile the first N files into logs/ww-profile.pstats (needs --processes 1)")
+    parser.add_argument("--torch-profile", action="store_true", dest="profile_torch",
+                        help="with --profile-first-files, also write a torch.profiler trace to logs/")
+    parser.add_argument("--quiet", action="store_true", help="only print errors")
+    return parser
+
+
+def build_serve_parser():
+    parser = argparse.ArgumentParser(prog="python -m transcription serve",
+                                     description="Serve transcription requests from programs on this machine "
+                                                 "over HTTP on 127.0.0.1 or a Unix socket.")
+    parser.add_argument("--model", default="turbo", help="model for requests that don't name one")
+    parser.add_argument("--preload", nargs="*", default=[], help="other models to keep warm from the start")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", help="listen on this socket path instead of a TCP port")
+    parser.add_argument("--max-batch", type=int, default=16, help="most short clips decoded in one pass")
+    parser.add_argument("--batch-wait-ms", type=float, default=20,
+                        help="how long to hold a short clip back for others to batch with")
+    return parser
+
+
+def serve_main(argv):
+    args = build_serve_parser().parse_args(argv)
+    from .JobServer import serve
+    serve(args.model, port=args.port, unix_socket=args.unix_socket, preload=args.preload,
+          max_batch=args.max_batch, batch_wait=args.batch_wait_ms / 1000)
+    return 0
+
+
+def build_search_parser():
+    parser = argparse.ArgumentParser(prog="python -m transcription search",
+                                     description="Search the transcripts stored with '--format sqlite'.")
+    parser.add_argument("database", help="the .sqlite file, or the output folder it was written to")
+    parser.add_argument("query", help="words that must all appear in a segment; end a word with * for a prefix")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--model", help="only transcripts made with this model")
+    parser.add_argument("--file", dest="filename", help="only files whose name contains this")
+    parser.add_argument("--fts", action="store_true", dest="raw",
+                        help="pass the query to SQLite FTS5 as is (phrases, OR, NEAR, ...)")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per match")
+    return parser
+
+
+def format_milliseconds(milliseconds):
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+
+def search_main(argv):
+    import sqlite3
+    from .TranscriptIndex import TranscriptIndex
+
+    args = build_search_parser().parse_args(argv)
+    try:
+        index = TranscriptIndex.open(args.database)
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    try:
+        matches = index.search(args.query, limit=args.limit, model=args.model, filename=args.filename, raw=args.raw)
+    except sqlite3.OperationalError as e:
+        print(f"Invalid search: {e}", file=sys.stderr)
+        return 1
+    finally:
+        index.close()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    for match in matches:
+        if args.json:
+            print(json.dumps(match, ensure_ascii=False))
+        else:
+            channel = f", channel {match['channel']}" if match["channel"] is not None else ""
+            print(f"{match['filename']} [{format_milliseconds(match['start_ms'])} - "
+                  f"{format_milliseconds(match['stop_ms'])}] ({match['model']}{channel}): {match['text']}")
+    print(f"{len(matches)} match(es) in {elapsed_ms:.1f} ms", file=sys.stderr)
+    return 0
+
+
+def engine_options(args):
+    """TranscriptionEngine keyword arguments for the parsed command line."""
+    autotune = args.processes == "auto"
+    options = {
+        "processes": 1 if autotune else int(args.processes),
+        "threads_per_process": args.threads_per_process,
+        "autotune": autotune,
+        "use_cache": not args.no_cache,
+        "cache_audio": args.cache_audio,
+        "resume": not args.no_resume,
+        "batch_size": args.batch_size,
+        "metrics_path": args.metrics_path,
+        "profile_first_files": args.profile_first_files,
+        "profile_torch": args.profile_torch,
+        "max_rows_per_part": args.max_rows_per_part,
+        "schedule": args.schedule,
+        "watch": args.watch,
+        "vad_options": {} if args.skip_silence else None,
+        "decoding_profile": args.decoding_profile,
+        "language": args.language,
+        "distributed": args.distributed,
+        "node_id": args.node_id,
+        "split_channels": args.split_channels,
+    }
+    if args.no_streaming:
+        options["stream_window_seconds"] = None
+    return options
+
+
+class ConsoleProgress:
+    """Prints progress snapshots as lines on stderr, skipping ones that don't change the text."""
+
+    def __init__(self):
+        from .ProgressReporter import format_progress
+        self.format_progress = format_progress
+        self._last_line = None
+
+    def __call__(self, snapshot):
+        line = f"[{snapshot['percent']:3d}%] {self.format_progress(snapshot)}"
+        if line != self._last_line:
+            self._last_line = line
+            print(line, file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "serve":
+        return serve_main(argv[1:])
+    if argv and argv[0] == "search":
+        return search_main(argv[1:])
+    args = build_parser().parse_args(argv)
+
+    # The engine (and numpy, the caches, the writers) only once there is a job to run
+    from .normalize_path import normalize_path
+    from .TranscriptionEngine import TranscriptionEngine
+
+    model_name = args.model + QUANTIZED_SUFFIX if args.int8 else args.model
+    engine = TranscriptionEngine(normalize_path(args.input_folder), normalize_path(args.output_folder), model_name,
+                                 args.timestamps, args.output_format,
+                                 on_progress=None if args.quiet else ConsoleProgress(),
+                                 **engine_options(args))
+
+    if not args.watch:
+        return 0 if engine.run() else 1
+
+    # Watching runs until Ctrl+C; the job itself runs on a thread so the interrupt can stop it cleanly
+    outcome = []
+    job = threading.Thread(target=lambda: outcome.append(engine.run()), name="ww-job")
+    job.start()
+    try:
+        while job.is_alive():
+            job.join(0.5)
+    except KeyboardInterrupt:
+        print("Stopping after the current file...", file=sys.stderr)
+        engine.stop_watching()
+        while job.is_alive():
+            time.sleep(0.2)
+    return 0 if outcome and outcome[0] else 1
+
+
+if __name__ == "__main__":
+    # Needed so the transcription process pool works from a frozen build
+    multiprocessing.freeze_support()
+    sys.exit(main())
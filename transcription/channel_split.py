@@ -0,0 +1,81 @@
+import numpy as np
+
+from .decode_audio import decode_audio, probe_channels, SAMPLE_RATE
+from .voice_activity import speech_regions
+
+# A channel with less speech than this in the whole recording is taken to be an unused input
+MIN_CHANNEL_SPEECH_SECONDS = 0.5
+# A channel whose difference from an earlier one is this far below its own level carries the same audio
+DUPLICATE_CHANNEL_DB = -30.0
+
+
+def decode_channels(input_file, sample_rate=SAMPLE_RATE):
+    """Every channel of the file's first audio stream as its own float32 array, from one ffmpeg run.
+
+    Files with one channel, or whose layout ffmpeg doesn't name, come back as a single mono channel.
+    """
+    channels = probe_channels(input_file) or 1
+    if channels == 1:
+        return [decode_audio(input_file, sample_rate)]
+    interleaved = decode_audio(input_file, sample_rate, channels=channels)
+    # Whisper wants each channel contiguous (and writable), not a strided view of the interleaved buffer
+    return [np.ascontiguousarray(interleaved[:, channel]) for channel in range(channels)]
+
+
+def rms(audio):
+    return float(np.sqrt(np.mean(np.square(audio, dtype=np.float64)))) if len(audio) else 0.0
+
+
+def is_duplicate(audio, other):
+    """True if two channels are the same recording (a mono source stored as stereo, say)."""
+    level = rms(other)
+    return level > 0 and 20 * np.log10(rms(audio - other) / level + 1e-10) < DUPLICATE_CHANNEL_DB
+
+
+def active_channels(channels, vad_options=None, sample_rate=SAMPLE_RATE):
+    """([(channel number, audio)] worth transcribing, [skipped channel numbers]), numbered from 1.
+
+    A channel is skipped when the silence detector finds less than MIN_CHANNEL_SPEECH_SECONDS
+    of speech in it, or when it repeats an earlier channel. The detector judges speech against
+    each channel's own quiet stretches, so a channel with sound all the way through can look
+    silent; if every channel would be skipped, the loudest one is kept rather than none.
+    """
+    kept, skipped = [], []
+    for number, audio in enumerate(channels, start=1):
+        regions = speech_regions(audio, sample_rate, vad_options)
+        speech_seconds = int((regions[:, 1] - regions[:, 0]).sum()) / sample_rate
+        if speech_seconds < MIN_CHANNEL_SPEECH_SECONDS or any(is_duplicate(audio, other) for _, other in kept):
+            skipped.append(number)
+        else:
+            kept.append((number, audio))
+    if not kept and channels:
+        loudest = max(range(len(channels)), key=lambda index: rms(channels[index]))
+        kept.append((loudest + 1, channels[loudest]))
+        skipped.remove(loudest + 1)
+    return kept, skipped
+
+
+def merge_channel_results(channel_results, skipped=(), language=None):
+    """One result from [(channel number, result)]: every segment tagged with its channel, in time order.
+
+    A channel number of None stands for a file with only one channel: nothing was split, so its
+    result is passed through untagged, as if split mode were off.
+    """
+    if len(channel_results) == 1 and channel_results[0][0] is None:
+        return channel_results[0][1]
+    segments = []
+    for number, result in channel_results:
+        segments.extend(dict(segment, channel=number) for segment in result["segments"])
+    segments.sort(key=lambda segment: (segment["start"], segment["channel"]))
+    for segment_id, segment in enumerate(segments):
+        segment["id"] = segment_id
+
+    channels = [{"channel": number, "language": result.get("language")} for number, result in channel_results]
+    languages = [channel["language"] for channel in channels if channel["language"]]
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": languages[0] if languages else language,
+        "channels": channels,
+        "skipped_channels": list(skipped),
+    }
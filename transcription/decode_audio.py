@@ -0,0 +1,195 @@
+import re
+import threading
+import subprocess
+from collections import deque
+import numpy as np
+
+# Whisper models all expect 16 kHz mono float32 input
+SAMPLE_RATE = 16000
+
+# How much of ffmpeg's stdout we pull at a time while decoding
+READ_CHUNK_BYTES = 1 << 20
+
+# Lines of ffmpeg's error output kept for the error message
+STDERR_TAIL_LINES = 20
+
+
+# Channel counts of ffmpeg's named layouts; "5.1", "7.1(wide)" and the like are added up instead
+NAMED_CHANNEL_LAYOUTS = {"mono": 1, "stereo": 2, "downmix": 2, "quad": 4, "hexagonal": 6, "octagonal": 8,
+                         "hexadecagonal": 16}
+
+
+def ffmpeg_pcm_command(input_file, sample_rate=SAMPLE_RATE, channels=1):
+    """Build the ffmpeg command that writes raw f32le PCM for the first audio stream to stdout.
+
+    With more than one channel the samples are interleaved, as ffmpeg outputs them.
+    """
+    return ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error",
+            "-i", input_file,
+            "-map", "0:a:0", "-vn", "-sn", "-dn",
+            "-ac", str(channels), "-ar", str(sample_rate),
+            "-f", "f32le", "-acodec", "pcm_f32le", "-"]
+
+
+class StderrTail:
+    """Drains a process's stderr on a thread while stdout is read, keeping only the last few lines.
+
+    Corrupt or truncated media can make ffmpeg print an error per bad packet even at
+    -loglevel error; left unread, that fills the pipe and both processes wait on each other.
+    """
+
+    def __init__(self, stream, max_lines=STDERR_TAIL_LINES):
+        self._stream = stream
+        self._lines = deque(maxlen=max_lines)
+        self._thread = threading.Thread(target=self._drain, name="ww-ffmpeg-stderr", daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        for line in iter(self._stream.readline, b""):
+            self._lines.append(line.decode("utf-8", errors="replace").rstrip())
+        self._stream.close()
+
+    def text(self):
+        """The kept lines, once stderr has closed (i.e. the process has exited or been killed)."""
+        self._thread.join()
+        return "\n".join(self._lines).strip()
+
+
+def decode_audio(input_file, sample_rate=SAMPLE_RATE, channels=1):
+    """Decode any audio/video file straight into a float32 NumPy array without touching the disk.
+
+    Mono by default; with `channels` > 1 the array is (samples, channels), still from a single ffmpeg run.
+    """
+    process = subprocess.Popen(ffmpeg_pcm_command(input_file, sample_rate, channels),
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr_tail = StderrTail(process.stderr)
+
+    # Collect the stream in large chunks, then join once into a writable buffer
+    chunks = []
+    while True:
+        chunk = process.stdout.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    process.stdout.close()
+
+    error_output = stderr_tail.text()
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg could not decode {input_file}: {error_output}")
+
+    # A bytearray keeps the array writable, which torch.from_numpy expects inside whisper
+    audio = np.frombuffer(bytearray().join(chunks), dtype=np.float32)
+    if channels > 1:
+        audio = audio[:len(audio) - len(audio) % channels].reshape(-1, channels)
+    return audio
+
+
+def _read_exactly(stream, num_bytes):
+    """Read up to num_bytes from a pipe, stopping early only at EOF."""
+    parts = []
+    remaining = num_bytes
+    while remaining > 0:
+        chunk = stream.read(min(remaining, READ_CHUNK_BYTES))
+        if not chunk:
+            break
+        parts.append(chunk)
+        remaining -= len(chunk)
+    return bytearray().join(parts)
+
+
+def stream_audio_windows(input_file, window_seconds, overlap_seconds, sample_rate=SAMPLE_RATE):
+    """Yield (offset_seconds, audio, is_last) windows from a single ffmpeg process.
+
+    Consecutive windows overlap by overlap_seconds, so at most one window (plus the
+    overlap carried into the next) is ever held in memory, whatever the file length.
+    """
+    window_samples = int(window_seconds * sample_rate)
+    step_samples = window_samples - int(overlap_seconds * sample_rate)
+    if step_samples <= 0:
+        raise ValueError("overlap_seconds must be shorter than window_seconds")
+
+    process = subprocess.Popen(ffmpeg_pcm_command(input_file, sample_rate),
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr_tail = StderrTail(process.stderr)
+    try:
+        window = np.zeros(0, dtype=np.float32)
+        offset_samples = 0
+        at_eof = False
+
+        while True:
+            # Top the window up from where the overlap left off
+            needed = window_samples - len(window)
+            if needed > 0 and not at_eof:
+                data = _read_exactly(process.stdout, needed * 4)
+                at_eof = len(data) < needed * 4
+                if data:
+                    window = np.concatenate([window, np.frombuffer(data, dtype=np.float32)])
+
+            is_last = at_eof
+            if len(window) or offset_samples == 0:
+                yield offset_samples / sample_rate, window, is_last
+            if is_last:
+                break
+
+            # Carry only the overlap into the next window
+            window = window[step_samples:].copy()
+            offset_samples += step_samples
+
+        process.stdout.close()
+        error_output = stderr_tail.text()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg could not decode {input_file}: {error_output}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        if not process.stdout.closed:
+            process.stdout.close()
+
+
+def channel_count(layout):
+    """Channels in an ffmpeg channel layout name ("stereo", "5.1(side)", "3 channels"), or None if unknown."""
+    layout = layout.split("(")[0].strip()
+    if layout in NAMED_CHANNEL_LAYOUTS:
+        return NAMED_CHANNEL_LAYOUTS[layout]
+    match = re.fullmatch(r"(\d+) channels|(\d+)\.(\d+)", layout)
+    if match is None:
+        return None
+    if match.group(1):
+        return int(match.group(1))
+    return int(match.group(2)) + int(match.group(3))
+
+
+def probe_channels(input_file):
+    """Channel count of the first audio stream (the one decode_audio reads), or None if it can't be read."""
+    process = subprocess.run(["ffmpeg", "-nostdin", "-hide_banner", "-i", input_file],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    for line in process.stderr.decode("utf-8", errors="replace").splitlines():
+        # e.g. "Stream #0:1(eng): Audio: aac (LC) (mp4a / 0x6134706D), 44100 Hz, stereo, fltp, 128 kb/s"
+        if line.strip().startswith("Stream #") and ": Audio:" in line:
+            fields = [field.strip() for field in line.split(",")]
+            for index, field in enumerate(fields[:-1]):
+                if field.endswith(" Hz"):
+                    return channel_count(fields[index + 1])
+            return None
+    return None
+
+
+def probe_duration(input_file):
+    """Media duration in seconds from ffmpeg's header dump (no decoding), or None if it can't be read.
+
+    Only ffmpeg itself is guaranteed to be present, so this parses `ffmpeg -i` rather than using ffprobe.
+    """
+    process = subprocess.run(["ffmpeg", "-nostdin", "-hide_banner", "-i", input_file],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    for line in process.stderr.decode("utf-8", errors="replace").splitlines():
+        line = line.strip()
+        if line.startswith("Duration:"):
+            timestamp = line.split(",")[0].split("Duration:")[1].strip()
+            try:
+                hours, minutes, seconds = timestamp.split(":")
+                return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+            except ValueError:
+                # "Duration: N/A" for some live/stream containers
+                return None
+    return None
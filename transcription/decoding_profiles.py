@@ -0,0 +1,131 @@
+import os
+import json
+import threading
+
+from .normalize_path import normalize_path
+
+# model.transcribe options for each speed profile. "balanced" is whisper's own default
+# behaviour (greedy decoding, temperature fallback on hard segments, conditioning on
+# previous text), so it adds nothing and keeps existing caches valid.
+DECODING_PROFILES = {
+    "fastest": {
+        # One greedy pass: no beam, no re-decoding at higher temperatures
+        "temperature": 0.0,
+        # Each 30 s window is decoded on its own, which also stops repetition loops spreading
+        "condition_on_previous_text": False,
+    },
+    "balanced": {},
+    "accurate": {
+        "beam_size": 5,
+        "best_of": 5,
+        "patience": 1.0,
+        "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        "compression_ratio_threshold": 2.4,
+        "logprob_threshold": -1.0,
+        "no_speech_threshold": 0.6,
+        "condition_on_previous_text": True,
+        # Full precision even on a GPU
+        "fp16": False,
+    },
+}
+DEFAULT_PROFILE = "balanced"
+
+# A folder containing this file (holding a language code such as "en") skips language detection
+# for every recording in it and in its subfolders
+LANGUAGE_HINT_FILENAME = "whisper-language.txt"
+
+# Offered in the app; any other Whisper language code can be typed in
+COMMON_LANGUAGES = ["en", "es", "fr", "de", "it", "pt", "nl", "ru", "zh", "ja", "ko", "ar", "hi", "tr", "pl"]
+
+
+def profile_options(profile):
+    """The transcribe() options for a profile.
+
+    Profiles that don't set fp16 keep whisper's handling: half precision on a GPU, and a
+    quiet switch to fp32 on the CPU.
+    """
+    return dict(DECODING_PROFILES[profile])
+
+
+class FolderLanguageHints:
+    """Looks up the language hint for a file: the nearest LANGUAGE_HINT_FILENAME in its folder or above it.
+
+    Only folders inside `root` are searched; results are cached per folder, so a large tree
+    costs one stat per directory.
+    """
+
+    def __init__(self, root, default_language=None):
+        self.root = os.path.abspath(root)
+        self.default_language = default_language
+        self._by_folder = {}
+        self._lock = threading.Lock()
+
+    def language_for(self, input_file):
+        return self._folder_language(os.path.dirname(os.path.abspath(input_file)))
+
+    def _folder_language(self, folder):
+        with self._lock:
+            if folder in self._by_folder:
+                return self._by_folder[folder]
+
+        language = self._read_hint(folder)
+        if language is None:
+            parent = os.path.dirname(folder)
+            inside_root = folder != self.root and os.path.commonpath([self.root, folder]) == self.root
+            language = self._folder_language(parent) if inside_root and parent != folder else self.default_language
+
+        with self._lock:
+            self._by_folder[folder] = language
+        return language
+
+    @staticmethod
+    def _read_hint(folder):
+        try:
+            with open(os.path.join(folder, LANGUAGE_HINT_FILENAME), encoding="utf-8-sig") as hint_file:
+                language = hint_file.read().strip().lower()
+        except OSError:
+            return None
+        return language or None
+
+
+class ProfileStats:
+    """Measured real-time factor per model and speed profile, kept across runs in logs/ww-profile-rtf.json.
+
+    Each finished job adds its processing time and audio duration, so the figure shown for a
+    profile is what it has actually achieved on this machine.
+    """
+
+    def __init__(self, path=None):
+        self.path = normalize_path(path or os.path.join("logs", "ww-profile-rtf.json"))
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as stats_file:
+                return json.load(stats_file)
+        except (OSError, ValueError):
+            return {}
+
+    def real_time_factor(self, model_name, profile):
+        entry = self.load().get(f"{model_name}/{profile}")
+        if not entry or not entry.get("audio_seconds"):
+            return None
+        return entry["processing_seconds"] / entry["audio_seconds"]
+
+    def add(self, model_name, profile, processing_seconds, audio_seconds):
+        if not audio_seconds:
+            return
+        stats = self.load()
+        entry = stats.setdefault(f"{model_name}/{profile}", {"processing_seconds": 0.0, "audio_seconds": 0.0})
+        entry["processing_seconds"] = round(entry["processing_seconds"] + processing_seconds, 3)
+        entry["audio_seconds"] = round(entry["audio_seconds"] + audio_seconds, 3)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as stats_file:
+            json.dump(stats, stats_file, indent=1)
+        os.replace(temp_path, self.path)
+
+    def label(self, model_name, profile):
+        """e.g. "Balanced (0.21x real time)", or just "Balanced" before the profile has been measured."""
+        real_time_factor = self.real_time_factor(model_name, profile)
+        name = profile.capitalize()
+        return f"{name} ({real_time_factor:.2f}x real time)" if real_time_factor is not None else name
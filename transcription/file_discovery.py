@@ -0,0 +1,106 @@
+import os
+import wave
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .decode_audio import probe_duration
+
+# Global lists for supported formats
+AUDIO_FORMATS = ["mp3", "wav", "flac", "m4a", "ogg"]
+VIDEO_FORMATS = ["mp4", "webm", "mov", "avi", "mkv", "flv", "wmv", "mpeg", "mpg", "3gp", "asf"]
+SUPPORTED_EXTENSIONS = frozenset("." + ext for ext in AUDIO_FORMATS + VIDEO_FORMATS)
+
+# Orders the scheduler can run files in
+SCHEDULES = ("found", "longest", "shortest")
+
+# Compressed speech rarely goes below 8 kbit/s, so a file with fewer bytes than this per second of some
+# length can't be longer than it (and a rare lower-bitrate file is just decoded whole instead of streamed)
+MIN_BYTES_PER_SECOND = 1000
+
+
+def _scan_directory(path, extensions):
+    """One scandir pass: the matching files in `path` (sorted) and its subdirectories."""
+    files, subdirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    # Like os.walk, don't follow symlinked directories
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in extensions:
+                        files.append(entry.path)
+                except OSError:
+                    continue
+    except OSError:
+        # Unreadable directories are skipped, as os.walk does
+        pass
+    files.sort()
+    return files, subdirs
+
+
+def iter_media_batches(folder, extensions, max_workers=8):
+    """Yield lists of matching files, one list per directory, as directories are scanned.
+
+    Directories are listed on a small thread pool with os.scandir, so on network shares many
+    listings are in flight at once and the first files are available long before the whole tree
+    has been walked. `extensions` are lowercase with the dot, e.g. {".mp3", ".wav"}.
+    """
+    extensions = frozenset(extensions)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ww-scan") as executor:
+        in_flight = {executor.submit(_scan_directory, folder, extensions)}
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                for subdir in subdirs:
+                    in_flight.add(executor.submit(_scan_directory, subdir, extensions))
+                if files:
+                    yield files
+
+
+def iter_media_files(folder, extensions, max_workers=8):
+    """Yield matching files one at a time as they are found (see iter_media_batches)."""
+    for files in iter_media_batches(folder, extensions, max_workers):
+        yield from files
+
+
+def quick_duration(input_file):
+    """Duration in seconds, read from the WAV header where possible and from ffmpeg's header dump otherwise."""
+    if input_file.lower().endswith(".wav"):
+        try:
+            with wave.open(input_file, "rb") as wav_file:
+                return wav_file.getnframes() / wav_file.getframerate()
+        except (wave.Error, EOFError, OSError, ZeroDivisionError):
+            # e.g. float or extensible WAVs the wave module can't parse
+            pass
+    return probe_duration(input_file)
+
+
+def may_be_longer_than(input_file, seconds):
+    """False if the file is too small to hold `seconds` of audio, judged from its size alone."""
+    try:
+        return os.path.getsize(input_file) > seconds * MIN_BYTES_PER_SECOND
+    except OSError:
+        return True
+
+
+def probe_durations(files, max_workers=8):
+    """{file: duration or None} for every file, probing several at once."""
+    files = list(files)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ww-probe") as executor:
+        return dict(zip(files, executor.map(quick_duration, files)))
+
+
+def schedule_files(files, durations, schedule):
+    """Order files for processing.
+
+    "longest" puts the longest files first, so a process pool isn't left waiting on one long
+    file at the end. "shortest" gets the first transcripts out as soon as possible. Files with
+    an unknown duration go last either way. "found" keeps discovery order.
+    """
+    if schedule == "found":
+        return list(files)
+    known = [input_file for input_file in files if durations.get(input_file) is not None]
+    unknown = [input_file for input_file in files if durations.get(input_file) is None]
+    known.sort(key=durations.get, reverse=schedule == "longest")
+    return known + unknown
@@ -0,0 +1,16 @@
+def detect_language(model, audio):
+    """Detect the spoken language from the first 30 s, the same way model.transcribe would internally.
+
+    Running it up front lets the caller time it as its own stage and then pass
+    `language=` to transcribe so whisper doesn't detect a second time.
+    """
+    import torch
+    import whisper
+
+    if not model.is_multilingual:
+        return "en"
+
+    with torch.no_grad():
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio)), n_mels=model.dims.n_mels)
+        _, probs = model.detect_language(mel.to(model.device))
+    return max(probs, key=probs.get)
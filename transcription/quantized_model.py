@@ -0,0 +1,113 @@
+import os
+
+from .normalize_path import normalize_path
+
+# "<model>-int8" names the dynamically quantized CPU variant of a Whisper model, e.g. "medium-int8"
+QUANTIZED_SUFFIX = "-int8"
+# Bump when the cached file layout changes
+CACHE_FORMAT = 1
+
+
+def is_quantized(model_name):
+    return model_name.endswith(QUANTIZED_SUFFIX)
+
+
+def base_model_name(model_name):
+    return model_name[:-len(QUANTIZED_SUFFIX)] if is_quantized(model_name) else model_name
+
+
+def quantized_cache_path(model_name, model_dir):
+    return normalize_path(os.path.join(model_dir, base_model_name(model_name) + QUANTIZED_SUFFIX + ".pt"))
+
+
+def _select_quantized_engine():
+    import torch
+
+    engines = torch.backends.quantized.supported_engines
+    # fbgemm on x86, qnnpack on ARM (Apple silicon, Graviton)
+    for engine in ("fbgemm", "x86", "qnnpack"):
+        if engine in engines:
+            torch.backends.quantized.engine = engine
+            return engine
+    return None
+
+
+def quantize_model(model):
+    """Swap the model's linear layers for dynamically quantized int8 ones, in place, on the CPU.
+
+    Whisper uses its own Linear subclass, which quantize_dynamic doesn't recognise, so those
+    layers are turned back into plain nn.Linear first (they only differ in dtype casting,
+    which fp32-on-CPU doesn't need). Embeddings and convolutions stay fp32.
+    """
+    import torch
+    from whisper.model import Linear
+
+    _select_quantized_engine()
+    model = model.cpu().float()
+    for module in model.modules():
+        if type(module) is Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def _cache_stamp(model_name):
+    """What a cached quantized file must match to be reused: source checkpoint and torch build."""
+    import torch
+    import whisper
+
+    url = whisper._MODELS.get(base_model_name(model_name))
+    return {"format": CACHE_FORMAT, "source": os.path.basename(url) if url else None, "torch": torch.__version__}
+
+
+def _set_alignment_heads(model, model_name):
+    import whisper
+
+    alignment_heads = getattr(whisper, "_ALIGNMENT_HEADS", {}).get(base_model_name(model_name))
+    if alignment_heads is not None:
+        model.set_alignment_heads(alignment_heads)
+
+
+def _load_cached(model_name, path):
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+
+    checkpoint = torch.load(path, map_location="cpu", weights_only=False)
+    if checkpoint.get("stamp") != _cache_stamp(model_name):
+        return None
+    # Build the quantized skeleton, then fill it from the cached int8 weights: no fp32 load, no conversion
+    model = quantize_model(Whisper(ModelDimensions(**checkpoint["dims"])))
+    model.load_state_dict(checkpoint["model_state_dict"])
+    _set_alignment_heads(model, model_name)
+    return model
+
+
+def load_quantized_model(model_name, download_root):
+    """The int8 model, from the quantized cache in download_root or converted (and cached) on first use."""
+    import torch
+    import whisper
+
+    path = quantized_cache_path(model_name, download_root)
+    if os.path.exists(path):
+        try:
+            model = _load_cached(model_name, path)
+        except Exception:
+            # Unreadable or from an incompatible torch build: rebuild it below
+            model = None
+        if model is not None:
+            return model
+
+    model = quantize_model(whisper.load_model(base_model_name(model_name), device="cpu",
+                                              download_root=download_root))
+    temp_path = path + ".tmp"
+    torch.save({"stamp": _cache_stamp(model_name), "dims": model.dims.__dict__,
+                "model_state_dict": model.state_dict()}, temp_path)
+    os.replace(temp_path, path)
+    return model
+
+
+def load_model(model_name, download_root, device=None):
+    """whisper.load_model that also understands "<model>-int8" names (always on the CPU)."""
+    if is_quantized(model_name):
+        return load_quantized_model(model_name, download_root)
+    import whisper
+    return whisper.load_model(model_name, device=device, download_root=download_root)
@@ -0,0 +1,196 @@
+import numpy as np
+
+from .decode_audio import SAMPLE_RATE
+
+# Thresholds for the silence filter; any of them can be overridden per job
+DEFAULT_VAD_OPTIONS = {
+    # Analysis frame length
+    "frame_ms": 30,
+    # A frame is speech if it's this much louder than the recording's noise floor...
+    "energy_margin_db": 10.0,
+    # ...and louder than this absolute level (dBFS), so digital silence never counts
+    "min_energy_db": -50.0,
+    # Frames that cross zero more often than this are hiss/room tone unless clearly loud
+    "max_zero_crossing_rate": 0.35,
+    # Speech bursts shorter than this are dropped, pauses shorter than this are bridged
+    "min_speech_ms": 250,
+    "min_silence_ms": 600,
+    # Kept around each speech region so word onsets and tails aren't clipped
+    "pad_ms": 200,
+}
+
+# Silence left between speech regions when they're joined, so whisper still sees a pause
+JOIN_GAP_SECONDS = 0.3
+
+
+def vad_options(overrides=None):
+    """DEFAULT_VAD_OPTIONS with `overrides` applied."""
+    options = dict(DEFAULT_VAD_OPTIONS)
+    options.update(overrides or {})
+    return options
+
+
+def frame_features(audio, frame_samples):
+    """Per-frame energy (dBFS) and zero-crossing rate, for whole frames only."""
+    frame_count = len(audio) // frame_samples
+    frames = audio[:frame_count * frame_samples].reshape(frame_count, frame_samples)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    energy_db = 20 * np.log10(rms + 1e-10)
+    signs = np.signbit(frames)
+    zero_crossing_rate = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_samples - 1)
+    return energy_db, zero_crossing_rate
+
+
+def _runs(mask):
+    """(start, end) frame indices of each run of True in a boolean array."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def speech_regions(audio, sample_rate=SAMPLE_RATE, options=None):
+    """Speech regions as an (n, 2) array of [start, end) sample indices, in order and non-overlapping."""
+    options = vad_options(options)
+    frame_samples = max(2, int(sample_rate * options["frame_ms"] / 1000))
+    if len(audio) < frame_samples:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    energy_db, zero_crossing_rate = frame_features(audio, frame_samples)
+    # The quieter frames of a recording are its room tone; speech has to stand out from them
+    noise_floor_db = np.percentile(energy_db, 10)
+    threshold_db = max(options["min_energy_db"], noise_floor_db + options["energy_margin_db"])
+    speech = (energy_db > threshold_db) & (
+        (zero_crossing_rate <= options["max_zero_crossing_rate"]) | (energy_db > threshold_db + 10))
+
+    frame_seconds = frame_samples / sample_rate
+    # Bridge short pauses inside speech
+    starts, ends = _runs(~speech)
+    short_gaps = (ends - starts) * frame_seconds * 1000 < options["min_silence_ms"]
+    short_gaps &= (starts > 0) & (ends < len(speech))
+    for start, end in zip(starts[short_gaps], ends[short_gaps]):
+        speech[start:end] = True
+    # Drop blips too short to be words
+    starts, ends = _runs(speech)
+    keep = (ends - starts) * frame_seconds * 1000 >= options["min_speech_ms"]
+    starts, ends = starts[keep], ends[keep]
+    if not len(starts):
+        return np.zeros((0, 2), dtype=np.int64)
+
+    pad = int(sample_rate * options["pad_ms"] / 1000)
+    regions = np.stack([starts * frame_samples - pad, ends * frame_samples + pad], axis=1)
+    regions = np.clip(regions, 0, len(audio))
+    # Padding can make neighbours touch; merge those
+    merged = [regions[0]]
+    for start, end in regions[1:]:
+        if start <= merged[-1][1]:
+            merged[-1] = np.array([merged[-1][0], max(end, merged[-1][1])])
+        else:
+            merged.append(np.array([start, end]))
+    return np.array(merged, dtype=np.int64)
+
+
+def join_regions(audio, regions, sample_rate=SAMPLE_RATE, gap_seconds=JOIN_GAP_SECONDS):
+    """Concatenate the speech regions (with a short silence between them) and build the timeline back.
+
+    The timeline is an (n, 3) array of [joined_start, original_start, duration] in seconds,
+    one row per region, for remap_result().
+    """
+    gap = np.zeros(int(sample_rate * gap_seconds), dtype=audio.dtype)
+    pieces, timeline = [], []
+    position = 0
+    for start, end in regions:
+        if pieces:
+            pieces.append(gap)
+            position += len(gap)
+        pieces.append(audio[start:end])
+        timeline.append((position / sample_rate, start / sample_rate, (end - start) / sample_rate))
+        position += end - start
+    joined = np.concatenate(pieces) if pieces else np.zeros(0, dtype=audio.dtype)
+    return joined, np.array(timeline, dtype=np.float64).reshape(-1, 3)
+
+
+def remap_time(seconds, timeline, is_start=False):
+    """Map a time on the joined audio back onto the original recording.
+
+    Times inside a join gap go to the end of the region before it, or, for the start of a
+    segment or word, to the start of the region after it.
+    """
+    index = max(int(np.searchsorted(timeline[:, 0], seconds, side="right")) - 1, 0)
+    joined_start, original_start, duration = timeline[index]
+    offset = max(seconds - joined_start, 0.0)
+    if offset > duration and is_start and index + 1 < len(timeline):
+        return float(timeline[index + 1][1])
+    return float(original_start + min(offset, duration))
+
+
+def remap_result(result, timeline):
+    """Shift segment (and word) timestamps in a transcribe() result from the joined audio to the original."""
+    def remap(item):
+        return dict(item, start=remap_time(item["start"], timeline, is_start=True),
+                    end=remap_time(item["end"], timeline))
+
+    segments = []
+    for segment in result["segments"]:
+        segment = remap(segment)
+        if "words" in segment:
+            segment["words"] = [remap(word) for word in segment["words"]]
+        segments.append(segment)
+    return dict(result, segments=segments)
+
+
+def filter_silence(audio, options=None, sample_rate=SAMPLE_RATE):
+    """Find the speech in `audio` and join it up.
+
+    Returns (joined_audio, timeline, report); joined_audio is empty when there's no speech at
+    all. The report says how much audio went in and how much was skipped as silence.
+    """
+    regions = speech_regions(audio, sample_rate, options)
+    joined, timeline = join_regions(audio, regions, sample_rate)
+    audio_seconds = len(audio) / sample_rate
+    speech_seconds = float(timeline[:, 2].sum()) if len(timeline) else 0.0
+    report = {
+        "audio_seconds": round(audio_seconds, 3),
+        "speech_seconds": round(speech_seconds, 3),
+        "skipped_seconds": round(audio_seconds - speech_seconds, 3),
+        "speech_regions": len(regions),
+    }
+    return joined, timeline, report
+
+
+def speech_seconds_between(timeline, start, end):
+    """How much of the original recording between `start` and `end` seconds was kept as speech."""
+    if not len(timeline):
+        return 0.0
+    region_starts = timeline[:, 1]
+    region_ends = region_starts + timeline[:, 2]
+    overlap = np.minimum(region_ends, end) - np.maximum(region_starts, start)
+    return float(np.clip(overlap, 0.0, None).sum())
+
+
+def empty_result(language=None):
+    """What transcribe() would give for a file with nothing said, without running the model."""
+    return {"text": "", "segments": [], "language": language}
+
+
+def transcribe_speech(model, audio, transcribe_options, options=None, sample_rate=SAMPLE_RATE):
+    """model.transcribe on the speech in `audio` only, with timestamps on the original timeline.
+
+    The silence report is attached to the result as result["vad"].
+    """
+    joined, timeline, report = filter_silence(audio, options, sample_rate)
+    if not len(joined):
+        result = empty_result(transcribe_options.get("language"))
+    else:
+        result = remap_result(model.transcribe(joined, **transcribe_options), timeline)
+    result["vad"] = report
+    return result
+
+
+def combine_reports(reports):
+    """Sum several silence reports, e.g. for a whole job."""
+    total = {"audio_seconds": 0.0, "speech_seconds": 0.0, "skipped_seconds": 0.0, "speech_regions": 0}
+    for report in reports:
+        for key in total:
+            total[key] += report.get(key, 0)
+    for key in ("audio_seconds", "speech_seconds", "skipped_seconds"):
+        total[key] = round(total[key], 3)
+    return total
@@ -0,0 +1,52 @@
+import importlib
+import threading
+import types
+from contextlib import contextmanager
+
+# model.transcribe only exposes its progress through a tqdm bar over mel frames (100 per second of audio).
+# We swap in a tqdm subclass once, and it forwards updates to whichever callback the calling thread registered,
+# so concurrent transcriptions on different threads each get their own progress.
+FRAMES_PER_SECOND = 100
+
+_local = threading.local()
+_installed = False
+_install_lock = threading.Lock()
+
+
+def _install():
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        import tqdm
+        # whisper/__init__ rebinds the name `whisper.transcribe` to the function, so fetch the module itself
+        transcribe_module = importlib.import_module("whisper.transcribe")
+
+        class ProgressTqdm(tqdm.tqdm):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self._ww_callback = getattr(_local, "callback", None)
+                self._ww_done = 0
+
+            def update(self, n=1):
+                result = super().update(n)
+                # A disabled bar doesn't advance self.n, so count frames ourselves
+                self._ww_done += n
+                if self._ww_callback is not None and self.total:
+                    self._ww_callback(self._ww_done, self.total)
+                return result
+
+        transcribe_module.tqdm = types.SimpleNamespace(tqdm=ProgressTqdm)
+        _installed = True
+
+
+@contextmanager
+def transcribe_progress(callback):
+    """Within the block, model.transcribe calls on this thread report (frames_done, total_frames) to callback."""
+    _install()
+    previous = getattr(_local, "callback", None)
+    _local.callback = callback
+    try:
+        yield
+    finally:
+        _local.callback = previous
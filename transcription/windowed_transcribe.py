@@ -0,0 +1,100 @@
+from .decode_audio import stream_audio_windows, SAMPLE_RATE
+from .voice_activity import filter_silence, remap_result, empty_result, speech_seconds_between
+
+# Defaults for long recordings: 10-minute windows, with enough overlap to cover a full Whisper segment
+DEFAULT_WINDOW_SECONDS = 600
+DEFAULT_OVERLAP_SECONDS = 30
+
+# How much already-emitted text is fed back as the prompt for the next window
+PROMPT_TAIL_CHARS = 200
+
+
+def _midpoint(segment):
+    return (segment["start"] + segment["end"]) / 2
+
+
+def transcribe_in_windows(model, input_file, transcribe_options, on_segments=None,
+                          window_seconds=DEFAULT_WINDOW_SECONDS, overlap_seconds=DEFAULT_OVERLAP_SECONDS,
+                          windows=None, vad_options=None):
+    """Transcribe a long file window by window with bounded memory and return the stitched result.
+
+    Segment timestamps are shifted onto the file's global timeline. Where two windows
+    overlap, each segment is kept from exactly one of them: a window owns segments whose
+    midpoint falls before the middle of its trailing overlap, and the next window drops
+    anything whose midpoint is before the last kept segment's end. `on_segments` is called
+    with each window's new segments as soon as that window is done.
+
+    `windows` can supply pre-decoded (offset, audio, is_last) tuples; by default they are
+    streamed from one ffmpeg process. With `vad_options` (see voice_activity), silence is cut
+    out of each window before inference and the skipped audio is reported as result["vad"],
+    counting each stretch of the recording once even where windows overlap.
+    """
+    if windows is None:
+        windows = stream_audio_windows(input_file, window_seconds, overlap_seconds)
+
+    all_segments = []
+    language = None
+    committed_end = 0.0
+    previous_text = ""
+    owned_from = 0.0
+    vad_report = {"audio_seconds": 0.0, "speech_seconds": 0.0, "skipped_seconds": 0.0, "speech_regions": 0}
+
+    for offset, audio, is_last in windows:
+        options = dict(transcribe_options)
+        if previous_text and "initial_prompt" not in transcribe_options:
+            # Carry context across the window boundary the way whisper does between its own 30 s chunks
+            options["initial_prompt"] = previous_text[-PROMPT_TAIL_CHARS:]
+        if language is not None:
+            # Detect once on the first window rather than again on every window
+            options.setdefault("language", language)
+
+        cutoff = offset + window_seconds - overlap_seconds / 2
+        if vad_options is not None:
+            joined, timeline, report = filter_silence(audio, vad_options)
+            if len(joined):
+                result = remap_result(model.transcribe(joined, **options), timeline)
+            else:
+                result = empty_result(language)
+            # Account for the part of the recording this window owns, so overlaps aren't counted twice
+            owned_to = offset + len(audio) / SAMPLE_RATE if is_last else cutoff
+            speech = speech_seconds_between(timeline, owned_from - offset, owned_to - offset)
+            vad_report["audio_seconds"] += owned_to - owned_from
+            vad_report["speech_seconds"] += speech
+            vad_report["skipped_seconds"] += owned_to - owned_from - speech
+            vad_report["speech_regions"] += report["speech_regions"]
+            owned_from = owned_to
+        else:
+            result = model.transcribe(audio, **options)
+        language = language or result.get("language")
+
+        new_segments = []
+        for segment in result["segments"]:
+            segment = dict(segment, start=segment["start"] + offset, end=segment["end"] + offset)
+            if _midpoint(segment) < committed_end:
+                continue
+            if not is_last and _midpoint(segment) >= cutoff:
+                break
+            if all_segments and not new_segments and segment["text"].strip() == all_segments[-1]["text"].strip():
+                # Same sentence recognised at the tail of one window and the head of the next
+                continue
+            segment["id"] = len(all_segments) + len(new_segments)
+            new_segments.append(segment)
+
+        if new_segments:
+            committed_end = new_segments[-1]["end"]
+            previous_text = "".join(segment["text"] for segment in new_segments)
+        else:
+            committed_end = max(committed_end, cutoff)
+
+        all_segments.extend(new_segments)
+        if on_segments is not None and new_segments:
+            on_segments(new_segments)
+
+    result = {
+        "text": "".join(segment["text"] for segment in all_segments),
+        "segments": all_segments,
+        "language": language,
+    }
+    if vad_options is not None:
+        result["vad"] = {key: round(value, 3) for key, value in vad_report.items()}
+    return result